@@ -0,0 +1,34 @@
+import os
+
+from dunnhumby_ingest import RAW_DATA_DIR, RAW_PARQUET_DIR, convert_all
+from dunnhumby_schema import SOURCE_SCHEMAS
+
+# Number of worker processes (None = one per table, capped at the CPU count)
+WORKERS = None
+
+if __name__ == '__main__':
+    print("--- Converting Raw Dunnhumby Tables to Parquet ---")
+
+    missing = [name for name in SOURCE_SCHEMAS if not os.path.exists(os.path.join(RAW_DATA_DIR, f'{name}.csv'))]
+    if missing:
+        print(f"Error: source files not found in {RAW_DATA_DIR}: {', '.join(missing)}")
+        exit()
+
+    print(f"\nParsing {len(SOURCE_SCHEMAS)} tables from {RAW_DATA_DIR} in parallel...")
+    results = convert_all(workers=WORKERS)
+
+    failed = [r for r in results if 'error' in r]
+    for r in sorted(results, key=lambda r: r['table']):
+        if 'error' in r:
+            print(f"  {r['table']:<17} FAILED: {r['error']}")
+        else:
+            print(f"  {r['table']:<17} {r['rows']:>12,} rows  "
+                  f"{r['csv_bytes'] / 1024**2:>9.1f} MB csv -> {r['parquet_bytes'] / 1024**2:>8.1f} MB parquet  "
+                  f"({r['seconds']:.1f}s)")
+
+    if failed:
+        print(f"\n{len(failed)} table(s) failed to convert.")
+    else:
+        print(f"\nAll tables written to {RAW_PARQUET_DIR}.")
+
+    print("\n--- Raw Table Conversion Finished ---")
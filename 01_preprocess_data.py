@@ -1,10 +1,36 @@
 
-import pandas as pd
 import numpy as np
 import os
+import shutil
+
+from dunnhumby_cube import CUBE_DIR, cube_exists, master_cube_builder
+from dunnhumby_ingest import iter_raw_table, load_raw_table, raw_table_exists
+from dunnhumby_join import DimensionIndex, join_dimensions
+from dunnhumby_pipeline import step_cache
+from dunnhumby_profiling import span
+from dunnhumby_schema import read_csv_typed
+from dunnhumby_storage import (MASTER_DATASET_DIR, MASTER_WATERMARK_PREFIX, PartitionedWriter,
+                               master_table_exists, new_rows_mask, read_watermark, write_watermark)
 
 print("--- Starting Data Preprocessing and Integration ---")
 
+# Rows of transaction_data.csv read per chunk. In streaming mode only one chunk
+# (plus the small product/demographic lookup tables) is held in memory at a time,
+# so peak memory stays flat regardless of the transaction file size.
+# Set to None to load the whole file at once (original in-memory mode).
+CHUNK_SIZE = 500_000
+
+# Incremental (append-only) mode. The master table keeps a watermark (max DAY /
+# WEEK_NO and the set of ingested BASKET_IDs); with INCREMENTAL = True only rows
+# from baskets not yet ingested are merged and appended, and only the partitions
+# they fall into are rewritten. Without a watermark a full rebuild is done.
+INCREMENTAL = False
+
+# Skip the step when its inputs, parameters and script are unchanged
+cache = step_cache('01', params={'CHUNK_SIZE': CHUNK_SIZE, 'INCREMENTAL': INCREMENTAL})
+if cache.hit():
+    exit()
+
 # Use raw strings for file paths to avoid SyntaxWarning
 base_path = r'.\\dunnhumby.db'
 
@@ -14,48 +40,45 @@ files = {
     'products': os.path.join(base_path, 'product.csv'),
     'demographics': os.path.join(base_path, 'hh_demographic.csv')
 }
+# Parquet copies written by 00_convert_raw_tables.py are read instead of the CSVs when present
+raw_tables = {'transactions': 'transaction_data', 'products': 'product', 'demographics': 'hh_demographic'}
+
+
+def read_source(name):
+    if raw_table_exists(raw_tables[name]):
+        return load_raw_table(raw_tables[name])
+    return read_csv_typed(files[name], raw_tables[name])
+
+
+def iter_source(name, chunk_size):
+    if raw_table_exists(raw_tables[name]):
+        return iter_raw_table(raw_tables[name], chunk_size)
+    return read_csv_typed(files[name], raw_tables[name], chunksize=chunk_size)
+
 
 # --- 1. Load Data with Optimized Dtypes ---
 print("\n[Step 1/4] Loading data with optimized dtypes...")
 try:
-    # Dtype optimization to reduce memory usage
-    demographics_dtypes = {
-        'AGE_DESC': 'category',
-        'MARITAL_STATUS_CODE': 'category',
-        'INCOME_DESC': 'category',
-        'HOMEOWNER_DESC': 'category',
-        'HH_COMP_DESC': 'category',
-        'HOUSEHOLD_SIZE_DESC': 'category',
-        'KID_CATEGORY_DESC': 'category',
-        'household_key': 'int32'
-    }
-    products_dtypes = {
-        'PRODUCT_ID': 'int32',
-        'MANUFACTURER': 'int32',
-        'DEPARTMENT': 'category',
-        'BRAND': 'category',
-        'COMMODITY_DESC': 'category',
-        'SUB_COMMODITY_DESC': 'category'
-    }
-    # For transactions, we will optimize after loading, but key columns can be set
-    transactions_dtypes = {
-        'household_key': 'int32',
-        'BASKET_ID': 'int64', # Keep as int64 due to its large values
-        'DAY': 'int16',
-        'PRODUCT_ID': 'int32',
-        'QUANTITY': 'int32',
-        'STORE_ID': 'int16',
-        'WEEK_NO': 'int8'
-    }
-
-    df_demo = pd.read_csv(files['demographics'], dtype=demographics_dtypes)
-    df_prod = pd.read_csv(files['products'], dtype=products_dtypes)
-    df_trans = pd.read_csv(files['transactions'], dtype=transactions_dtypes)
-    
+    # Dtypes come from the central schema registry (dunnhumby_schema)
+    with span('load') as sp:
+        df_demo = read_source('demographics')
+        df_prod = read_source('products')
+        sp.rows = len(df_demo) + len(df_prod)
+    if CHUNK_SIZE is None:
+        with span('load_transactions') as sp:
+            df_trans = read_source('transactions')
+            sp.rows = len(df_trans)
+    else:
+        # Transactions are streamed chunk by chunk in Step 3
+        df_trans = None
+
     print("Data loaded successfully.")
     print(f"Demographics Memory Usage: {df_demo.memory_usage(deep=True).sum() / 1024**2:.2f} MB")
     print(f"Products Memory Usage: {df_prod.memory_usage(deep=True).sum() / 1024**2:.2f} MB")
-    print(f"Transactions Memory Usage: {df_trans.memory_usage(deep=True).sum() / 1024**2:.2f} MB")
+    if df_trans is not None:
+        print(f"Transactions Memory Usage: {df_trans.memory_usage(deep=True).sum() / 1024**2:.2f} MB")
+    else:
+        print(f"Transactions will be streamed in chunks of {CHUNK_SIZE:,} rows.")
 
 except Exception as e:
     print(f"Error loading data: {e}")
@@ -77,29 +100,108 @@ print("Missing values in CURR_SIZE_OF_PRODUCT:", df_prod['CURR_SIZE_OF_PRODUCT']
 
 
 # --- 3. Merge DataFrames ---
-print("\n[Step 3/4] Merging transactions with product and demographic data...")
-# Merge transactions with products
-merged_df = pd.merge(df_trans, df_prod, on='PRODUCT_ID', how='left')
-
-# Merge with demographics
-merged_df = pd.merge(merged_df, df_demo, on='household_key', how='left')
-
-print("Merge complete.")
-print(f"Merged DataFrame shape: {merged_df.shape}")
-print(f"Merged DataFrame Memory Usage: {merged_df.memory_usage(deep=True).sum() / 1024**2:.2f} MB")
-
-
-# --- 4. Save Processed Data ---
-output_dir = '.\\processed_data'
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
-
-output_path = os.path.join(output_dir, 'master_transaction_table.parquet')
-print(f"\n[Step 4/4] Saving processed data to {output_path}...")
-try:
-    merged_df.to_parquet(output_path, engine='pyarrow')
-    print("Successfully saved the merged data as a Parquet file.")
-except Exception as e:
-    print(f"Error saving data: {e}")
+# The lookups are indexed once: PRODUCT_ID / household_key map to dense integer
+# codes and attributes are gathered with NumPy take() as categorical columns,
+# instead of two pd.merge hash joins per block of transactions.
+product_index = DimensionIndex(df_prod, 'PRODUCT_ID')
+demo_index = DimensionIndex(df_demo, 'household_key')
+
+
+def merge_dimensions(trans):
+    """Left-join a block of transactions against the product and demographic lookups."""
+    return join_dimensions(trans, {'PRODUCT_ID': product_index, 'household_key': demo_index})
+
+
+# The master table is written as a Hive-partitioned dataset (WEEK_NO range x
+# household_key bucket) with a manifest; see dunnhumby_storage.load_master.
+output_path = MASTER_DATASET_DIR
+watermark, ingested_baskets = read_watermark(MASTER_WATERMARK_PREFIX)
+# The sales cube is extended from the new rows too, so a missing cube forces a full rebuild
+incremental = INCREMENTAL and watermark is not None and master_table_exists() and cube_exists(CUBE_DIR)
+
+if incremental:
+    print(f"\nIncremental mode: {watermark['basket_count']:,} baskets already ingested "
+          f"(up to DAY {watermark['max_day']}, WEEK_NO {watermark['max_week']}).")
+    writer = PartitionedWriter(output_path, append=True)
+    progress = {'baskets': [ingested_baskets], 'max_day': watermark['max_day'], 'max_week': watermark['max_week']}
+    cube = master_cube_builder()
+    cube.add_existing(CUBE_DIR)
+else:
+    for path in (output_path, CUBE_DIR):
+        if os.path.exists(path):
+            shutil.rmtree(path)
+    writer = PartitionedWriter(output_path)
+    progress = {'baskets': [ingested_baskets[:0]], 'max_day': 0, 'max_week': 0}
+    cube = master_cube_builder()
+
+
+def take_new_rows(trans):
+    """Drops already-ingested baskets (incremental mode) and advances the watermark."""
+    if incremental:
+        trans = trans[new_rows_mask(trans['BASKET_ID'], ingested_baskets)]
+    if not trans.empty:
+        progress['baskets'].append(trans['BASKET_ID'].unique())
+        progress['max_day'] = max(progress['max_day'], int(trans['DAY'].max()))
+        progress['max_week'] = max(progress['max_week'], int(trans['WEEK_NO'].max()))
+    return trans
+
+
+def save_watermark():
+    write_watermark(MASTER_WATERMARK_PREFIX, np.concatenate(progress['baskets']),
+                    progress['max_day'], progress['max_week'])
+
+
+if CHUNK_SIZE is None:
+    print("\n[Step 3/4] Merging transactions with product and demographic data...")
+    with span('merge', rows=len(df_trans)):
+        merged_df = merge_dimensions(take_new_rows(df_trans))
+
+    print("Merge complete.")
+    print(f"Merged DataFrame shape: {merged_df.shape}")
+    print(f"Merged DataFrame Memory Usage: {merged_df.memory_usage(deep=True).sum() / 1024**2:.2f} MB")
+
+    # --- 4. Save Processed Data ---
+    print(f"\n[Step 4/4] Saving processed data to {output_path}...")
+    try:
+        with span('save', rows=len(merged_df)):
+            writer.write(merged_df)
+            writer.close()
+        with span('cube', rows=len(merged_df)):
+            cube.add(merged_df)
+            cube.write(CUBE_DIR)
+        save_watermark()
+        cache.commit()
+        print("Successfully saved the merged data as a partitioned Parquet dataset.")
+    except Exception as e:
+        print(f"Error saving data: {e}")
+else:
+    # --- 3+4. Stream, merge and append row groups chunk by chunk ---
+    print(f"\n[Step 3/4] Streaming transactions in chunks of {CHUNK_SIZE:,} rows...")
+    print(f"[Step 4/4] Appending merged row groups to {output_path}...")
+    try:
+        reader = iter_source('transactions', CHUNK_SIZE)
+        for chunk_no, chunk in enumerate(reader, start=1):
+            with span('merge', rows=len(chunk)):
+                new_rows = take_new_rows(chunk)
+                merged = merge_dimensions(new_rows)
+            with span('save', rows=len(merged)):
+                writer.write(merged)
+            # Weekly sales cube cells are accumulated from the same chunks (dunnhumby_cube)
+            with span('cube', rows=len(merged)):
+                cube.add(merged)
+            print(f"  Chunk {chunk_no}: {len(new_rows):,} of {len(chunk):,} rows written ({writer.rows_written:,} total)")
+        total_rows = writer.close()
+        cube.write(CUBE_DIR)
+        save_watermark()
+        cache.commit()
+        print("Merge complete.")
+        print(f"Merged table rows: {total_rows:,}")
+        print("Successfully saved the merged data as a partitioned Parquet dataset.")
+    except Exception as e:
+        print(f"Error streaming data: {e}")
+
+if incremental:
+    print(f"Incremental run: {writer.rows_written:,} new rows, "
+          f"{len(writer.rewritten_partitions)} existing partitions rewritten.")
 
 print("\n--- Data Preprocessing and Integration Finished ---")
@@ -1,13 +1,24 @@
 
-import pandas as pd
 import os
 import matplotlib.pyplot as plt
 
+from dunnhumby_pipeline import step_cache
+from dunnhumby_profiling import span
+from dunnhumby_cube import weekly_series
+from dunnhumby_matrix import PRODUCT_MATRIX_PATH, write_series_matrix
+
 print("--- Starting Demand Forecasting Preparation (Top 50) ---")
 
+# Number of top-selling products to keep
+N = 50
+
+# Skip the step when its inputs, parameters and script are unchanged
+cache = step_cache('02a', params={'N': N})
+if cache.hit():
+    exit()
+
 # --- 1. Load Processed Data ---
 print("\n[Step 1/4] Loading processed data...")
-input_path = '.\\processed_data\\master_transaction_table.parquet'
 output_dir = '.\\processed_data'
 plots_dir = '.\\plots'
 
@@ -16,45 +27,39 @@ for directory in [output_dir, plots_dir]:
         os.makedirs(directory)
 
 try:
-    df = pd.read_parquet(input_path)
+    # Weekly product sales are pre-aggregated by 01 in the sales cube; the top N
+    # products are ranked on the cube and only their cells are read
+    with span('load') as sp:
+        ts_df = weekly_series('product', top_n=N, value='SALES_VALUE')
+        sp.rows = len(ts_df)
     print("Processed data loaded successfully.")
 except Exception as e:
     print(f"Error loading data: {e}")
     exit()
 
-# --- 2. Aggregate Weekly Sales per Product ---
-print("\n[Step 2/4] Aggregating weekly sales per product...")
-weekly_sales = df.groupby(['PRODUCT_ID', 'WEEK_NO'])['SALES_VALUE'].sum().reset_index()
-print("Weekly sales aggregation complete.")
-
-# --- 3. Identify Top N Products by Total Sales ---
-N = 50
+# --- 2/3. Weekly Sales of the Top N Products ---
+print("\n[Step 2/4] Weekly sales per product read from the sales cube.")
 print(f"\n[Step 3/4] Identifying top {N} products by total sales...")
-total_sales = weekly_sales.groupby('PRODUCT_ID')['SALES_VALUE'].sum()
-top_n_products = total_sales.nlargest(N).index.tolist()
-
 print(f"Top {N} products by sales identified.")
 
-# Filter the weekly sales data to include only the top N products
-weekly_sales_top_n = weekly_sales[weekly_sales['PRODUCT_ID'].isin(top_n_products)]
-
 # --- 4. Create and Visualize Time Series ---
+# Weeks are the index, products the columns in descending order of total sales
 print(f"\n[Step 4/4] Creating and visualizing time series for top {N} products...")
-# Pivot the table to have weeks as index and products as columns
-ts_df = weekly_sales_top_n.pivot(index='WEEK_NO', columns='PRODUCT_ID', values='SALES_VALUE').fillna(0)
-
-# Ensure all weeks from min to max are present
-all_weeks = pd.RangeIndex(start=ts_df.index.min(), stop=ts_df.index.max() + 1, name='WEEK_NO')
-ts_df = ts_df.reindex(all_weeks, fill_value=0)
-
-# Reorder columns to be in descending order of total sales
-ts_df = ts_df[top_n_products]
 
 # Save the time series data
 ts_output_path = os.path.join(output_dir, f'weekly_sales_top{N}_timeseries.parquet')
-ts_df.to_parquet(ts_output_path)
+with span('save', rows=len(ts_df)):
+    ts_df.to_parquet(ts_output_path)
 print(f"Time series data saved to {ts_output_path}")
 
+# Full-catalog matrix (every product x week, CSR) for forecasting beyond the top N.
+# Downstream code reads it with dunnhumby_matrix.SeriesMatrix, one product at a time.
+with span('catalog_matrix') as sp:
+    matrix_meta = write_series_matrix(PRODUCT_MATRIX_PATH, value='SALES_VALUE')
+    sp.rows = matrix_meta['nnz']
+print(f"Full-catalog matrix ({matrix_meta['nnz']:,} non-zero cells, {matrix_meta['n_weeks']} weeks) "
+      f"saved to {PRODUCT_MATRIX_PATH}")
+
 # Plot the time series
 plt.style.use('seaborn-v0_8-whitegrid')
 fig, ax = plt.subplots(figsize=(15, 8))
@@ -71,7 +76,9 @@ plt.tight_layout()
 
 # Save the plot
 plot_path = os.path.join(plots_dir, f'weekly_sales_top{N}.png')
-plt.savefig(plot_path)
+with span('plot'):  # rendering happens in savefig
+    plt.savefig(plot_path)
 print(f"Time series plot saved to {plot_path}")
+cache.commit()
 
 print(f"\n--- Demand Forecasting Preparation for Top {N} Finished ---")
@@ -4,17 +4,24 @@ import pmdarima as pm
 from sklearn.metrics import mean_absolute_error
 import matplotlib.pyplot as plt
 import os
-import joblib
+
+from dunnhumby_pipeline import step_cache
+from dunnhumby_profiling import span
+from dunnhumby_registry import ModelRegistry, sarima_state
 
 print("--- Starting Demand Forecasting Model Training ---")
 
+# Skip the step when its inputs, parameters and script are unchanged
+cache = step_cache('03')
+if cache.hit():
+    exit()
+
 # --- 1. Load Time Series Data ---
 print("\n[Step 1/5] Loading time series data...")
 input_path = '.\\processed_data\\weekly_sales_top5_timeseries.parquet'
-models_dir = '.\\models'
 plots_dir = '.\\plots'
 
-for directory in [models_dir, plots_dir]:
+for directory in [plots_dir]:
     if not os.path.exists(directory):
         os.makedirs(directory)
 
@@ -41,19 +48,20 @@ print(f"Test set size: {len(test)}")
 print("\n[Step 3/5] Finding best SARIMA model using auto_arima...")
 # Looking at the initial plot, a yearly seasonality (52 weeks) seems plausible.
 # Let's set m=52 for the seasonal component.
-sarima_model = pm.auto_arima(train,
-                             start_p=1, start_q=1,
-                             test='adf',       # Use ADF test to find 'd'
-                             max_p=3, max_q=3, # Max non-seasonal AR and MA order
-                             m=52,             # Yearly seasonality
-                             d=None,           # Let ADF test determine 'd'
-                             seasonal=True,    # Enable seasonality
-                             start_P=0,
-                             D=1,              # Enforce seasonal differencing
-                             trace=True,
-                             error_action='ignore',
-                             suppress_warnings=True,
-                             stepwise=True)
+with span('auto_arima', rows=len(train)):
+    sarima_model = pm.auto_arima(train,
+                                 start_p=1, start_q=1,
+                                 test='adf',       # Use ADF test to find 'd'
+                                 max_p=3, max_q=3, # Max non-seasonal AR and MA order
+                                 m=52,             # Yearly seasonality
+                                 d=None,           # Let ADF test determine 'd'
+                                 seasonal=True,    # Enable seasonality
+                                 start_P=0,
+                                 D=1,              # Enforce seasonal differencing
+                                 trace=True,
+                                 error_action='ignore',
+                                 suppress_warnings=True,
+                                 stepwise=True)
 
 print("\nBest SARIMA model summary:")
 print(sarima_model.summary())
@@ -92,12 +100,16 @@ plt.tight_layout()
 
 # Save the plot
 plot_path = os.path.join(plots_dir, f'sarima_forecast_product_{product_id}.png')
-plt.savefig(plot_path)
+with span('plot'):  # rendering happens in savefig
+    plt.savefig(plot_path)
 print(f"Forecast plot saved to {plot_path}")
 
-# Save the model
-model_path = os.path.join(models_dir, f'sarima_model_product_{product_id}.joblib')
-joblib.dump(sarima_model, model_path)
-print(f"Trained SARIMA model saved to {model_path}")
+# Save the fitted parameters to the model registry
+with ModelRegistry() as registry:
+    version = registry.put('sarima_top5', product_id, 'sarima', sarima_state(sarima_model),
+                           metadata={'order': f"{sarima_model.order}x{sarima_model.seasonal_order}", 'mae': mae,
+                                     'train_weeks': len(train)})
+print(f"Trained SARIMA model saved to the model registry (sarima_top5, version {version})")
+cache.commit()
 
 print("\n--- Demand Forecasting Model Training Finished ---")
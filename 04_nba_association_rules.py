@@ -1,20 +1,34 @@
 
-import pandas as pd
 from mlxtend.frequent_patterns import apriori, association_rules
 import os
 
+from dunnhumby_pipeline import step_cache
+from dunnhumby_profiling import span
+from dunnhumby_storage import load_master
+
 print("--- Starting Next Basket Analysis (Association Rules) ---")
 
+# Apriori parameters
+min_transactions = 5
+min_support = 0.01
+min_lift = 1
+
+# Skip the step when its inputs, parameters and script are unchanged
+cache = step_cache('04', params={'min_transactions': min_transactions, 'min_support': min_support, 'min_lift': min_lift})
+if cache.hit():
+    exit()
+
 # --- 1. Load Processed Data ---
 print("\n[Step 1/4] Loading processed data...")
-input_path = '.\processed_data\master_transaction_table.parquet'
 output_dir = '.\results'
 
 if not os.path.exists(output_dir):
     os.makedirs(output_dir)
 
 try:
-    df = pd.read_parquet(input_path)
+    with span('load') as sp:
+        df = load_master(columns=['BASKET_ID', 'COMMODITY_DESC', 'QUANTITY'])
+        sp.rows = len(df)
     print("Processed data loaded successfully.")
 except Exception as e:
     print(f"Error loading data: {e}")
@@ -31,7 +45,8 @@ print(f"\n[Step 2/4] Preparing data for Apriori using 'COMMODITY_DESC'. Using {l
 # Create the basket format: group by basket and one-hot encode commodities.
 # We sum the quantities, so if a commodity appears more than once, it gets a higher count.
 # Then, we'll binarize it (any count > 0 becomes 1).
-basket = df_cleaned.groupby(['BASKET_ID', 'COMMODITY_DESC'])['QUANTITY'].sum().unstack().fillna(0)
+with span('groupby', rows=len(df_cleaned)):
+    basket = df_cleaned.groupby(['BASKET_ID', 'COMMODITY_DESC'], observed=True)['QUANTITY'].sum().unstack().fillna(0)
 
 def encode_units(x):
     if x <= 0:
@@ -39,11 +54,11 @@ def encode_units(x):
     if x >= 1:
         return 1
 
-basket_sets = basket.applymap(encode_units)
+with span('encode', rows=len(basket)):
+    basket_sets = basket.applymap(encode_units)
 
 # Drop columns that are too sparse (e.g., appear in only 1 transaction) to reduce memory usage
 # This is a simple heuristic. A more robust approach might use a support threshold here.
-min_transactions = 5 
 item_counts = basket_sets.sum()
 items_to_keep = item_counts[item_counts >= min_transactions].index
 basket_sets = basket_sets[items_to_keep]
@@ -54,12 +69,14 @@ print(f"Data prepared. Shape of one-hot encoded matrix: {basket_sets.shape}")
 print("\n[Step 3/4] Running Apriori to find frequent itemsets...")
 # Using a low support threshold to start, as we have many items.
 # min_support = 0.01 means the itemset appears in at least 1% of all transactions.
-frequent_itemsets = apriori(basket_sets, min_support=0.01, use_colnames=True)
+with span('apriori', rows=len(basket_sets)):
+    frequent_itemsets = apriori(basket_sets, min_support=min_support, use_colnames=True)
 print(f"Found {len(frequent_itemsets)} frequent itemsets.")
 
 print("Generating association rules based on 'lift' metric...")
 # We are interested in rules that have a high lift (> 1) and reasonable confidence.
-rules = association_rules(frequent_itemsets, metric="lift", min_threshold=1)
+with span('association_rules', rows=len(frequent_itemsets)):
+    rules = association_rules(frequent_itemsets, metric="lift", min_threshold=min_lift)
 
 # Sort the rules by lift and confidence
 rules = rules.sort_values(['lift', 'confidence'], ascending=[False, False])
@@ -67,9 +84,11 @@ rules = rules.sort_values(['lift', 'confidence'], ascending=[False, False])
 # --- 4. Analyze and Save Results ---
 print("\n[Step 4/4] Analyzing and saving results...")
 output_path = os.path.join(output_dir, 'association_rules.csv')
-rules.to_csv(output_path, index=False)
+with span('save', rows=len(rules)):
+    rules.to_csv(output_path, index=False)
 
 print(f"Saved {len(rules)} association rules to {output_path}")
+cache.commit()
 
 print("\nTop 20 Association Rules (sorted by Lift):")
 # 'antecedents' and 'consequents' are frozensets, make them more readable
@@ -1,104 +1,45 @@
 
 import pandas as pd
-import pmdarima as pm
-from sklearn.metrics import mean_absolute_error
 import matplotlib.pyplot as plt
 import os
-import joblib
 import warnings
 
-warnings.filterwarnings("ignore")
-
-print("--- Starting Demand Forecasting with SARIMA (Top 50) ---")
-
-# --- 1. Load Time Series Data ---
-print("\n[Step 1/5] Loading time series data...")
-input_path = '.\\processed_data\\weekly_sales_top50_timeseries.parquet'
-models_dir = '.\\models'
-plots_dir = '.\\plots'
-
-# Ensure output directories exist
-for directory in [models_dir, plots_dir]:
-    if not os.path.exists(directory):
-        os.makedirs(directory)
-
-try:
-    ts_df = pd.read_parquet(input_path)
-    print("Time series data loaded successfully.")
-except Exception as e:
-    print(f"Error loading data: {e}")
-    exit()
+from dunnhumby_baselines import EXPENSIVE_CLASSES, classify_series
+from dunnhumby_parallel import run_parallel
+from dunnhumby_pipeline import step_cache
+from dunnhumby_profiling import span
+from dunnhumby_registry import ModelRegistry
+from dunnhumby_sarima import AUTO_ARIMA_PARAMS, OrderCache, product_clusters, sarima_task
 
-# Store results for final summary
-results = {}
-
-# --- 2. Iterate Through Products and Model ---
-product_ids = ts_df.columns
-total_products = len(product_ids)
-
-for i, product_id in enumerate(product_ids):
-    print(f"\n--- Processing Product {i+1}/{total_products}: {product_id} ---")
-    y = ts_df[product_id]
-
-    # Skip products with no sales data
-    if y.sum() == 0:
-        print(f"Skipping product {product_id} due to no sales data.")
-        continue
+warnings.filterwarnings("ignore")
 
-    # --- Split data: 80% for training, 20% for testing ---
-    train_size = int(len(y) * 0.8)
+# Products are fitted in a pool of worker processes (dunnhumby_parallel): one
+# auto_arima per task, so the loop scales with the number of cores. A product
+# that fails or runs past TASK_TIMEOUT is recorded in the results file with its
+# status instead of stopping the run.
+WORKERS = None        # Worker processes (None: one per CPU; 1 without a timeout: fit in this process)
+CHUNKSIZE = 1         # Products handed to a worker at a time
+TASK_TIMEOUT = None   # Seconds per product before its fit is killed (None: no limit)
+RETRY_FAILED = False  # Only re-fit products that failed or timed out in RESULTS_PATH and merge them in
+USE_ORDER_CACHE = True  # Seed auto_arima from the orders of earlier runs (dunnhumby_sarima.OrderCache)
+ROUTE_BY_DEMAND_CLASS = True  # Fit only smooth series; intermittent / erratic ones are left to the baselines (06c)
+TRAIN_RATIO = 0.8
+FORECAST_HORIZON = 13
+RESULTS_PATH = 'sarima_mae_results_top50.csv'
+REGISTRY_NAME = 'sarima_top50'  # Model set of the fitted models in the model registry
+
+
+def plot_forecast(product_id, y, result, plots_dir):
+    train_size = result['train_size']
     train, test = y[0:train_size], y[train_size:]
-    print(f"[Step 2/5] Data split: {len(train)} training weeks, {len(test)} test weeks.")
-
-    # --- 3. Find Best SARIMA Model ---
-    print("[Step 3/5] Finding best SARIMA model using auto_arima...")
-    try:
-        sarima_model = pm.auto_arima(train,
-                                     start_p=1, start_q=1,
-                                     test='adf',
-                                     max_p=3, max_q=3,
-                                     m=52,             # Yearly seasonality
-                                     d=None,
-                                     seasonal=True,
-                                     start_P=0,
-                                     D=1,
-                                     trace=False, # Set to False to reduce log spam
-                                     error_action='ignore',
-                                     suppress_warnings=True,
-                                     stepwise=True)
-
-        print(f"Best model for {product_id}: {sarima_model.order}x{sarima_model.seasonal_order}")
+    forecast_df = pd.DataFrame({'forecast': result['forecast']}, index=test.index[:FORECAST_HORIZON])
+    actuals_to_compare = test[:FORECAST_HORIZON]
+    conf_int = result['conf_int']
 
-    except Exception as e:
-        print(f"Could not find a suitable SARIMA model for product {product_id}. Error: {e}")
-        results[product_id] = {'mae': -1, 'order': 'Failed'}
-        continue
-
-    # --- 4. Train Model and Forecast ---
-    forecast_horizon = 13
-    if len(test) < forecast_horizon:
-        print(f"Skipping product {product_id}: Not enough test data ({len(test)} weeks) to evaluate a {forecast_horizon}-week forecast.")
-        continue
-
-    print(f"[Step 4/5] Training model and forecasting for {forecast_horizon} weeks...")
-    # The model is already fitted by auto_arima. We can now make predictions.
-    forecast, conf_int = sarima_model.predict(n_periods=forecast_horizon, return_conf_int=True)
-
-    # Create a DataFrame for the forecast
-    forecast_df = pd.DataFrame({'forecast': forecast}, index=test.index[:forecast_horizon])
-    actuals_to_compare = test[:forecast_horizon]
-
-    # --- 5. Evaluate and Visualize ---
-    print("[Step 5/5] Evaluating model and visualizing results...")
-    mae = mean_absolute_error(actuals_to_compare, forecast_df['forecast'])
-    results[product_id] = {'mae': mae, 'order': f"{sarima_model.order}x{sarima_model.seasonal_order}"}
-    print(f"Mean Absolute Error (MAE) for {forecast_horizon} weeks: {mae:.2f}")
-
-    # Plotting the results
     plt.style.use('seaborn-v0_8-whitegrid')
     fig, ax = plt.subplots(figsize=(15, 8))
     ax.plot(train, label='Training Data')
-    ax.plot(actuals_to_compare, label=f'Actual Test Data ({forecast_horizon} weeks)', color='orange')
+    ax.plot(actuals_to_compare, label=f'Actual Test Data ({FORECAST_HORIZON} weeks)', color='orange')
     ax.plot(forecast_df, label='SARIMA Forecast', color='green', linestyle='--')
     ax.fill_between(forecast_df.index,
                     conf_int[:, 0],
@@ -114,30 +55,143 @@ for i, product_id in enumerate(product_ids):
 
     # Save the plot
     plot_path = os.path.join(plots_dir, f'sarima_forecast_product_{product_id}.png')
-    plt.savefig(plot_path)
+    with span('plot'):  # rendering happens in savefig
+        plt.savefig(plot_path)
     plt.close(fig) # Close the figure to free up memory
-    print(f"Forecast plot saved to {plot_path}")
-
-    # Save the model
-    model_path = os.path.join(models_dir, f'sarima_model_product_{product_id}.joblib')
-    joblib.dump(sarima_model, model_path)
-    print(f"Trained SARIMA model saved to {model_path}")
-
-
-# --- Final Summary ---
-print("\n\n--- SARIMA Modeling Complete ---")
-if results:
-    print("Summary of Mean Absolute Errors (MAE) for 13-week forecast:")
-    # Sort results by MAE for easier review
-    sorted_results = sorted(results.items(), key=lambda item: item[1]['mae'])
-    for product_id, metrics in sorted_results:
-        print(f"  - Product {product_id}: {metrics['mae']:.2f} (Order: {metrics['order']})")
-
-    # Save results to a file for later comparison
-    results_df = pd.DataFrame(results).T
-    results_df.to_csv('sarima_mae_results_top50.csv')
-    print("\nResults saved to sarima_mae_results_top50.csv")
-else:
-    print("No products were successfully modeled.")
-
-print("\n--- Demand Forecasting with SARIMA Finished ---")
+    return plot_path
+
+
+def main():
+    print("--- Starting Demand Forecasting with SARIMA (Top 50) ---")
+
+    # Skip the step when its inputs, parameters and script are unchanged
+    cache = step_cache('04a', params={'train_ratio': TRAIN_RATIO, 'm': AUTO_ARIMA_PARAMS['m'],
+                                      'timeout': TASK_TIMEOUT, 'retry_failed': RETRY_FAILED,
+                                      'order_cache': USE_ORDER_CACHE, 'route': ROUTE_BY_DEMAND_CLASS})
+    if cache.hit():
+        exit()
+
+    # --- 1. Load Time Series Data ---
+    print("\n[Step 1/5] Loading time series data...")
+    input_path = '.\\processed_data\\weekly_sales_top50_timeseries.parquet'
+    plots_dir = '.\\plots'
+
+    # Ensure output directories exist
+    for directory in [plots_dir]:
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    try:
+        with span('load') as sp:
+            ts_df = pd.read_parquet(input_path)
+            sp.rows = len(ts_df)
+        print("Time series data loaded successfully.")
+    except Exception as e:
+        print(f"Error loading data: {e}")
+        exit()
+
+    # Results of an earlier run are kept for every product that was modeled successfully
+    previous = None
+    product_ids = list(ts_df.columns)
+    if RETRY_FAILED and os.path.exists(RESULTS_PATH):
+        previous = pd.read_csv(RESULTS_PATH, index_col=0)
+        previous.index = previous.index.astype(str)
+        ok = previous['status'] == 'ok' if 'status' in previous.columns else previous['mae'] != -1
+        done = set(previous.index[ok])
+        product_ids = [p for p in product_ids if str(p) not in done]
+        print(f"Retrying {len(product_ids)} products that failed or timed out in {RESULTS_PATH}.")
+
+    if ROUTE_BY_DEMAND_CLASS:
+        classes = classify_series(ts_df[product_ids])
+        expensive = classes['demand_class'].isin(EXPENSIVE_CLASSES)
+        for product_id, row in classes[~expensive].iterrows():
+            print(f"Skipping product {product_id}: {row['demand_class']} demand "
+                  f"(ADI {row['adi']:.2f}, CV² {row['cv2']:.2f}), left to the baseline models.")
+        product_ids = classes.index[expensive].tolist()
+        if previous is not None:
+            # A retried product now left to the baselines keeps no stale failed / timeout row
+            previous = previous.drop(index=classes.index[~expensive].astype(str), errors='ignore')
+
+    # --- 2-4. Split, find the best SARIMA model and forecast, one task per product ---
+    order_cache = OrderCache(AUTO_ARIMA_PARAMS, product_clusters(), name='04a') if USE_ORDER_CACHE else None
+    tasks = [(product_id, {
+        'product_id': product_id,
+        'y': ts_df[product_id],
+        'train_ratio': TRAIN_RATIO,
+        'horizon': FORECAST_HORIZON,
+        'save_model': True,
+        'order_seed': order_cache.seed(product_id) if order_cache else None,
+    }) for product_id in product_ids]
+    total_products = len(tasks)
+    print(f"\n[Step 2-4/5] Fitting auto_arima for {total_products} products "
+          f"(workers: {WORKERS or 'all CPUs'}, chunk size: {CHUNKSIZE}, timeout: {TASK_TIMEOUT or 'none'})...")
+
+    # Store results for final summary; fitted models go to the registry
+    results = {}
+    finished = [0]
+    registry = ModelRegistry()
+
+    # --- 5. Evaluate and Visualize (in this process, as each product finishes) ---
+    def on_result(product_id, record):
+        finished[0] += 1
+        prefix = f"[{finished[0]}/{total_products}] Product {product_id}"
+        result = record['result']
+        if record['status'] == 'ok' and 'skipped' in result:
+            print(f"{prefix}: skipped ({result['skipped']}).")
+            return
+        if record['status'] != 'ok':
+            print(f"{prefix}: {record['status']} after {record['seconds']:.1f}s. Error: {record['error']}")
+            results[product_id] = {'mae': -1, 'order': record['status'].capitalize(),
+                                   'status': record['status'], 'error': record['error'],
+                                   'seconds': record['seconds'], 'search': None}
+            return
+
+        search = result['order_entry']['search']
+        results[product_id] = {'mae': result['mae'], 'order': result['order'], 'status': 'ok',
+                               'error': None, 'seconds': record['seconds'], 'search': search}
+        if order_cache:
+            order_cache.update(product_id, result['order_entry'])
+        print(f"{prefix}: {result['order']} ({search} search), MAE for {FORECAST_HORIZON} weeks: "
+              f"{result['mae']:.2f} ({record['seconds']:.1f}s)")
+        plot_forecast(product_id, ts_df[product_id], result, plots_dir)
+        with span('save'):
+            registry.put(REGISTRY_NAME, product_id, 'sarima', result['model_state'],
+                         metadata={'order': result['order'], 'mae': result['mae'], 'train_weeks': result['train_size'],
+                                   'horizon': FORECAST_HORIZON})
+
+    with span('fit', rows=total_products):
+        run_parallel(sarima_task, tasks, workers=WORKERS, chunksize=CHUNKSIZE, timeout=TASK_TIMEOUT,
+                     on_result=on_result)
+    registry.close()
+    if order_cache:
+        order_cache.save()
+
+    # --- Final Summary ---
+    print("\n\n--- SARIMA Modeling Complete ---")
+    # With earlier results, rewrite the file even when nothing was re-fitted (routed-away rows dropped)
+    if results or previous is not None:
+        results_df = pd.DataFrame(results).T
+        if previous is not None:
+            # Merge: re-fitted products replace their earlier rows
+            results_df.index = results_df.index.astype(str)
+            results_df = pd.concat([previous.drop(index=results_df.index, errors='ignore'), results_df])
+
+        print("Summary of Mean Absolute Errors (MAE) for 13-week forecast:")
+        # Sort results by MAE for easier review
+        results_df = results_df.sort_values('mae', key=lambda s: s.astype(float))
+        for product_id, metrics in results_df.iterrows():
+            print(f"  - Product {product_id}: {float(metrics['mae']):.2f} (Order: {metrics['order']})")
+
+        # Save results to a file for later comparison
+        results_df.to_csv(RESULTS_PATH)
+        print(f"\nResults saved to {RESULTS_PATH}")
+        cache.commit()
+    else:
+        print("No products were successfully modeled.")
+
+    print("\n--- Demand Forecasting with SARIMA Finished ---")
+
+
+# Workers may be spawned (Windows), which re-imports this script: run only as the main module
+if __name__ == '__main__':
+    main()
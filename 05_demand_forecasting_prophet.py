@@ -1,127 +1,170 @@
-
 import pandas as pd
-from prophet import Prophet
 from sklearn.metrics import mean_absolute_error
 import matplotlib.pyplot as plt
 import os
-import joblib
-import logging
-
-# Suppress verbose logging from Prophet
-logging.getLogger('prophet').setLevel(logging.WARNING)
-logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
-
-print("--- Starting Demand Forecasting with Prophet (Top 50) ---")
-
-# --- 1. Load and Prepare Data ---
-print("\n[Step 1/5] Loading and preparing time series data...")
-input_path = '.\\\\processed_data\\\\weekly_sales_top50_timeseries.parquet'
-models_dir = '.\\\\models'
-plots_dir = '.\\\\plots'
-
-# Ensure output directories exist
-for directory in [models_dir, plots_dir]:
-    if not os.path.exists(directory):
-        os.makedirs(directory)
-
-try:
-    ts_df = pd.read_parquet(input_path)
-    # Prophet requires the columns to be named 'ds' and 'y'
-    # Create a dummy date range starting from 2020-01-01 with weekly frequency.
-    start_date = pd.to_datetime('2020-01-01')
-    ts_df['ds'] = start_date + pd.to_timedelta(ts_df.index * 7, 'D')
-    print("Time series data loaded and 'ds' column created.")
-except Exception as e:
-    print(f"Error loading data: {e}")
-    exit()
-
-# Store results for final summary
-results = {}
-
-# --- 2. Iterate Through Products and Model ---
-product_ids = ts_df.columns.drop('ds')
-total_products = len(product_ids)
-
-for i, product_id in enumerate(product_ids):
-    print(f"\n--- Processing Product {i+1}/{total_products}: {product_id} ---")
-
-    # --- Prepare data for the current product ---
-    product_df = ts_df[['ds', product_id]].rename(columns={product_id: 'y'})
-    
-    # Skip products with no sales data
-    if product_df['y'].sum() == 0:
-        print(f"Skipping product {product_id} due to no sales data.")
-        continue
-
-    # --- Split data: 80% for training, 20% for testing ---
-    train_size = int(len(product_df) * 0.8)
+
+from dunnhumby_baselines import EXPENSIVE_CLASSES, classify_series
+from dunnhumby_parallel import run_parallel
+from dunnhumby_pipeline import step_cache
+from dunnhumby_profiling import span
+from dunnhumby_prophet import prophet_task
+from dunnhumby_registry import ModelRegistry
+
+# Products are fitted in a pool of worker processes by dunnhumby_prophet, which
+# loads the Stan model once per worker. A product that fails or runs past
+# TASK_TIMEOUT is reported and left out of the results.
+WORKERS = None        # Worker processes (None: one per CPU; 1 without a timeout: fit in this process)
+CHUNKSIZE = 1         # Products handed to a worker at a time
+TASK_TIMEOUT = None   # Seconds per product before its fit is killed (None: no limit)
+ROUTE_BY_DEMAND_CLASS = True  # Fit only smooth series; intermittent / erratic ones are left to the baselines (06c)
+TRAIN_RATIO = 0.8
+FORECAST_HORIZON = 13
+REGISTRY_NAME = 'prophet_top50'  # Model set of the fitted models in the model registry
+
+
+def plot_forecast(product_id, product_df, train_size, forecast, plots_dir):
+    # Same layout as Prophet's model.plot(forecast); the model itself stays in the worker
     train_df = product_df.iloc[:train_size]
-    test_df = product_df.iloc[train_size:]
-    print(f"[Step 2/5] Data split: {len(train_df)} training weeks, {len(test_df)} test weeks.")
-
-    # --- 3. Initialize and Train Prophet Model ---
-    print("[Step 3/5] Initializing and training Prophet model...")
-    model = Prophet(yearly_seasonality=True, weekly_seasonality=False, daily_seasonality=False)
-    model.fit(train_df)
-
-    # --- 4. Forecast for the Next 13 Weeks ---
-    forecast_horizon = 13
-    if len(test_df) < forecast_horizon:
-        print(f"Skipping product {product_id}: Not enough test data ({len(test_df)} weeks) to evaluate a {forecast_horizon}-week forecast.")
-        continue
-        
-    print(f"[Step 4/5] Forecasting for the next {forecast_horizon} weeks...")
-    
-    # Create a future dataframe for predictions
-    future = model.make_future_dataframe(periods=forecast_horizon, freq='W')
-    forecast = model.predict(future)
-
-    # Isolate the 13-week forecast to compare with test data
-    forecast_to_compare = forecast.iloc[-forecast_horizon:]
-    actuals_to_compare = test_df.iloc[:forecast_horizon]
-
-    # --- 5. Evaluate and Visualize ---
-    print("[Step 5/5] Evaluating model and visualizing results...")
-    mae = mean_absolute_error(actuals_to_compare['y'], forecast_to_compare['yhat'])
-    results[product_id] = {'mae': mae}
-    print(f"Mean Absolute Error (MAE) for {forecast_horizon} weeks: {mae:.2f}")
-
-    # Plotting the results
-    fig = model.plot(forecast)
-    ax = fig.gca()
+    actuals_to_compare = product_df.iloc[train_size:train_size + FORECAST_HORIZON]
+
+    fig, ax = plt.subplots(facecolor='w', figsize=(10, 6))
+    ax.plot(train_df['ds'], train_df['y'], 'k.', label='Observed data points')
+    ax.plot(forecast['ds'], forecast['yhat'], ls='-', c='#0072B2', label='Forecast')
+    ax.fill_between(forecast['ds'], forecast['yhat_lower'], forecast['yhat_upper'],
+                    color='#0072B2', alpha=0.2, label='Uncertainty interval')
+    ax.grid(True, which='major', c='gray', ls='-', lw=1, alpha=0.2)
     # Add actuals to the plot
-    ax.plot(actuals_to_compare['ds'], actuals_to_compare['y'], 'r.', label=f'Actual Test Data ({forecast_horizon} weeks)')
+    ax.plot(actuals_to_compare['ds'], actuals_to_compare['y'], 'r.', label=f'Actual Test Data ({FORECAST_HORIZON} weeks)')
     ax.set_title(f'Prophet Forecast for Product {product_id}', fontsize=16)
     ax.set_xlabel('Date')
     ax.set_ylabel('Sales Value ($)')
     ax.legend()
-    
+    fig.tight_layout()
+
     # Save the plot
     plot_path = os.path.join(plots_dir, f'prophet_forecast_product_{product_id}.png')
-    fig.savefig(plot_path)
+    with span('plot'):  # rendering happens in savefig
+        fig.savefig(plot_path)
     plt.close(fig) # Close the figure to free up memory
-    print(f"Forecast plot saved to {plot_path}")
-
-    # Save the model
-    model_path = os.path.join(models_dir, f'prophet_model_product_{product_id}.joblib')
-    joblib.dump(model, model_path)
-    print(f"Trained Prophet model saved to {model_path}")
-
-
-# --- Final Summary ---
-print("\n\n--- Prophet Modeling Complete ---")
-if results:
-    print("Summary of Mean Absolute Errors (MAE) for 13-week forecast:")
-    # Sort results by MAE for easier review
-    sorted_results = sorted(results.items(), key=lambda item: item[1]['mae'])
-    for product_id, metrics in sorted_results:
-        print(f"  - Product {product_id}: {metrics['mae']:.2f}")
-
-    # Save results to a file for later comparison
-    results_df = pd.DataFrame(results).T
-    results_df.to_csv('prophet_mae_results_top50.csv')
-    print("\nResults saved to prophet_mae_results_top50.csv")
-else:
-    print("No products were successfully modeled.")
-
-print("\n--- Demand Forecasting with Prophet Finished ---")
+    return plot_path
+
+
+def main():
+    print("--- Starting Demand Forecasting with Prophet (Top 50) ---")
+
+    # Skip the step when its inputs, parameters and script are unchanged
+    cache = step_cache('05', params={'train_ratio': TRAIN_RATIO, 'timeout': TASK_TIMEOUT,
+                                     'route': ROUTE_BY_DEMAND_CLASS})
+    if cache.hit():
+        exit()
+
+    # --- 1. Load and Prepare Data ---
+    print("\n[Step 1/5] Loading and preparing time series data...")
+    input_path = '.\\\\processed_data\\\\weekly_sales_top50_timeseries.parquet'
+    plots_dir = '.\\\\plots'
+
+    # Ensure output directories exist
+    for directory in [plots_dir]:
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    try:
+        with span('load') as sp:
+            ts_df = pd.read_parquet(input_path)
+            sp.rows = len(ts_df)
+        # Prophet requires the columns to be named 'ds' and 'y'
+        # Create a dummy date range starting from 2020-01-01 with weekly frequency.
+        start_date = pd.to_datetime('2020-01-01')
+        ts_df['ds'] = start_date + pd.to_timedelta(ts_df.index * 7, 'D')
+        print("Time series data loaded and 'ds' column created.")
+    except Exception as e:
+        print(f"Error loading data: {e}")
+        exit()
+
+    # --- 2. Split data (80% for training, 20% for testing) and build one task per product ---
+    train_size = int(len(ts_df) * TRAIN_RATIO)
+    test_size = len(ts_df) - train_size
+    tasks = []
+    classes = classify_series(ts_df.drop(columns='ds'))
+    for product_id in ts_df.columns.drop('ds'):
+        if ts_df[product_id].sum() == 0:
+            print(f"Skipping product {product_id} due to no sales data.")
+            continue
+        demand_class = classes.at[product_id, 'demand_class']
+        if ROUTE_BY_DEMAND_CLASS and demand_class not in EXPENSIVE_CLASSES:
+            print(f"Skipping product {product_id}: {demand_class} demand, left to the baseline models.")
+            continue
+        if test_size < FORECAST_HORIZON:
+            print(f"Skipping product {product_id}: Not enough test data ({test_size} weeks) to evaluate a {FORECAST_HORIZON}-week forecast.")
+            continue
+        tasks.append((product_id, {
+            'product_id': product_id,
+            'ds': ts_df['ds'].values,
+            'y': ts_df[product_id].values,
+            'backtest_split': train_size,
+            'backtest_horizon': FORECAST_HORIZON,
+            'forecast_horizon': None,
+            'save_model': True,
+        }))
+    total_products = len(tasks)
+    print(f"\n[Step 2-4/5] Data split: {train_size} training weeks, {test_size} test weeks. "
+          f"Fitting Prophet for {total_products} products "
+          f"(workers: {WORKERS or 'all CPUs'}, chunk size: {CHUNKSIZE}, timeout: {TASK_TIMEOUT or 'none'})...")
+
+    # Store results for final summary; fitted models go to the registry
+    results = {}
+    finished = [0]
+    registry = ModelRegistry()
+
+    # --- 5. Evaluate and Visualize (in this process, as each product finishes) ---
+    def on_result(product_id, record):
+        finished[0] += 1
+        prefix = f"[{finished[0]}/{total_products}] Product {product_id}"
+        result = record['result']
+        error = record['error'] if record['status'] != 'ok' else result['backtest_error']
+        if error is not None:
+            print(f"{prefix}: {record['status']} after {record['seconds']:.1f}s. Error: {error}")
+            return
+
+        # Isolate the 13-week forecast to compare with test data
+        forecast = result['backtest']
+        product_df = ts_df[['ds', product_id]].rename(columns={product_id: 'y'})
+        actuals_to_compare = product_df.iloc[train_size:train_size + FORECAST_HORIZON]
+        mae = mean_absolute_error(actuals_to_compare['y'], forecast['yhat'].iloc[-FORECAST_HORIZON:])
+        results[product_id] = {'mae': mae}
+        print(f"{prefix}: MAE for {FORECAST_HORIZON} weeks: {mae:.2f} ({record['seconds']:.1f}s)")
+
+        plot_forecast(product_id, product_df, train_size, forecast, plots_dir)
+        if result.get('model_state') is not None:
+            with span('save'):
+                registry.put(REGISTRY_NAME, product_id, 'prophet', result['model_state'],
+                             metadata={'mae': mae, 'train_weeks': train_size, 'horizon': FORECAST_HORIZON})
+
+    with span('fit', rows=total_products):
+        run_parallel(prophet_task, tasks, workers=WORKERS, chunksize=CHUNKSIZE, timeout=TASK_TIMEOUT,
+                     on_result=on_result)
+    registry.close()
+
+    # --- Final Summary ---
+    print("\n\n--- Prophet Modeling Complete ---")
+    if results:
+        print("Summary of Mean Absolute Errors (MAE) for 13-week forecast:")
+        # Sort results by MAE for easier review
+        sorted_results = sorted(results.items(), key=lambda item: item[1]['mae'])
+        for product_id, metrics in sorted_results:
+            print(f"  - Product {product_id}: {metrics['mae']:.2f}")
+
+        # Save results to a file for later comparison
+        results_df = pd.DataFrame(results).T
+        results_df.to_csv('prophet_mae_results_top50.csv')
+        print("\nResults saved to prophet_mae_results_top50.csv")
+        cache.commit()
+    else:
+        print("No products were successfully modeled.")
+
+    print("\n--- Demand Forecasting with Prophet Finished ---")
+
+
+# Workers may be spawned (Windows), which re-imports this script: run only as the main module
+if __name__ == '__main__':
+    main()
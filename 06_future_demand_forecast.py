@@ -1,213 +1,346 @@
 
 import pandas as pd
-import pmdarima as pm
-from prophet import Prophet
 import matplotlib.pyplot as plt
 from sklearn.metrics import mean_absolute_error, mean_squared_error
 import numpy as np
 import os
-import joblib
 import warnings
-import logging
+from collections import Counter
+
+from dunnhumby_baselines import EXPENSIVE_CLASSES, baseline_forecast
+from dunnhumby_matrix import PRODUCT_MATRIX_PATH, SeriesMatrix
+from dunnhumby_parallel import run_parallel
+from dunnhumby_pipeline import step_cache
+from dunnhumby_profiling import span
+from dunnhumby_prophet import prophet_task
+from dunnhumby_registry import ModelRegistry, forecast
+from dunnhumby_sarima import FAST_AUTO_ARIMA_PARAMS, OrderCache, product_clusters, sarima_forecast_task
 
 # Suppress warnings and logs
 warnings.filterwarnings("ignore")
-logging.getLogger('prophet').setLevel(logging.WARNING)
-logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
-
-print("--- Starting Future Demand Forecasting with Backtesting ---")
-
-# --- 1. Load Data ---
-print("\n[Step 1/5] Loading time series data...")
-
-# --- Directories ---
-input_path = '.\\processed_data\\weekly_sales_top50_timeseries.parquet'
-output_dir = '.\\results\\forecasts'
-plots_dir = '.\\plots\\future_forecasts'
-validation_plots_dir = '.\\plots\\validation'
-models_dir = '.\\models\\prophet_forecast_models'
-
-for directory in [output_dir, plots_dir, validation_plots_dir, models_dir]:
-    if not os.path.exists(directory):
-        os.makedirs(directory)
-
-try:
-    ts_df = pd.read_parquet(input_path)
-    # Create 'ds' column for Prophet
-    start_date = pd.to_datetime('2020-01-01')
-    ts_df['ds'] = start_date + pd.to_timedelta(ts_df.index * 7, 'D')
-    print("Data loaded successfully.")
-except Exception as e:
-    print(f"Error loading data: {e}")
-    exit()
-
-# List to store all forecast results
-all_forecasts = []
-# List to store backtesting metrics
-validation_metrics = []
-
-# --- 2. Iterate Through Products ---
-product_ids = ts_df.columns.drop('ds')
-total_products = len(product_ids)
+
 forecast_horizon = 12
 backtest_horizon = 4 # Validation window size (weeks)
 
-print(f"\nForecasting horizon: {forecast_horizon} weeks")
-print(f"Backtesting horizon: {backtest_horizon} weeks")
-
-for i, product_id in enumerate(product_ids):
-    print(f"\n--- Processing Product {i+1}/{total_products}: {product_id} ---")
-    
-    # Prepare data
-    prod_data = ts_df[['ds', product_id]].rename(columns={product_id: 'y'})
-    y = prod_data['y']
-    
-    if y.sum() == 0:
-        print(f"Skipping product {product_id} (no sales).")
-        continue
-
-    # --- 3. Backtesting (Validation) ---
-    print("  > Running Backtest (Validation)...")
-    try:
-        # Split Data
-        train_df = prod_data.iloc[:-backtest_horizon]
-        test_df = prod_data.iloc[-backtest_horizon:]
-        
-        # Train Prophet on 'train_df'
-        m_val = Prophet(yearly_seasonality=True, weekly_seasonality=False, daily_seasonality=False)
-        m_val.fit(train_df)
-        
-        # Predict on 'test_df' period
-        future_val = m_val.make_future_dataframe(periods=backtest_horizon, freq='W')
-        forecast_val = m_val.predict(future_val).iloc[-backtest_horizon:]
-        
-        # Calculate Metrics
-        mae = mean_absolute_error(test_df['y'], forecast_val['yhat'])
-        rmse = np.sqrt(mean_squared_error(test_df['y'], forecast_val['yhat']))
-        
-        metric_res = {
-            'Product_ID': product_id,
-            'MAE': mae,
-            'RMSE': rmse,
-            'Test_Mean': test_df['y'].mean()
-        }
-        validation_metrics.append(metric_res)
-        
-        # Validation Plot
-        plt.figure(figsize=(10, 5))
-        plt.plot(prod_data['ds'].iloc[-20:], prod_data['y'].iloc[-20:], label='Actual (Recent)', color='black', alpha=0.5)
-        plt.plot(test_df['ds'], test_df['y'], label='Actual (Test)', color='green', marker='o')
-        plt.plot(test_df['ds'], forecast_val['yhat'], label='Predicted (Backtest)', color='red', linestyle='--')
-        plt.title(f"Backtest Validation (Product {product_id}): MAE={mae:.2f}")
-        plt.legend()
-        val_plot_path = os.path.join(validation_plots_dir, f'validation_{product_id}.png')
-        plt.savefig(val_plot_path)
-        plt.close()
-        
-    except Exception as e:
-        print(f"    Backtest Failed: {e}")
+# Prophet and SARIMA fits run in pools of worker processes (dunnhumby_parallel).
+# Each Prophet task fits the backtest model and then the full-data model,
+# warm-started from the backtest fit (dunnhumby_prophet).
+WORKERS = None        # Worker processes (None: one per CPU; 1 without a timeout: fit in this process)
+CHUNKSIZE = 1         # Products handed to a worker at a time
+TASK_TIMEOUT = None   # Seconds per product and model before its fit is killed (None: no limit)
+WARM_START = True     # Start the full-data Prophet fit from the backtest fit's parameters
+USE_ORDER_CACHE = True  # Seed auto_arima from the orders of earlier runs (dunnhumby_sarima.OrderCache)
+TOP_N = None          # None: the top-50 series of 02a; a number: the top N products of the full-catalog matrix
+ROUTE_BY_DEMAND_CLASS = True  # Fit SARIMA / Prophet only for smooth series; the rest get their baseline
+# The full-data fits are stored in the model registry (dunnhumby_registry). With
+# FORECAST_ONLY nothing is fitted or backtested: SARIMA and Prophet forecast from
+# the stored models of the last fitting run (which must have used the same data).
+FORECAST_ONLY = False
+PROPHET_REGISTRY_NAME = 'prophet_forecast'
+SARIMA_REGISTRY_NAME = 'sarima_forecast'
 
-    # --- 4. SARIMA Model (Full Data) ---
-    print("  > Training SARIMA (Fast Mode)...")
-    try:
-        sarima_model = pm.auto_arima(y,
-                                     start_p=1, start_q=1,
-                                     test='adf',
-                                     max_p=3, max_q=3,
-                                     m=1,
-                                     seasonal=False,
-                                     start_P=0, D=0,
-                                     trace=False,
-                                     error_action='ignore',
-                                     suppress_warnings=True,
-                                     stepwise=True)
-        
-        sarima_forecast, sarima_conf_int = sarima_model.predict(n_periods=forecast_horizon, return_conf_int=True)
-    except Exception as e:
-        print(f"    SARIMA Failed: {e}")
-        sarima_forecast = pd.Series([None] * forecast_horizon)
-        sarima_conf_int = [[None, None]] * forecast_horizon
 
-    # --- 5. Prophet Model (Full Data) ---
-    print("  > Training Prophet (Full)...")
-    try:
-        prophet_model = Prophet(yearly_seasonality=True, weekly_seasonality=False, daily_seasonality=False)
-        prophet_model.fit(prod_data)
-        
-        # Save Prophet Model
-        model_path = os.path.join(models_dir, f'prophet_model_{product_id}.joblib')
-        joblib.dump(prophet_model, model_path)
-        
-        future = prophet_model.make_future_dataframe(periods=forecast_horizon, freq='W')
-        prophet_forecast_full = prophet_model.predict(future)
-        
-        prophet_future = prophet_forecast_full.iloc[-forecast_horizon:]
-        prophet_values = prophet_future['yhat'].values
-        prophet_lower = prophet_future['yhat_lower'].values
-        prophet_upper = prophet_future['yhat_upper'].values
-    except Exception as e:
-        print(f"    Prophet Failed: {e}")
-        prophet_values = [None] * forecast_horizon
-        prophet_lower = [None] * forecast_horizon
-        prophet_upper = [None] * forecast_horizon
+def load_series(input_path):
+    """Week x product frame of the products to forecast."""
+    if TOP_N is None:
+        return pd.read_parquet(input_path)
+    matrix = SeriesMatrix(PRODUCT_MATRIX_PATH)
+    top = matrix.totals().nlargest(TOP_N).index
+    return pd.DataFrame({product_id: matrix.series(product_id) for product_id in top})
 
-    # --- 6. Compile Results & Plot ---
-    last_date = prod_data['ds'].iloc[-1]
-    future_dates = [last_date + pd.Timedelta(weeks=x+1) for x in range(forecast_horizon)]
-    
-    for j in range(forecast_horizon):
-        s_val = None
-        if isinstance(sarima_forecast, pd.Series):
-             s_val = sarima_forecast.iloc[j]
-        elif isinstance(sarima_forecast, (list, np.ndarray)):
-             s_val = sarima_forecast[j]
-             
-        all_forecasts.append({
-            'Product_ID': product_id,
-            'Date': future_dates[j],
-            'Forecast_Week': j + 1,
-            'SARIMA_Forecast': s_val,
-            'Prophet_Forecast': prophet_values[j] if prophet_values[j] is not None else None,
-            'Prophet_Lower': prophet_lower[j] if prophet_lower[j] is not None else None,
-            'Prophet_Upper': prophet_upper[j] if prophet_upper[j] is not None else None
-        })
-
-    # Plotting
+
+def stored_prophet_task(payload):
+    """prophet_task's result from a stored model (payload: record from the registry or None, horizon)."""
+    if payload['record'] is None:
+        raise LookupError("no stored Prophet model")
+    return {'backtest': None, 'backtest_error': None, 'forecast': forecast(payload['record'], payload['horizon']),
+            'forecast_error': None, 'warm_started': False, 'fit_seconds': {}}
+
+
+def stored_sarima_task(payload):
+    """sarima_forecast_task's result from a stored model (payload: record from the registry or None, horizon)."""
+    if payload['record'] is None:
+        raise LookupError("no stored SARIMA model")
+    predicted = forecast(payload['record'], payload['horizon'])
+    return {'order': str(payload['record']['metadata'].get('order')), 'forecast': predicted['yhat'].to_numpy(),
+            'conf_int': predicted[['yhat_lower', 'yhat_upper']].to_numpy(), 'order_entry': None}
+
+
+def plot_validation(product_id, prod_data, test_df, forecast_val, mae, validation_plots_dir):
+    plt.figure(figsize=(10, 5))
+    plt.plot(prod_data['ds'].iloc[-20:], prod_data['y'].iloc[-20:], label='Actual (Recent)', color='black', alpha=0.5)
+    plt.plot(test_df['ds'], test_df['y'], label='Actual (Test)', color='green', marker='o')
+    plt.plot(test_df['ds'], forecast_val['yhat'], label='Predicted (Backtest)', color='red', linestyle='--')
+    plt.title(f"Backtest Validation (Product {product_id}): MAE={mae:.2f}")
+    plt.legend()
+    val_plot_path = os.path.join(validation_plots_dir, f'validation_{product_id}.png')
+    with span('backtest_plot'):
+        plt.savefig(val_plot_path)
+    plt.close()
+
+
+def plot_future(product_id, prod_data, future_dates, sarima_forecast, prophet_values, prophet_lower,
+                prophet_upper, baseline_values, baseline_model, plots_dir):
     plt.style.use('seaborn-v0_8-whitegrid')
     fig, ax = plt.subplots(figsize=(12, 6))
-    
+
     ax.plot(prod_data['ds'], prod_data['y'], label='Historical Sales', color='black', alpha=0.9, linewidth=1.5)
-    
-    if isinstance(sarima_forecast, pd.Series) and sarima_forecast.iloc[0] is not None:
-        ax.plot(future_dates, sarima_forecast, label='SARIMA Forecast', color='green', linestyle='--', linewidth=2)
-    elif isinstance(sarima_forecast, (list, np.ndarray)) and sarima_forecast[0] is not None:
+
+    if sarima_forecast[0] is not None:
         ax.plot(future_dates, sarima_forecast, label='SARIMA Forecast', color='green', linestyle='--', linewidth=2)
 
     if prophet_values[0] is not None:
         ax.plot(future_dates, prophet_values, label='Prophet Forecast', color='blue', linestyle=':', linewidth=2)
         ax.fill_between(future_dates, prophet_lower, prophet_upper, color='blue', alpha=0.1)
 
+    ax.plot(future_dates, baseline_values, label=f'Baseline ({baseline_model})', color='gray', linestyle='-.',
+            linewidth=1.5)
+
     ax.set_title(f'Future Demand Forecast (Next 12 Weeks): Product {product_id}', fontsize=14)
     ax.set_xlabel('Date')
     ax.set_ylabel('Sales Volume')
     ax.legend()
     ax.grid(True, alpha=0.3)
-    
+
     plot_path = os.path.join(plots_dir, f'forecast_{product_id}.png')
-    plt.savefig(plot_path)
+    with span('plot'):  # rendering happens in savefig
+        plt.savefig(plot_path)
     plt.close(fig)
 
-# --- 7. Save CSVs ---
-print("\n[Step 5/5] Saving results...")
-results_df = pd.DataFrame(all_forecasts)
-output_csv = os.path.join(output_dir, 'future_demand_forecasts_top50.csv')
-results_df.to_csv(output_csv, index=False)
-print(f"Forecasts saved to: {output_csv}")
 
-# Save Metrics
-metrics_df = pd.DataFrame(validation_metrics)
-metrics_csv = 'prophet_backtest_metrics.csv'
-metrics_df.to_csv(metrics_csv, index=False)
-print(f"Backtest metrics saved to: {metrics_csv}")
+def main():
+    print("--- Starting Future Demand Forecasting with Backtesting ---")
+
+    # Skip the step when its inputs, parameters and script are unchanged (in
+    # forecast-only mode, also the stored models)
+    registry = ModelRegistry()
+    params = {'forecast_horizon': forecast_horizon, 'backtest_horizon': backtest_horizon,
+              'timeout': TASK_TIMEOUT, 'warm_start': WARM_START, 'top_n': TOP_N,
+              'order_cache': USE_ORDER_CACHE, 'route': ROUTE_BY_DEMAND_CLASS, 'forecast_only': FORECAST_ONLY}
+    if FORECAST_ONLY:
+        params['registry'] = [registry.revision(PROPHET_REGISTRY_NAME), registry.revision(SARIMA_REGISTRY_NAME)]
+    cache = step_cache('06', params=params)
+    if cache.hit():
+        exit()
+
+    # --- 1. Load Data ---
+    print("\n[Step 1/5] Loading time series data...")
+
+    # --- Directories ---
+    input_path = '.\\processed_data\\weekly_sales_top50_timeseries.parquet'
+    output_dir = '.\\results\\forecasts'
+    plots_dir = '.\\plots\\future_forecasts'
+    validation_plots_dir = '.\\plots\\validation'
+
+    for directory in [output_dir, plots_dir, validation_plots_dir]:
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    try:
+        with span('load') as sp:
+            ts_df = load_series(input_path)
+            sp.rows = len(ts_df)
+        # Create 'ds' column for Prophet
+        start_date = pd.to_datetime('2020-01-01')
+        ts_df['ds'] = start_date + pd.to_timedelta(ts_df.index * 7, 'D')
+        print("Data loaded successfully.")
+    except Exception as e:
+        print(f"Error loading data: {e}")
+        exit()
+
+    # List to store all forecast results
+    all_forecasts = []
+    # List to store backtesting metrics
+    validation_metrics = []
+
+    # --- 2. Build one Prophet and one SARIMA task per product ---
+    product_ids = []
+    for product_id in ts_df.columns.drop('ds'):
+        if ts_df[product_id].sum() == 0:
+            print(f"Skipping product {product_id} (no sales).")
+            continue
+        product_ids.append(product_id)
+
+    # Every product gets the baseline of its demand class (dunnhumby_baselines); with
+    # ROUTE_BY_DEMAND_CLASS only the smooth ones also get the per-series fits
+    baseline_values, demand_classes = baseline_forecast(ts_df[product_ids].to_numpy().T, forecast_horizon,
+                                                        keys=product_ids)
+    if ROUTE_BY_DEMAND_CLASS:
+        fitted_ids = [p for p in product_ids if demand_classes.at[p, 'demand_class'] in EXPENSIVE_CLASSES]
+    else:
+        fitted_ids = product_ids
+    total_products = len(fitted_ids)
+
+    print(f"\nForecasting horizon: {forecast_horizon} weeks")
+    print(f"Backtesting horizon: {backtest_horizon} weeks")
+    print(f"Demand classes: {demand_classes['demand_class'].value_counts().to_dict()}")
+    print(f"Products fitted with SARIMA / Prophet: {total_products} of {len(product_ids)} "
+          f"(workers: {WORKERS or 'all CPUs'}, chunk size: {CHUNKSIZE}, timeout: {TASK_TIMEOUT or 'none'})")
+
+    prophet_tasks = [(product_id, {
+        'product_id': product_id,
+        'ds': ts_df['ds'].values,
+        'y': ts_df[product_id].values,
+        'backtest_split': len(ts_df) - backtest_horizon,
+        'backtest_horizon': backtest_horizon,
+        'forecast_horizon': forecast_horizon,
+        'warm_start': WARM_START,
+        'save_model': True,
+    }) for product_id in fitted_ids]
+    order_cache = None
+    if USE_ORDER_CACHE and not FORECAST_ONLY:
+        order_cache = OrderCache(FAST_AUTO_ARIMA_PARAMS, product_clusters(), name='06')
+    sarima_tasks = [(product_id, {'y': ts_df[product_id], 'horizon': forecast_horizon, 'save_model': True,
+                                  'order_seed': order_cache.seed(product_id) if order_cache else None})
+                    for product_id in fitted_ids]
+    prophet_func, sarima_func = prophet_task, sarima_forecast_task
+    if FORECAST_ONLY:
+        prophet_tasks = [(product_id, {'record': registry.get(PROPHET_REGISTRY_NAME, product_id),
+                                       'horizon': forecast_horizon}) for product_id in fitted_ids]
+        sarima_tasks = [(product_id, {'record': registry.get(SARIMA_REGISTRY_NAME, product_id),
+                                      'horizon': forecast_horizon}) for product_id in fitted_ids]
+        prophet_func, sarima_func = stored_prophet_task, stored_sarima_task
+
+    # --- 3-5. Backtest + full-data Prophet, and SARIMA (Fast Mode), in the worker pool ---
+    def progress(model_name):
+        finished = [0]
+
+        def on_result(product_id, record):
+            finished[0] += 1
+            if record['status'] != 'ok':
+                print(f"  [{finished[0]}/{total_products}] {model_name} {product_id}: {record['status']}. "
+                      f"Error: {record['error']}")
+            elif finished[0] % 50 == 0 or finished[0] == total_products:
+                print(f"  [{finished[0]}/{total_products}] {model_name} fits finished")
+        return on_result
+
+    if FORECAST_ONLY:
+        print("\n[Step 2-4/5] Forecast-only mode: forecasting from the stored Prophet and SARIMA models...")
+    else:
+        print("\n[Step 2-4/5] Running Backtest (Validation) and training Prophet (Full)...")
+    with span('prophet', rows=total_products):
+        prophet_records = run_parallel(prophet_func, prophet_tasks, workers=WORKERS, chunksize=CHUNKSIZE,
+                                       timeout=TASK_TIMEOUT, on_result=progress('Prophet'))
+    if not FORECAST_ONLY:
+        print("  > Training SARIMA (Fast Mode)...")
+    with span('sarima', rows=total_products):
+        sarima_records = run_parallel(sarima_func, sarima_tasks, workers=WORKERS, chunksize=CHUNKSIZE,
+                                      timeout=TASK_TIMEOUT, on_result=progress('SARIMA'))
+    if not FORECAST_ONLY:
+        with span('save_models', rows=total_products):
+            train_weeks = len(ts_df)
+            for product_id, record in prophet_records.items():
+                if record['status'] == 'ok' and record['result'].get('model_state') is not None:
+                    registry.put(PROPHET_REGISTRY_NAME, product_id, 'prophet', record['result']['model_state'],
+                                 metadata={'train_weeks': train_weeks, 'horizon': forecast_horizon,
+                                           'warm_started': record['result']['warm_started']})
+            for product_id, record in sarima_records.items():
+                if record['status'] == 'ok':
+                    registry.put(SARIMA_REGISTRY_NAME, product_id, 'sarima', record['result']['model_state'],
+                                 metadata={'order': record['result']['order'], 'train_weeks': train_weeks,
+                                           'horizon': forecast_horizon})
+    registry.close()
+    if order_cache:
+        for product_id, record in sarima_records.items():
+            if record['status'] == 'ok':
+                order_cache.update(product_id, record['result']['order_entry'])
+        order_cache.save()
+        searches = Counter(r['result']['order_entry']['search'] for r in sarima_records.values() if r['status'] == 'ok')
+        print(f"  SARIMA order search: {searches['seeded']} seeded from the order cache, {searches['full']} full")
+
+    # --- 6. Compile Results & Plot ---
+    print("\n[Step 5/5] Compiling results and plotting...")
+    for i, product_id in enumerate(product_ids):
+        prod_data = ts_df[['ds', product_id]].rename(columns={product_id: 'y'})
+        demand_class, baseline_model = demand_classes.loc[product_id, ['demand_class', 'model']]
+        routed = product_id not in prophet_records
+        prophet = prophet_records.get(product_id, {'status': 'routed', 'error': None})
+        prophet_result = prophet['result'] if prophet['status'] == 'ok' else {}
+        if routed:
+            print(f"    {product_id}: {demand_class} demand, forecast by the {baseline_model} baseline only")
+
+        # Backtest (Validation)
+        if prophet_result.get('backtest') is not None:
+            test_df = prod_data.iloc[-backtest_horizon:]
+            forecast_val = prophet_result['backtest'].iloc[-backtest_horizon:]
+
+            # Calculate Metrics
+            mae = mean_absolute_error(test_df['y'], forecast_val['yhat'])
+            rmse = np.sqrt(mean_squared_error(test_df['y'], forecast_val['yhat']))
+
+            validation_metrics.append({
+                'Product_ID': product_id,
+                'MAE': mae,
+                'RMSE': rmse,
+                'Test_Mean': test_df['y'].mean()
+            })
+            plot_validation(product_id, prod_data, test_df, forecast_val, mae, validation_plots_dir)
+        elif not routed and not FORECAST_ONLY:
+            print(f"    Backtest Failed ({product_id}): {prophet_result.get('backtest_error') or prophet['error']}")
+
+        # SARIMA Model (Full Data)
+        sarima = sarima_records.get(product_id, {'status': 'routed', 'error': None})
+        if sarima['status'] == 'ok':
+            sarima_forecast = list(sarima['result']['forecast'])
+        else:
+            if not routed:
+                print(f"    SARIMA Failed ({product_id}): {sarima['error']}")
+            sarima_forecast = [None] * forecast_horizon
+
+        # Prophet Model (Full Data)
+        if prophet_result.get('forecast') is not None:
+            prophet_future = prophet_result['forecast'].iloc[-forecast_horizon:]
+            prophet_values = prophet_future['yhat'].values
+            prophet_lower = prophet_future['yhat_lower'].values
+            prophet_upper = prophet_future['yhat_upper'].values
+        else:
+            if not routed:
+                print(f"    Prophet Failed ({product_id}): {prophet_result.get('forecast_error') or prophet['error']}")
+            prophet_values = [None] * forecast_horizon
+            prophet_lower = [None] * forecast_horizon
+            prophet_upper = [None] * forecast_horizon
+
+        last_date = prod_data['ds'].iloc[-1]
+        future_dates = [last_date + pd.Timedelta(weeks=x+1) for x in range(forecast_horizon)]
+
+        for j in range(forecast_horizon):
+            all_forecasts.append({
+                'Product_ID': product_id,
+                'Date': future_dates[j],
+                'Forecast_Week': j + 1,
+                'SARIMA_Forecast': sarima_forecast[j],
+                'Prophet_Forecast': prophet_values[j],
+                'Prophet_Lower': prophet_lower[j],
+                'Prophet_Upper': prophet_upper[j],
+                'Demand_Class': demand_class,
+                'Baseline_Model': baseline_model,
+                'Baseline_Forecast': baseline_values[i, j]
+            })
+
+        plot_future(product_id, prod_data, future_dates, sarima_forecast, prophet_values, prophet_lower,
+                    prophet_upper, baseline_values[i], baseline_model, plots_dir)
+
+    # --- 7. Save CSVs ---
+    print("\nSaving results...")
+    results_df = pd.DataFrame(all_forecasts)
+    output_csv = os.path.join(output_dir, 'future_demand_forecasts_top50.csv')
+    with span('save', rows=len(results_df)):
+        results_df.to_csv(output_csv, index=False)
+    print(f"Forecasts saved to: {output_csv}")
+
+    # Save Metrics (a forecast-only run keeps those of the fitting run)
+    if not FORECAST_ONLY:
+        metrics_df = pd.DataFrame(validation_metrics)
+        metrics_csv = 'prophet_backtest_metrics.csv'
+        metrics_df.to_csv(metrics_csv, index=False)
+        print(f"Backtest metrics saved to: {metrics_csv}")
+        warm = sum(1 for r in prophet_records.values() if r['status'] == 'ok' and r['result']['warm_started'])
+        print(f"Prophet full-data fits warm-started: {warm}/{total_products}")
+    cache.commit()
+
+    print("\n--- Future Demand Forecasting Complete ---")
+
 
-print("\n--- Future Demand Forecasting Complete ---")
+# Workers may be spawned (Windows), which re-imports this script: run only as the main module
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import pandas as pd
+import numpy as np
+import os
+
+from dunnhumby_hierarchy import HIERARCHY_LEVELS, Hierarchy, reconcile
+from dunnhumby_ingest import load_raw_table, raw_table_exists
+from dunnhumby_matrix import PRODUCT_MATRIX_PATH, SeriesMatrix
+from dunnhumby_pipeline import step_cache
+from dunnhumby_profiling import span
+from dunnhumby_schema import read_csv_typed
+
+print("--- Starting Hierarchical Demand Forecasting ---")
+
+forecast_horizon = 12
+backtest_horizon = 12  # Holdout weeks used to compare the reconciliation methods
+# (method, level) pairs: the top-down level, or for mint the modeled levels (None:
+# all; the rest are filled in before reconciling). The first one produces the
+# saved forecasts. Base forecasts: SES per node (dunnhumby_hierarchy.ses_forecast)
+METHODS = [('mint', None), ('mint', ('total', 'COMMODITY_DESC', 'PRODUCT_ID')), ('bottom_up', None),
+           ('top_down', 'COMMODITY_DESC'), ('top_down', 'total')]
+MINT_WEIGHTS = 'wls_var'
+
+
+def method_args(method, level):
+    """(display name, reconcile keyword arguments) of a METHODS entry."""
+    if level is None:
+        return method, {}
+    if method == 'mint':
+        return f"{method}({'+'.join(level)})", {'levels': level}
+    return f"{method}({level})", {'level': level}
+
+
+# Skip the step when its inputs, parameters and script are unchanged
+cache = step_cache('06a', params={'forecast_horizon': forecast_horizon, 'backtest_horizon': backtest_horizon,
+                                  'methods': METHODS, 'mint_weights': MINT_WEIGHTS})
+if cache.hit():
+    exit()
+
+output_dir = os.path.join('results', 'hierarchical')
+os.makedirs(output_dir, exist_ok=True)
+
+# --- 1. Load the full-catalog matrix and the product hierarchy ---
+print("\n[Step 1/4] Loading the product x week matrix and product.csv...")
+try:
+    with span('load') as sp:
+        matrix = SeriesMatrix(PRODUCT_MATRIX_PATH)
+        y_bottom = matrix.to_scipy().astype('float64')
+        if raw_table_exists('product'):
+            products = load_raw_table('product')
+        else:
+            products = read_csv_typed(os.path.join('dunnhumby.db', 'product.csv'), 'product')
+        sp.rows = matrix.nnz
+    print(f"{matrix.shape[0]:,} products x {matrix.shape[1]} weeks ({matrix.nnz:,} non-zero cells) loaded.")
+except Exception as e:
+    print(f"Error loading data: {e}")
+    exit()
+
+# --- 2. Build the hierarchy (summing matrix) ---
+print("\n[Step 2/4] Building the product hierarchy...")
+with span('hierarchy', rows=matrix.shape[0]):
+    hierarchy = Hierarchy(products, matrix.keys, levels=HIERARCHY_LEVELS)
+print(hierarchy.nodes['level'].value_counts().reindex(hierarchy.levels).to_string())
+
+# --- 3. Backtest the reconciliation methods on the last weeks ---
+print(f"\n[Step 3/4] Backtesting reconciliation methods on the last {backtest_horizon} weeks...")
+train = y_bottom[:, :-backtest_horizon]
+actuals = hierarchy.aggregate(y_bottom[:, -backtest_horizon:])
+backtest_rows = []
+for method, level in METHODS:
+    name, kwargs = method_args(method, level)
+    with span(f'backtest_{method}', rows=hierarchy.n_nodes):
+        forecasts = reconcile(hierarchy, train, backtest_horizon, method, weights=MINT_WEIGHTS, **kwargs)
+    for node_level in hierarchy.levels:
+        rows = hierarchy.rows(node_level)
+        backtest_rows.append({
+            'method': name,
+            'level': node_level,
+            'series': rows.stop - rows.start,
+            'mae': np.abs(forecasts[rows] - actuals[rows]).mean(),
+        })
+
+backtest_df = pd.DataFrame(backtest_rows)
+print(backtest_df.pivot(index='level', columns='method', values='mae').reindex(hierarchy.levels).round(3).to_string())
+backtest_path = os.path.join(output_dir, 'hierarchical_backtest_mae.csv')
+backtest_df.to_csv(backtest_path, index=False)
+print(f"Backtest metrics saved to {backtest_path}")
+
+# --- 4. Forecast every node and save ---
+name, kwargs = method_args(*METHODS[0])
+print(f"\n[Step 4/4] Forecasting {forecast_horizon} weeks for all {hierarchy.n_nodes:,} nodes ({name})...")
+with span('forecast', rows=hierarchy.n_nodes):
+    forecasts = reconcile(hierarchy, y_bottom, forecast_horizon, METHODS[0][0], weights=MINT_WEIGHTS, **kwargs)
+
+# Coherence check: every aggregate equals the sum of its products
+gap = np.abs(hierarchy.aggregate(forecasts[hierarchy.n_aggregate:]) - forecasts).max()
+print(f"Max aggregation gap of the reconciled forecasts: {gap:.2e}")
+
+future_weeks = [str(w) for w in range(matrix.weeks[-1] + 1, matrix.weeks[-1] + 1 + forecast_horizon)]
+forecast_df = pd.concat([hierarchy.nodes, pd.DataFrame(forecasts, columns=future_weeks)], axis=1)
+forecast_path = os.path.join(output_dir, 'hierarchical_forecasts.parquet')
+with span('save', rows=len(forecast_df)):
+    forecast_df.to_parquet(forecast_path, index=False)
+print(f"Forecasts (one row per node, one column per future week) saved to {forecast_path}")
+cache.commit()
+
+print("\n--- Hierarchical Demand Forecasting Finished ---")
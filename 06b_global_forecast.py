@@ -0,0 +1,83 @@
+import pandas as pd
+import numpy as np
+import os
+
+from dunnhumby_global import GlobalRidge
+from dunnhumby_hierarchy import moving_average_forecast
+from dunnhumby_matrix import PRODUCT_MATRIX_PATH, SeriesMatrix
+from dunnhumby_pipeline import step_cache
+from dunnhumby_profiling import span
+
+print("--- Starting Global Demand Forecasting (all products) ---")
+
+forecast_horizon = 12
+RIDGE_ALPHA = 1.0
+# Same week -> date convention as 06 (week index * 7 days from 2020-01-01)
+START_DATE = pd.to_datetime('2020-01-01')
+
+# Skip the step when its inputs, parameters and script are unchanged
+cache = step_cache('06b', params={'forecast_horizon': forecast_horizon, 'alpha': RIDGE_ALPHA})
+if cache.hit():
+    exit()
+
+output_dir = os.path.join('results', 'forecasts')
+os.makedirs(output_dir, exist_ok=True)
+
+# --- 1. Load the full-catalog matrix ---
+print("\n[Step 1/4] Loading the product x week matrix...")
+try:
+    with span('load') as sp:
+        matrix = SeriesMatrix(PRODUCT_MATRIX_PATH)
+        y = matrix.to_scipy().toarray().astype('float32')
+        sp.rows = matrix.nnz
+    print(f"{matrix.shape[0]:,} products x {matrix.shape[1]} weeks loaded.")
+except Exception as e:
+    print(f"Error loading data: {e}")
+    exit()
+
+# --- 2. Holdout check: train without the last weeks and score them ---
+print(f"\n[Step 2/4] Holdout check on the last {forecast_horizon} weeks...")
+try:
+    with span('holdout', rows=matrix.shape[0]):
+        holdout = GlobalRidge(horizon=forecast_horizon, alpha=RIDGE_ALPHA).fit(y[:, :-forecast_horizon])
+        predicted = holdout.predict(y[:, :-forecast_horizon])
+    actual = y[:, -forecast_horizon:]
+    baseline, _ = moving_average_forecast(y[:, :-forecast_horizon], forecast_horizon)
+    print(f"MAE per product-week: global ridge {np.abs(predicted - actual).mean():.4f}, "
+          f"13-week moving average {np.abs(baseline - actual).mean():.4f}")
+except ValueError as e:
+    print(f"Holdout check skipped: {e}")
+
+# --- 3. Train on the full history and forecast every product ---
+print(f"\n[Step 3/4] Training one ridge model on all products and forecasting {forecast_horizon} weeks...")
+with span('fit', rows=matrix.shape[0]):
+    model = GlobalRidge(horizon=forecast_horizon, alpha=RIDGE_ALPHA).fit(y)
+with span('predict', rows=matrix.shape[0]):
+    forecast, lower, upper = model.predict(y, intervals=True)
+print(f"Trained on {model.n_windows:,} product windows ({model.n_features} features).")
+
+# --- 4. Save in the future_demand_forecasts schema (one row per product and week) ---
+print("\n[Step 4/4] Saving forecasts...")
+n_products = matrix.shape[0]
+last_date = START_DATE + pd.Timedelta(days=7 * int(matrix.weeks[-1]))
+future_dates = pd.DatetimeIndex([last_date + pd.Timedelta(weeks=j + 1) for j in range(forecast_horizon)])
+results_df = pd.DataFrame({
+    'Product_ID': np.repeat(matrix.keys, forecast_horizon),
+    'Date': np.tile(future_dates, n_products),
+    'Forecast_Week': np.tile(np.arange(1, forecast_horizon + 1), n_products),
+    # Per-series models are not fitted here; 07 reports Global_Forecast with FORECAST_SOURCE = 'global'
+    'SARIMA_Forecast': np.nan,
+    'Prophet_Forecast': np.nan,
+    'Prophet_Lower': np.nan,
+    'Prophet_Upper': np.nan,
+    'Global_Forecast': forecast.ravel(),
+    'Global_Lower': lower.ravel(),
+    'Global_Upper': upper.ravel(),
+})
+output_csv = os.path.join(output_dir, 'future_demand_forecasts_global.csv')
+with span('save', rows=len(results_df)):
+    results_df.to_csv(output_csv, index=False)
+print(f"Forecasts for {n_products:,} products saved to: {output_csv}")
+cache.commit()
+
+print("\n--- Global Demand Forecasting Finished ---")
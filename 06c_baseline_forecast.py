@@ -0,0 +1,80 @@
+import pandas as pd
+import numpy as np
+import os
+
+from dunnhumby_baselines import MODELS, baseline_forecast, classify_demand
+from dunnhumby_matrix import PRODUCT_MATRIX_PATH, SeriesMatrix
+from dunnhumby_pipeline import step_cache
+from dunnhumby_profiling import span
+
+print("--- Starting Baseline Demand Forecasting (all products) ---")
+
+forecast_horizon = 12
+# Same week -> date convention as 06 (week index * 7 days from 2020-01-01)
+START_DATE = pd.to_datetime('2020-01-01')
+
+# Skip the step when its inputs, parameters and script are unchanged
+cache = step_cache('06c', params={'forecast_horizon': forecast_horizon})
+if cache.hit():
+    exit()
+
+output_dir = os.path.join('results', 'forecasts')
+os.makedirs(output_dir, exist_ok=True)
+
+# --- 1. Load the full-catalog matrix ---
+print("\n[Step 1/4] Loading the product x week matrix...")
+try:
+    with span('load') as sp:
+        matrix = SeriesMatrix(PRODUCT_MATRIX_PATH)
+        y = matrix.to_scipy().toarray()
+        sp.rows = matrix.nnz
+    print(f"{matrix.shape[0]:,} products x {matrix.shape[1]} weeks loaded.")
+except Exception as e:
+    print(f"Error loading data: {e}")
+    exit()
+
+# --- 2. Holdout: every baseline on every demand class ---
+print(f"\n[Step 2/4] Holdout MAE on the last {forecast_horizon} weeks by demand class...")
+train, actual = y[:, :-forecast_horizon], y[:, -forecast_horizon:]
+train_classes = classify_demand(train)['demand_class'].to_numpy()
+holdout_rows = []
+for name, model in MODELS.items():
+    with span(f'holdout_{name}', rows=len(train)):
+        errors = np.abs(model(train, forecast_horizon) - actual).mean(axis=1)
+    for demand_class in np.unique(train_classes):
+        rows = train_classes == demand_class
+        holdout_rows.append({'model': name, 'demand_class': demand_class, 'mae': errors[rows].mean()})
+holdout_df = pd.DataFrame(holdout_rows).pivot(index='demand_class', columns='model', values='mae')
+print(holdout_df.round(3).to_string())
+
+# --- 3. Classify and forecast every product with the baseline of its class ---
+print(f"\n[Step 3/4] Forecasting {forecast_horizon} weeks for all products...")
+with span('forecast', rows=len(y)):
+    forecast, classes = baseline_forecast(y, forecast_horizon, keys=matrix.keys)
+print(classes.groupby(['demand_class', 'model']).size().rename('products').to_string())
+
+# --- 4. Save in the future_demand_forecasts schema (one row per product and week) ---
+print("\n[Step 4/4] Saving forecasts...")
+n_products = matrix.shape[0]
+last_date = START_DATE + pd.Timedelta(days=7 * int(matrix.weeks[-1]))
+future_dates = pd.DatetimeIndex([last_date + pd.Timedelta(weeks=j + 1) for j in range(forecast_horizon)])
+results_df = pd.DataFrame({
+    'Product_ID': np.repeat(matrix.keys, forecast_horizon),
+    'Date': np.tile(future_dates, n_products),
+    'Forecast_Week': np.tile(np.arange(1, forecast_horizon + 1), n_products),
+    # Per-series models are not fitted here; the columns keep the schema 07 reads
+    'SARIMA_Forecast': np.nan,
+    'Prophet_Forecast': np.nan,
+    'Prophet_Lower': np.nan,
+    'Prophet_Upper': np.nan,
+    'Demand_Class': np.repeat(classes['demand_class'].to_numpy(), forecast_horizon),
+    'Baseline_Model': np.repeat(classes['model'].to_numpy(), forecast_horizon),
+    'Baseline_Forecast': forecast.ravel(),
+})
+output_csv = os.path.join(output_dir, 'future_demand_forecasts_baseline.csv')
+with span('save', rows=len(results_df)):
+    results_df.to_csv(output_csv, index=False)
+print(f"Forecasts for {n_products:,} products saved to: {output_csv}")
+cache.commit()
+
+print("\n--- Baseline Demand Forecasting Finished ---")
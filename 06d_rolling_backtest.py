@@ -0,0 +1,142 @@
+import pandas as pd
+import numpy as np
+import os
+
+from dunnhumby_backtest import (FOLDS, METRICS, SERIES_MODELS, demand_classes_at, forecasts_frame, metrics_frame,
+                                rolling_origins, series_task, series_tasks, vector_fold_forecasts)
+from dunnhumby_parallel import run_parallel
+from dunnhumby_pipeline import step_cache
+from dunnhumby_profiling import span
+
+# Rolling-origin backtest of every forecasting model on the top-50 series:
+# FOLDS expanding windows, STEP weeks apart, each scored on the next
+# BACKTEST_HORIZON weeks. SARIMA / Prophet run in the worker pool
+# (dunnhumby_parallel); the baselines and the global model run vectorized here.
+BACKTEST_HORIZON = 12
+STEP = 4              # Weeks between fold cutoffs
+MODELS = ['sarima', 'prophet', 'seasonal_naive', 'ses', 'holt', 'croston', 'sba', 'tsb', 'baseline', 'global_ridge']
+REUSE_STATE = True    # One task per product running its folds in order, reusing the fitted state
+WORKERS = None        # Worker processes (None: one per CPU; 1 without a timeout: fit in this process)
+CHUNKSIZE = 1         # Tasks handed to a worker at a time
+TASK_TIMEOUT = None   # Seconds per task before its fit is killed (None: no limit)
+START_DATE = pd.to_datetime('2020-01-01')  # Same week -> date convention as 05 / 06
+OUTPUT_DIR = os.path.join('results', 'backtest')
+METRICS_PATH = os.path.join(OUTPUT_DIR, 'backtest_metrics.csv')
+FORECASTS_PATH = os.path.join(OUTPUT_DIR, 'backtest_forecasts.parquet')
+
+
+def main():
+    print("--- Starting Rolling-Origin Backtest ---")
+
+    # Skip the step when its inputs, parameters and script are unchanged
+    cache = step_cache('06d', params={'horizon': BACKTEST_HORIZON, 'folds': FOLDS, 'step': STEP, 'models': MODELS,
+                                      'reuse_state': REUSE_STATE, 'timeout': TASK_TIMEOUT})
+    if cache.hit():
+        exit()
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    # --- 1. Load the series and set up the folds ---
+    print("\n[Step 1/4] Loading time series data...")
+    input_path = '.\\processed_data\\weekly_sales_top50_timeseries.parquet'
+    try:
+        with span('load') as sp:
+            ts_df = pd.read_parquet(input_path)
+            sp.rows = len(ts_df)
+    except Exception as e:
+        print(f"Error loading data: {e}")
+        exit()
+
+    keys = ts_df.columns.to_numpy()
+    y = ts_df.to_numpy(dtype='float64').T
+    weeks = ts_df.index.to_numpy()
+    ds = (START_DATE + pd.to_timedelta(ts_df.index * 7, 'D')).values
+    try:
+        cutoffs = rolling_origins(y.shape[1], BACKTEST_HORIZON, folds=FOLDS, step=STEP)
+    except ValueError as e:
+        print(f"Error: {e}")
+        exit()
+    print(f"{len(keys)} products x {len(weeks)} weeks; {len(cutoffs)} folds with training ends at weeks "
+          f"{[int(weeks[c - 1]) for c in cutoffs]}, {BACKTEST_HORIZON}-week horizon.")
+    fold_classes = demand_classes_at(y, cutoffs)
+
+    metrics_frames = []
+    forecast_frames = []
+
+    def collect(model, forecasts, status=None, error=None):
+        frame = metrics_frame(model, keys, y, cutoffs, BACKTEST_HORIZON, forecasts, status, error, weeks=weeks)
+        frame['demand_class'] = fold_classes.ravel()
+        metrics_frames.append(frame)
+        forecast_frames.append(forecasts_frame(model, keys, y, cutoffs, BACKTEST_HORIZON, forecasts, weeks=weeks))
+
+    # --- 2. Vectorized models: all products of a fold at once ---
+    print("\n[Step 2/4] Backtesting the vectorized models...")
+    shape = (len(cutoffs), len(keys), BACKTEST_HORIZON)
+    for model in [m for m in MODELS if m not in SERIES_MODELS]:
+        forecasts = np.full(shape, np.nan)
+        status = np.full(shape[:2], 'ok', dtype=object)
+        error = np.full(shape[:2], None, dtype=object)
+        with span(f'backtest_{model}', rows=len(keys) * len(cutoffs)):
+            for k, cutoff in enumerate(cutoffs):
+                try:
+                    forecasts[k] = vector_fold_forecasts(model, y, cutoff, BACKTEST_HORIZON)
+                except ValueError as e:
+                    status[k], error[k] = 'failed', str(e)
+        collect(model, forecasts, status, error)
+        failed = (status != 'ok').any(axis=1).sum()
+        print(f"  {model}: done" + (f" ({failed} folds failed: {error[status != 'ok'][0]})" if failed else ""))
+
+    # --- 3. Per-series models in the worker pool ---
+    for model in [m for m in MODELS if m in SERIES_MODELS]:
+        tasks = series_tasks(model, keys, ds, y, cutoffs, BACKTEST_HORIZON, reuse=REUSE_STATE)
+        print(f"\n[Step 3/4] Backtesting {model}: {len(tasks)} tasks "
+              f"(workers: {WORKERS or 'all CPUs'}, chunk size: {CHUNKSIZE}, timeout: {TASK_TIMEOUT or 'none'})...")
+        finished = [0]
+
+        def on_result(task_key, record):
+            finished[0] += 1
+            if record['status'] != 'ok':
+                print(f"  [{finished[0]}/{len(tasks)}] {task_key}: {record['status']}. Error: {record['error']}")
+            elif finished[0] % 25 == 0 or finished[0] == len(tasks):
+                print(f"  [{finished[0]}/{len(tasks)}] tasks finished")
+
+        with span(f'backtest_{model}', rows=len(tasks)):
+            records = run_parallel(series_task, tasks, workers=WORKERS, chunksize=CHUNKSIZE, timeout=TASK_TIMEOUT,
+                                   on_result=on_result)
+
+        forecasts = np.full(shape, np.nan)
+        status = np.full(shape[:2], 'ok', dtype=object)
+        error = np.full(shape[:2], None, dtype=object)
+        rows = {key: i for i, key in enumerate(keys)}
+        for (task_key, payload) in tasks:
+            _, product_id, first_fold = task_key
+            record = records[task_key]
+            folds = range(first_fold, first_fold + len(payload['cutoffs']))
+            for offset, k in enumerate(folds):
+                if record['status'] == 'ok':
+                    forecasts[k, rows[product_id]] = record['result'][offset]
+                else:
+                    status[k, rows[product_id]], error[k, rows[product_id]] = record['status'], record['error']
+        collect(model, forecasts, status, error)
+
+    # --- 4. Save the tidy tables ---
+    print("\n[Step 4/4] Saving results...")
+    metrics_df = pd.concat(metrics_frames, ignore_index=True)
+    forecasts_df = pd.concat(forecast_frames, ignore_index=True)
+    with span('save', rows=len(metrics_df)):
+        metrics_df.to_csv(METRICS_PATH, index=False)
+        forecasts_df.to_parquet(FORECASTS_PATH, index=False)
+
+    summary = metrics_df[metrics_df['status'] == 'ok'].groupby('model')[METRICS].mean().sort_values('mase')
+    print("Mean over products and folds:")
+    print(summary.round(3).to_string())
+    print(f"\nMetrics (one row per model, product and fold) saved to {METRICS_PATH}")
+    print(f"Forecasts saved to {FORECASTS_PATH}")
+    cache.commit()
+
+    print("\n--- Rolling-Origin Backtest Finished ---")
+
+
+# Workers may be spawned (Windows), which re-imports this script: run only as the main module
+if __name__ == '__main__':
+    main()
@@ -2,10 +2,31 @@
 import pandas as pd
 import os
 
+from dunnhumby_pipeline import step_cache
+
 print("--- Generating Future Demand Reports ---")
 
+# Forecasts to report: 'top50' (06: Prophet, compared with SARIMA) or 'global'
+# (06b: the global ridge model over the whole catalog, reported for the
+# REPORT_TOP_N products with the largest forecasts; no comparison model)
+FORECAST_SOURCE = 'top50'
+REPORT_TOP_N = 50
+FORECAST_SOURCES = {
+    'top50': {'path': '.\\results\\forecasts\\future_demand_forecasts_top50.csv',
+              'main': ('Prophet_Forecast', 'Prophet'), 'compare': ('SARIMA_Forecast', 'SARIMA')},
+    'global': {'path': '.\\results\\forecasts\\future_demand_forecasts_global.csv',
+               'main': ('Global_Forecast', 'Global Ridge'), 'compare': None},
+}
+source = FORECAST_SOURCES[FORECAST_SOURCE]
+main_column, main_name = source['main']
+
+# Skip the step when its inputs, parameters and script are unchanged
+cache = step_cache('07', params={'source': FORECAST_SOURCE, 'top_n': REPORT_TOP_N})
+if cache.hit():
+    exit()
+
 # --- 1. Load Forecast Data ---
-input_csv = '.\\results\\forecasts\\future_demand_forecasts_top50.csv'
+input_csv = source['path']
 summary_report_path = 'future_demand_summary_report.md'
 detailed_report_path = 'future_demand_detailed_report.md'
 
@@ -30,23 +51,65 @@ except Exception as e:
     product_mapping = pd.DataFrame(columns=['PRODUCT_ID', 'COMMODITY_DESC'])
 
 # --- 3. Calculate Aggregates (Prophet Focus) ---
+# Products that 06 routes away from SARIMA / Prophet (intermittent, erratic, ...)
+# have empty model columns; they are reported with their demand-class baseline
+# instead of as zero demand, and the Model column says which one was used.
+def with_fallback(model_column, model_name):
+    """(values, model label) of a model column, with the baseline where the model has no forecast."""
+    fitted = df[model_column].notna()
+    if 'Baseline_Forecast' not in df.columns:
+        return df[model_column], pd.Series(model_name, index=df.index)
+    values = df[model_column].where(fitted, df['Baseline_Forecast'])
+    labels = pd.Series(model_name, index=df.index).where(fitted, 'Baseline (' + df['Baseline_Model'].astype(str) + ')')
+    return values, labels
+
+
+def money(value, model):
+    """A forecast value for the tables, marked when it comes from the baseline."""
+    text = f"${value:,.2f}"
+    return f"{text} (baseline)" if str(model).startswith('Baseline') else text
+
+
+if 'Baseline_Model' not in df.columns:  # forecasts written without the demand-class routing
+    df['Baseline_Model'] = None
+df['Main_Forecast'], df['Main_Model'] = with_fallback(main_column, main_name)
+if source['compare'] is not None:
+    compare_name = source['compare'][1]
+    df['Compare_Forecast'], df['Compare_Model'] = with_fallback(*source['compare'])
+else:
+    compare_name = None
+    df['Compare_Forecast'], df['Compare_Model'] = float('nan'), None
+
 # Group by Product_ID to get total forecasted sales for next 12 weeks
 product_stats = df.groupby('Product_ID').agg(
-    Total_Prophet_Forecast=('Prophet_Forecast', 'sum'),
-    Total_SARIMA_Forecast=('SARIMA_Forecast', 'sum'),
-    Start_Value=('Prophet_Forecast', 'first'),
-    End_Value=('Prophet_Forecast', 'last')
+    Total_Prophet_Forecast=('Main_Forecast', 'sum'),
+    Total_SARIMA_Forecast=('Compare_Forecast', 'sum'),
+    Start_Value=('Main_Forecast', 'first'),
+    End_Value=('Main_Forecast', 'last'),
+    Model=('Main_Model', 'first'),
+    Compare_Model=('Compare_Model', 'first'),
+    Baseline_Model=('Baseline_Model', 'first')
 ).reset_index()
+if FORECAST_SOURCE == 'global':
+    product_stats = product_stats.nlargest(REPORT_TOP_N, 'Total_Prophet_Forecast')
+baseline_products = product_stats['Model'].str.startswith('Baseline')
 
 # Merge with product names
 product_stats = product_stats.merge(product_mapping, left_on='Product_ID', right_on='PRODUCT_ID', how='left')
 # Fill missing names
 product_stats['COMMODITY_DESC'] = product_stats['COMMODITY_DESC'].fillna('Unknown Product')
 
-# Calculate Growth Rate
-product_stats['Growth_Rate'] = ((product_stats['End_Value'] - product_stats['Start_Value']) / product_stats['Start_Value']) * 100
+# Calculate Growth Rate (0 when the forecast starts at zero, e.g. a product without demand)
+start = product_stats['Start_Value'].where(product_stats['Start_Value'] != 0)
+product_stats['Growth_Rate'] = (((product_stats['End_Value'] - start) / start) * 100).fillna(0.0)
 product_stats = product_stats.sort_values('Total_Prophet_Forecast', ascending=False)
 
+horizon_weeks = int(df['Forecast_Week'].max())
+if FORECAST_SOURCE == 'global':
+    selection = f"전체 상품 중 {main_name} {horizon_weeks}주 예측 합계 상위 {REPORT_TOP_N}개 상품"
+else:
+    selection = "총 매출액 기준 상위 50개 상품"
+
 top_5_products = product_stats.head(5)
 top_growers = product_stats.sort_values('Growth_Rate', ascending=False).head(5)
 
@@ -55,33 +118,45 @@ print("Generating Summary Report...")
 with open(summary_report_path, 'w', encoding='utf-8') as f:
     f.write("# 상품별 향후 수요 예측 최종 요약 보고서\n\n")
     f.write("## 1. 개요\n")
-    f.write("- **분석 대상**: 총 매출액 기준 상위 50개 상품\n")
-    f.write("- **예측 기간**: 향후 12주\n")
-    f.write("- **사용 모델**: Prophet (메인), SARIMA (보조/비교용)\n\n")
+    f.write(f"- **분석 대상**: {selection}\n")
+    f.write(f"- **예측 기간**: 향후 {horizon_weeks}주\n")
+    if compare_name:
+        f.write(f"- **사용 모델**: {main_name} (메인), {compare_name} (보조/비교용)\n")
+    else:
+        f.write(f"- **사용 모델**: {main_name} (전체 상품 통합 모델, `{os.path.basename(input_csv)}`)\n")
+    if baseline_products.any():
+        f.write(f"    - SARIMA/Prophet을 적합하지 않은 {int(baseline_products.sum())}개 상품(간헐적·불규칙 수요)은 "
+                f"수요 유형별 Baseline 예측으로 집계했습니다 (표의 Model 열 참조).\n")
+    f.write("\n")
     
     f.write("## 2. 핵심 인사이트\n")
     total_prophet = product_stats['Total_Prophet_Forecast'].sum()
     total_sarima = product_stats['Total_SARIMA_Forecast'].sum()
     
     top_product = top_5_products.iloc[0]
-    f.write(f"- **총 예측 매출 규모 (12주)**:\n")
-    f.write(f"    - **Prophet**: ${total_prophet:,.2f}\n")
-    f.write(f"    - **SARIMA**: ${total_sarima:,.2f}\n")
-    f.write(f"    - 두 모델 간 차이는 약 ${(total_prophet - total_sarima):,.2f} 입니다.\n")
+    f.write(f"- **총 예측 매출 규모 ({horizon_weeks}주)**:\n")
+    f.write(f"    - **{main_name}**: ${total_prophet:,.2f}\n")
+    if compare_name:
+        f.write(f"    - **{compare_name}**: ${total_sarima:,.2f}\n")
+    if baseline_products.any():
+        f.write(f"    - (두 합계 모두 Baseline 상품 {int(baseline_products.sum())}개의 Baseline 예측을 포함)\n")
+    if compare_name:
+        f.write(f"    - 두 모델 간 차이는 약 ${(total_prophet - total_sarima):,.2f} 입니다.\n")
     f.write(f"- **최고 매출 예상 상품**: `{top_product['COMMODITY_DESC']}` (ID: {int(top_product['Product_ID'])}) - ${top_product['Total_Prophet_Forecast']:,.2f}\n\n")
 
     f.write("## 3. Top 5 매출 예측 상품 (모델별 비교)\n")
-    f.write("| Product Name | Product ID | Prophet Forecast ($) | SARIMA Forecast ($) | Growth Rate (Prophet %) |\n")
-    f.write("| :--- | :--- | :--- | :--- | :--- |\n")
+    f.write(f"| Product Name | Product ID | Model | {main_name} Forecast ($) | {compare_name or 'Comparison'} Forecast ($) | Growth Rate ({main_name} %) |\n")
+    f.write("| :--- | :--- | :--- | :--- | :--- | :--- |\n")
     for _, row in top_5_products.iterrows():
-        f.write(f"| {row['COMMODITY_DESC']} | {int(row['Product_ID'])} | ${row['Total_Prophet_Forecast']:,.2f} | ${row['Total_SARIMA_Forecast']:,.2f} | {row['Growth_Rate']:.2f}% |\n")
+        compare = money(row['Total_SARIMA_Forecast'], row['Compare_Model']) if compare_name else 'n/a'
+        f.write(f"| {row['COMMODITY_DESC']} | {int(row['Product_ID'])} | {row['Model']} | {money(row['Total_Prophet_Forecast'], row['Model'])} | {compare} | {row['Growth_Rate']:.2f}% |\n")
     f.write("\n")
 
     f.write("## 4. Top 5 급성장 예상 상품 (성장률 기준)\n")
-    f.write("| Product Name | Product ID | Growth Rate (%) | Start Sales | End Sales |\n")
-    f.write("| :--- | :--- | :--- | :--- | :--- |\n")
+    f.write("| Product Name | Product ID | Model | Growth Rate (%) | Start Sales | End Sales |\n")
+    f.write("| :--- | :--- | :--- | :--- | :--- | :--- |\n")
     for _, row in top_growers.iterrows():
-        f.write(f"| {row['COMMODITY_DESC']} | {int(row['Product_ID'])} | {row['Growth_Rate']:.2f}% | ${row['Start_Value']:,.2f} | ${row['End_Value']:,.2f} |\n")
+        f.write(f"| {row['COMMODITY_DESC']} | {int(row['Product_ID'])} | {row['Model']} | {row['Growth_Rate']:.2f}% | {money(row['Start_Value'], row['Model'])} | {money(row['End_Value'], row['Model'])} |\n")
     f.write("\n")
     
     f.write("## 5. 결론 및 제언\n")
@@ -91,10 +166,10 @@ with open(summary_report_path, 'w', encoding='utf-8') as f:
 print(f"Summary report saved to {summary_report_path}")
 
 
-# --- 6. Load Backtest Metrics ---
+# --- 6. Load Backtest Metrics (06's Prophet backtest; none for the global model) ---
 try:
     backtest_csv = 'prophet_backtest_metrics.csv'
-    if os.path.exists(backtest_csv):
+    if os.path.exists(backtest_csv) and FORECAST_SOURCE == 'top50':
         metrics_df = pd.read_csv(backtest_csv)
         avg_mae = metrics_df['MAE'].mean()
         avg_rmse = metrics_df['RMSE'].mean()
@@ -104,7 +179,12 @@ try:
         avg_mae = 0
 except Exception as e:
     metrics_df = pd.DataFrame()
+    avg_mae = 0
     print(f"Error loading backtest metrics: {e}")
+# No metrics when every product was routed to a baseline (06 ROUTE_BY_DEMAND_CLASS)
+if metrics_df.empty:
+    metrics_df = pd.DataFrame(columns=['Product_ID', 'MAE', 'RMSE', 'Test_Mean'])
+    avg_mae = 0
 
 # --- 7. Generate Detailed Report with Insights ---
 print("Generating Detailed Report...")
@@ -114,52 +194,74 @@ with open(detailed_report_path, 'w', encoding='utf-8') as f:
     f.write("## 1. 분석 방법론 및 프로세스 (Detailed Methodology)\n")
     f.write("### 1.1 데이터 수집 및 선정 (Data Acquisition)\n")
     f.write("- **원천 데이터**: `transaction_data.csv` (전체 거래 내역), `product.csv` (상품 정보), `hh_demographic.csv` (가구 정보).\n")
-    f.write("- **분석 대상 선정**: 전체 상품 중 **총 매출액(Total Sales Value) 기준 상위 50개 품목**을 핵심 분석 대상으로 선정했습니다. (전체 매출의 약 20~30%를 차지하는 Key Items).\n\n")
+    if FORECAST_SOURCE == 'global':
+        f.write(f"- **분석 대상 선정**: 전체 상품을 함께 예측한 뒤, **{horizon_weeks}주 예측 합계 기준 상위 {REPORT_TOP_N}개 품목**을 보고 대상으로 선정했습니다.\n\n")
+    else:
+        f.write("- **분석 대상 선정**: 전체 상품 중 **총 매출액(Total Sales Value) 기준 상위 50개 품목**을 핵심 분석 대상으로 선정했습니다. (전체 매출의 약 20~30%를 차지하는 Key Items).\n\n")
 
     f.write("### 1.2 데이터 전처리 프로세스 (Preprocessing Pipeline)\n")
     f.write("1.  **시간 단위 집계 (Aggregation)**: 일별/건별 거래 데이터를 **주간(Weekly) 단위**로 합산하여 시계열 데이터 포맷(`ds`, `y`)으로 변환했습니다.\n")
     f.write("2.  **결측치 보정 (Imputation)**: 거래가 발생하지 않은 주차(Week)는 `0`으로 채워 시계열의 연속성을 보장했습니다. 이는 모델이 '수요 없음'을 명확히 학습하게 돕습니다.\n")
-    f.write("3.  **데이터 분할 (Split)**: 모델 검증을 위해 전체 기간 중 **마지막 4주**를 테스트 데이터(Test Set)로, 그 이전 데이터를 학습 데이터(Train Set)로 분리하여 운영했습니다.\n\n")
+    if FORECAST_SOURCE == 'global':
+        f.write(f"3.  **학습 데이터 (Training)**: 전체 기간의 데이터로 학습했습니다. 06b는 마지막 {horizon_weeks}주를 제외한 학습으로 전체 상품 단위의 오차만 점검하며, 상품별 검증 지표는 저장하지 않습니다.\n\n")
+    else:
+        f.write("3.  **데이터 분할 (Split)**: 모델 검증을 위해 전체 기간 중 **마지막 4주**를 테스트 데이터(Test Set)로, 그 이전 데이터를 학습 데이터(Train Set)로 분리하여 운영했습니다.\n\n")
 
     f.write("### 1.3 모델링 및 결과 도출 (Modeling to Results)\n")
-    f.write("- **Step 1 (개별 학습)**: 각 상품별로 Prophet(트렌드/계절성)과 SARIMA(통계적 패턴) 모델을 각각 독립적으로 학습시켰습니다.\n")
-    f.write("- **Step 2 (교차 검증)**: Backtesting을 통해 산출된 MAE(평균 오차)를 기반으로 모델의 예측력이 유효한지 1차 필터링을 수행했습니다.\n")
-    f.write("- **Step 3 (최종 예측)**: 검증이 완료된 하이퍼파라미터를 적용하여, **향후 12주간의 주차별 매출**을 추론했습니다.\n")
-    f.write("- **검증 방식 (Backtesting)**:\n")
-    f.write(f"    - **목적**: 모델의 예측 정확도를 평가하기 위해 과거의 마지막 4주 데이터를 '미래'라고 가정하고 테스트했습니다.\n")
-    f.write(f"    - **실제 예측**: 최종적으로 제공된 향후 12주 예측 결과는 **검증에 사용된 4주를 포함한 전체 데이터**를 모두 학습하여 산출되었습니다.\n")
-    avg_test_mean = metrics_df['Test_Mean'].mean()
-    avg_mape_approx = (avg_mae / avg_test_mean) * 100 if avg_test_mean > 0 else 0
-
-    f.write(f"    - **검증 결과 상세 (Validation Metrics)**:\n")
-    f.write(f"        - **평균 절대 오차 (MAE)**: 약 {avg_mae:.2f} (단위: 판매량)\n")
-    f.write(f"        - **평균 오차율 (Approx. Error Rate)**: 약 {avg_mape_approx:.1f}% 내외\n")
-    f.write(f"        - *해석*: 주간 평균 판매량 대비 약 {avg_mape_approx:.1f}% 정도의 오차가 발생합니다. 이는 소매업 수요 예측에서 통상적으로 '우수함(Good)' ~ '보통(Fair)' 수준으로 간주됩니다.\n\n")
-
-    f.write("## 2. 모델별 차이 및 시각화 해석 가이드\n")
-    f.write("### A. SARIMA vs Prophet 예측 차이 원인\n")
-    f.write("두 모델은 서로 다른 수학적 가정에 기반하므로 결과에 차이가 발생할 수 있습니다 (이는 **'앙상블(Ensemble)'** 관점에서 상호 보완적입니다).\n")
-    f.write("- **SARIMA (통계적 모델)**: 최근의 추세(Trend)에 보수적입니다. 급격한 변화보다는 과거의 평균적인 이동 경로를 중시합니다.\n")
-    f.write("- **Prophet (트렌드 기반 모델)**: 계절성(Seasonality)과 변곡점(Changepoint)을 적극적으로 반영합니다. 최근 성장이 가파르다면 이를 미래에도 강하게 반영하는 경향이 있습니다.\n")
-    f.write("- **제언**: Prophet이 시장의 역동성을 더 잘 반영하므로 메인 지표로 삼되, SARIMA를 '보수적인 하한선'으로 참고하십시오.\n\n")
-
-    f.write("### B. 검증 그래프(Backtest Validation Plot) 해석법\n")
-    f.write("- **초록색 실선 (Actual)**: 실제 발생한 과거 매출 데이터입니다.\n")
-    f.write("- **빨간색 점선 (Predicted)**: 모델이 예측한 값입니다.\n")
-    f.write("- **인사이트 도출**: \n")
-    f.write("    1. 빨간 선이 초록 선의 **방향성(등락)**을 따라가는지 확인하세요 (타이밍 적중 여부).\n")
-    f.write("    2. 두 선 사이의 **간격(Gap)**이 좁을수록 예측 신뢰도가 높습니다.\n")
-    f.write("    3. 빨간 선이 초록 선보다 항상 높다면 '과대 예측(Over-forecasting)' 경향이 있으므로 재고 과다를 주의해야 합니다.\n\n")
+    if FORECAST_SOURCE == 'global':
+        f.write("- **예측 모델 (Global Ridge)**: 전체 상품의 주간 시계열을 하나의 릿지 회귀 모델(06b)로 함께 학습하고, "
+                f"**향후 {horizon_weeks}주간의 주차별 매출**을 상품별로 추론했습니다.\n")
+        f.write("- **검증 방식**: 상품별 Backtest 지표가 없으므로 이 보고서에는 모델 신뢰도와 검증 그래프를 싣지 않습니다 "
+                "(top-50 상품의 롤링 백테스트는 06d의 `global_ridge` 결과 참조).\n\n")
+    else:
+        f.write("- **Step 1 (개별 학습)**: 각 상품별로 Prophet(트렌드/계절성)과 SARIMA(통계적 패턴) 모델을 각각 독립적으로 학습시켰습니다.\n")
+        f.write("- **Step 2 (교차 검증)**: Backtesting을 통해 산출된 MAE(평균 오차)를 기반으로 모델의 예측력이 유효한지 1차 필터링을 수행했습니다.\n")
+        f.write("- **Step 3 (최종 예측)**: 검증이 완료된 하이퍼파라미터를 적용하여, **향후 12주간의 주차별 매출**을 추론했습니다.\n")
+        f.write("- **검증 방식 (Backtesting)**:\n")
+        f.write(f"    - **목적**: 모델의 예측 정확도를 평가하기 위해 과거의 마지막 4주 데이터를 '미래'라고 가정하고 테스트했습니다.\n")
+        f.write(f"    - **실제 예측**: 최종적으로 제공된 향후 12주 예측 결과는 **검증에 사용된 4주를 포함한 전체 데이터**를 모두 학습하여 산출되었습니다.\n")
+        avg_test_mean = metrics_df['Test_Mean'].mean()
+        avg_mape_approx = (avg_mae / avg_test_mean) * 100 if avg_test_mean > 0 else 0  # nan (no metrics) -> 0
+
+        f.write(f"    - **검증 결과 상세 (Validation Metrics)**:\n")
+        f.write(f"        - **평균 절대 오차 (MAE)**: 약 {avg_mae:.2f} (단위: 판매량)\n")
+        f.write(f"        - **평균 오차율 (Approx. Error Rate)**: 약 {avg_mape_approx:.1f}% 내외\n")
+        f.write(f"        - *해석*: 주간 평균 판매량 대비 약 {avg_mape_approx:.1f}% 정도의 오차가 발생합니다. 이는 소매업 수요 예측에서 통상적으로 '우수함(Good)' ~ '보통(Fair)' 수준으로 간주됩니다.\n\n")
+
+    # Model comparison and validation plots exist only for 06's Prophet / SARIMA forecasts
+    if FORECAST_SOURCE == 'top50':
+        f.write("## 2. 모델별 차이 및 시각화 해석 가이드\n")
+        f.write("### A. SARIMA vs Prophet 예측 차이 원인\n")
+        f.write("두 모델은 서로 다른 수학적 가정에 기반하므로 결과에 차이가 발생할 수 있습니다 (이는 **'앙상블(Ensemble)'** 관점에서 상호 보완적입니다).\n")
+        f.write("- **SARIMA (통계적 모델)**: 최근의 추세(Trend)에 보수적입니다. 급격한 변화보다는 과거의 평균적인 이동 경로를 중시합니다.\n")
+        f.write("- **Prophet (트렌드 기반 모델)**: 계절성(Seasonality)과 변곡점(Changepoint)을 적극적으로 반영합니다. 최근 성장이 가파르다면 이를 미래에도 강하게 반영하는 경향이 있습니다.\n")
+        f.write("- **제언**: Prophet이 시장의 역동성을 더 잘 반영하므로 메인 지표로 삼되, SARIMA를 '보수적인 하한선'으로 참고하십시오.\n\n")
+
+        f.write("### B. 검증 그래프(Backtest Validation Plot) 해석법\n")
+        f.write("- **초록색 실선 (Actual)**: 실제 발생한 과거 매출 데이터입니다.\n")
+        f.write("- **빨간색 점선 (Predicted)**: 모델이 예측한 값입니다.\n")
+        f.write("- **인사이트 도출**: \n")
+        f.write("    1. 빨간 선이 초록 선의 **방향성(등락)**을 따라가는지 확인하세요 (타이밍 적중 여부).\n")
+        f.write("    2. 두 선 사이의 **간격(Gap)**이 좁을수록 예측 신뢰도가 높습니다.\n")
+        f.write("    3. 빨간 선이 초록 선보다 항상 높다면 '과대 예측(Over-forecasting)' 경향이 있으므로 재고 과다를 주의해야 합니다.\n\n")
 
     f.write("## 2. 전략적 인사이트 (Strategic Deep Dive)\n")
     f.write("**[데이터 기반 전략 제언]**\n")
-    f.write("본 예측 모델은 단순히 과거의 평균을 따르는 것이 아니라, 계절적 패턴(Seasonality)과 최근의 트렌드 변화(Trend Changepoints)를 모두 반영합니다. ")
+    if FORECAST_SOURCE == 'global':
+        f.write("본 예측 모델은 전체 상품에서 함께 학습한 최근 판매 수준(시차·이동 평균)과 계절적 패턴(Seasonality)을 반영합니다. ")
+    else:
+        f.write("본 예측 모델은 단순히 과거의 평균을 따르는 것이 아니라, 계절적 패턴(Seasonality)과 최근의 트렌드 변화(Trend Changepoints)를 모두 반영합니다. ")
     f.write("특히 상위 5개 급성장 상품의 경우, 단순 재고 보충(Replenishment) 수준을 넘어선 공격적인 프로모션 전략이 유효할 것으로 보입니다. ")
     f.write("반면, 하락세가 뚜렷한 상품군은 재고 회전율을 높이기 위한 할인 판매나 번들링(Bundling) 전략(Cross-Selling 리포트 참조)을 병행하여 리스크를 관리해야 합니다. ")
-    f.write(f"검증 단계에서 MAE가 낮게 측정된 상품들은 자동 발주(Auto-Ordering) 시스템 적용을 적극 고려하십시오.\n\n")
+    if FORECAST_SOURCE == 'top50':
+        f.write(f"검증 단계에서 MAE가 낮게 측정된 상품들은 자동 발주(Auto-Ordering) 시스템 적용을 적극 고려하십시오.")
+    f.write("\n\n")
     
     f.write("## 3. 상품별 상세 예측 및 검증 결과\n")
-    f.write("> **설명**: 왼쪽 그래프는 향후 12주 예측, 오른쪽(또는 하단) 수치는 모델 신뢰도 지표입니다.\n\n")
+    if FORECAST_SOURCE == 'global':
+        f.write(f"> **설명**: 상품별 향후 {horizon_weeks}주 예측 합계와 추세입니다. 06의 예측 그래프는 이 모델의 예측이 아니므로 싣지 않습니다.\n\n")
+    else:
+        f.write("> **설명**: 왼쪽 그래프는 향후 12주 예측, 오른쪽(또는 하단) 수치는 모델 신뢰도 지표입니다.\n\n")
 
     # Iterate over all products
     for _, row in product_stats.iterrows():
@@ -185,9 +287,13 @@ with open(detailed_report_path, 'w', encoding='utf-8') as f:
 
         f.write(f"### {pname} (ID: {pid})\n")
         f.write(f"- **핵심 지표**:\n")
-        f.write(f"    - **12주 예상 매출**: ${row['Total_Prophet_Forecast']:,.2f}\n")
+        f.write(f"    - **{horizon_weeks}주 예상 매출**: ${row['Total_Prophet_Forecast']:,.2f} ({row['Model']})\n")
         f.write(f"    - **성장률 (Trend)**: {row['Growth_Rate']:.2f}%\n")
-        f.write(f"    - **모델 신뢰도 ({confidence_level})**: 오차율 약 {err_pct:.1f}% (MAE: {mae_val:.1f})\n")
+        if str(row['Model']).startswith('Baseline'):
+            # Routed products have no SARIMA / Prophet backtest
+            f.write(f"    - **모델 신뢰도**: N/A (baseline: {row['Baseline_Model']})\n")
+        elif FORECAST_SOURCE == 'top50':  # The global model has no per-product backtest
+            f.write(f"    - **모델 신뢰도 ({confidence_level})**: 오차율 약 {err_pct:.1f}% (MAE: {mae_val:.1f})\n")
         
         f.write(f"- **분석 코멘트**:\n")
         if row['Growth_Rate'] > 5:
@@ -198,6 +304,10 @@ with open(detailed_report_path, 'w', encoding='utf-8') as f:
             f.write(f"    - 안정적인 수요가 유지될 전망입니다. 정기 배송/구독 모델 도입을 검토해볼 수 있습니다.\n")
             
         f.write(f"\n")
+        if FORECAST_SOURCE == 'global':
+            # 06's plots show its own Prophet / SARIMA / baseline forecasts
+            f.write("---\n\n")
+            continue
         
         # Embed Forecast Plot
         plot_path = f"plots/future_forecasts/forecast_{pid}.png"
@@ -211,4 +321,5 @@ with open(detailed_report_path, 'w', encoding='utf-8') as f:
         f.write("\n---\n\n")
 
 print(f"Detailed report saved to {detailed_report_path}")
+cache.commit()
 print("\n--- Reporting Complete ---")
@@ -6,8 +6,11 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import os
 
+from dunnhumby_pipeline import step_cache
+from dunnhumby_profiling import span
+from dunnhumby_storage import load_master
+
 # Set Context
-input_path = '.\\processed_data\\master_transaction_table.parquet'
 output_dir = '.\\results\\cross_selling'
 plots_dir = '.\\plots\\mba'
 
@@ -17,10 +20,21 @@ os.makedirs(plots_dir, exist_ok=True)
 
 print("--- Starting Market Basket Analysis with Stability Check ---")
 
+target_sample_size = 500000
+top_n = 50
+min_support = 0.001
+
+# Skip the step when its inputs, parameters and script are unchanged
+cache = step_cache('08', params={'target_sample_size': target_sample_size, 'top_n': top_n, 'min_support': min_support})
+if cache.hit():
+    exit()
+
 # --- 1. Load Data ---
 print("\n[Step 1/6] Loading transaction data...")
 try:
-    df = pd.read_parquet(input_path)
+    with span('load') as sp:
+        df = load_master(columns=['BASKET_ID', 'COMMODITY_DESC', 'QUANTITY'])
+        sp.rows = len(df)
     print(f"Data loaded: {len(df)} rows")
 except Exception as e:
     print(f"Error loading data: {e}")
@@ -35,7 +49,6 @@ df_clean = df_clean[~df_clean['COMMODITY_DESC'].str.contains('COUPON', na=False)
 print(f"Valid transactions rows: {len(df_clean)}")
 
 # --- SAMPLING ---
-target_sample_size = 500000
 if len(df_clean) > target_sample_size:
     print(f"Sampling {target_sample_size} random transactions for analysis...")
     df_clean = df_clean.sample(n=target_sample_size, random_state=42)
@@ -43,7 +56,6 @@ else:
     print("Using full dataset.")
 
 # --- Filter Top 50 Commodities ---
-top_n = 50
 top_commodities = df_clean['COMMODITY_DESC'].value_counts().head(top_n).index
 print(f"Filtering for Top {top_n} Commodities by transaction volume...")
 df_filtered = df_clean[df_clean['COMMODITY_DESC'].isin(top_commodities)].copy()
@@ -62,12 +74,14 @@ group_a_baskets = np.random.choice(unique_baskets, size=int(len(unique_baskets)*
 df_group_a = df_filtered[df_filtered['BASKET_ID'].isin(group_a_baskets)]
 df_group_b = df_filtered[~df_filtered['BASKET_ID'].isin(group_a_baskets)]
 
-def get_rules(df_in, min_sup=0.001):
-    basket = (df_in.groupby(['BASKET_ID', 'COMMODITY_DESC'])['QUANTITY']
-              .sum().unstack().reset_index().fillna(0)
-              .set_index('BASKET_ID'))
-    basket_sets = (basket > 0).astype(bool)
-    frequent_itemsets = apriori(basket_sets, min_support=min_sup, use_colnames=True)
+def get_rules(df_in, min_sup=min_support):
+    with span('groupby', rows=len(df_in)):
+        basket = (df_in.groupby(['BASKET_ID', 'COMMODITY_DESC'], observed=True)['QUANTITY']
+                  .sum().unstack().reset_index().fillna(0)
+                  .set_index('BASKET_ID'))
+        basket_sets = (basket > 0).astype(bool)
+    with span('apriori', rows=len(basket_sets)):
+        frequent_itemsets = apriori(basket_sets, min_support=min_sup, use_colnames=True)
     if len(frequent_itemsets) > 0:
         rules = association_rules(frequent_itemsets, metric="lift", min_threshold=1.01)
         # Create unique pair ID
@@ -75,8 +89,9 @@ def get_rules(df_in, min_sup=0.001):
         return rules[['pair', 'lift']].drop_duplicates(subset=['pair'])
     return pd.DataFrame()
 
-rules_a = get_rules(df_group_a)
-rules_b = get_rules(df_group_b)
+with span('stability'):
+    rules_a = get_rules(df_group_a)
+    rules_b = get_rules(df_group_b)
 
 print(f"Rules in Group A: {len(rules_a)}")
 print(f"Rules in Group B: {len(rules_b)}")
@@ -93,12 +108,14 @@ if not rules_a.empty and not rules_b.empty:
 
 # --- 4. Full Analysis (All Data) ---
 print("\n[Step 4/6] Running Full MBA on All Data...")
-basket = (df_filtered.groupby(['BASKET_ID', 'COMMODITY_DESC'])['QUANTITY']
-          .sum().unstack().reset_index().fillna(0)
-          .set_index('BASKET_ID'))
-basket_sets = (basket > 0).astype(bool)
+with span('groupby', rows=len(df_filtered)):
+    basket = (df_filtered.groupby(['BASKET_ID', 'COMMODITY_DESC'], observed=True)['QUANTITY']
+              .sum().unstack().reset_index().fillna(0)
+              .set_index('BASKET_ID'))
+    basket_sets = (basket > 0).astype(bool)
 
-frequent_itemsets = apriori(basket_sets, min_support=0.001, use_colnames=True)
+with span('apriori', rows=len(basket_sets)):
+    frequent_itemsets = apriori(basket_sets, min_support=min_support, use_colnames=True)
 if len(frequent_itemsets) > 0:
     rules = association_rules(frequent_itemsets, metric="lift", min_threshold=1.01)
     
@@ -114,7 +131,8 @@ if len(frequent_itemsets) > 0:
     
     # Save Rules
     output_file = os.path.join(output_dir, 'cross_selling_rules.csv')
-    rules_unique.to_csv(output_file, index=False)
+    with span('save', rows=len(rules_unique)):
+        rules_unique.to_csv(output_file, index=False)
     print(f"Unique Rules saved: {len(rules_unique)}")
 
     # --- 5. Visualization: Network & Scatter ---
@@ -130,14 +148,16 @@ if len(frequent_itemsets) > 0:
         nx.draw_networkx_labels(G, pos, font_size=8, font_family='sans-serif')
         plt.title("Top 50 Product Association Network")
         plt.axis('off')
-        plt.savefig(os.path.join(plots_dir, 'mba_network_graph.png'), dpi=300, bbox_inches='tight')
+        with span('plot'):
+            plt.savefig(os.path.join(plots_dir, 'mba_network_graph.png'), dpi=300, bbox_inches='tight')
         plt.close()
 
         plt.figure(figsize=(10, 6))
         sns.scatterplot(data=rules_unique, x='support', y='lift', alpha=0.6, size='confidence', sizes=(20, 200))
         plt.title("Support vs Lift")
         plt.axhline(y=1, color='r', linestyle='--')
-        plt.savefig(os.path.join(plots_dir, 'mba_scatter_plot.png'), dpi=300)
+        with span('plot'):
+            plt.savefig(os.path.join(plots_dir, 'mba_scatter_plot.png'), dpi=300)
         plt.close()
 
     # --- 6. Visualization: Heatmap ---
@@ -157,9 +177,11 @@ if len(frequent_itemsets) > 0:
     plt.figure(figsize=(14, 12))
     sns.heatmap(pivot_table, cmap="YlGnBu", annot=False)
     plt.title("Category Lift Heatmap (Top 20 Interactions)")
-    plt.savefig(os.path.join(plots_dir, 'mba_category_heatmap.png'), dpi=300, bbox_inches='tight')
+    with span('plot'):
+        plt.savefig(os.path.join(plots_dir, 'mba_category_heatmap.png'), dpi=300, bbox_inches='tight')
     plt.close()
     
     print("All visualizations generated.")
 
+cache.commit()
 print("\n--- Cross-Selling Analysis Complete ---")
@@ -1,6 +1,8 @@
 import pandas as pd
 import os
 
+from dunnhumby_pipeline import step_cache
+
 # Context
 input_rules_path = '.\\results\\cross_selling\\cross_selling_rules.csv'
 report_path = 'cross_selling_opportunities.md'
@@ -8,6 +10,11 @@ plots_dir = 'plots/mba'
 
 print("--- Generating Cross-Selling Report ---")
 
+# Skip the step when its inputs, parameters and script are unchanged
+cache = step_cache('09')
+if cache.hit():
+    exit()
+
 # Load Rules
 try:
     if not os.path.exists(input_rules_path):
@@ -152,3 +159,4 @@ with open(summary_report_path, 'w', encoding='utf-8') as f:
     f.write("- **참고**: 상세한 분석 과정과 전체 리스트는 [**Detailed Report**](./cross_selling_opportunities.md)를 참조하십시오.\n")
 
 print(f"Summary Report generated: {summary_report_path}")
+cache.commit()
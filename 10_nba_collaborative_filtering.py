@@ -5,26 +5,38 @@ import os
 from sklearn.metrics.pairwise import cosine_similarity
 from scipy.sparse import csr_matrix
 
+from dunnhumby_pipeline import step_cache
+from dunnhumby_profiling import span
+from dunnhumby_storage import load_master, master_table_exists
+
 print("--- Starting NBA Collaborative Filtering & Recommendation ---")
 
+# Skip the step when its inputs, parameters and script are unchanged
+cache = step_cache('10')
+if cache.hit():
+    exit()
+
 # 1. Load Data
-input_path = r'processed_data/master_transaction_table.parquet'
-if not os.path.exists(input_path):
-    print(f"Error: {input_path} not found. Please run preprocessing first.")
+if not master_table_exists():
+    print("Error: master transaction table not found. Please run preprocessing first.")
     exit()
 
 print("Loading merged transaction data...")
-df = pd.read_parquet(input_path)
+with span('load') as sp:
+    df = load_master(columns=['household_key', 'COMMODITY_DESC'])
+    sp.rows = len(df)
 
 # Filter for relevant columns
 # We use household_key and COMMODITY_DESC or SUB_COMMODITY_DESC for recommendations
 # Using COMMODITY_DESC to keep the matrix manageable but still personalized
 print("Preparing User-Item Matrix (Household vs Commodity)...")
-basket_counts = df.groupby(['household_key', 'COMMODITY_DESC']).size().reset_index(name='count')
+with span('groupby', rows=len(df)):
+    basket_counts = df.groupby(['household_key', 'COMMODITY_DESC'], observed=True).size().reset_index(name='count')
 
 # 2. Pivot to Create User-Item Matrix
 # Rows: Households, Columns: Commodities
-user_item_matrix = basket_counts.pivot(index='household_key', columns='COMMODITY_DESC', values='count').fillna(0)
+with span('pivot', rows=len(basket_counts)):
+    user_item_matrix = basket_counts.pivot(index='household_key', columns='COMMODITY_DESC', values='count').fillna(0)
 
 print(f"User-Item Matrix Shape: {user_item_matrix.shape}")
 
@@ -37,8 +49,10 @@ print(f"User-Item Matrix Shape: {user_item_matrix.shape}")
 user_item_sparse = csr_matrix(user_item_matrix.values)
 
 print("Calculating User-User Cosine Similarity...")
-user_similarity = cosine_similarity(user_item_sparse)
-user_similarity_df = pd.DataFrame(user_similarity, index=user_item_matrix.index, columns=user_item_matrix.index)
+# Dense households x households output: grows quadratically with the household count
+with span('cosine_similarity', rows=user_item_sparse.shape[0]):
+    user_similarity = cosine_similarity(user_item_sparse)
+    user_similarity_df = pd.DataFrame(user_similarity, index=user_item_matrix.index, columns=user_item_matrix.index)
 
 print("Similarity calculation complete.")
 
@@ -72,12 +86,13 @@ print("Generating recommendations for sample households...")
 sample_households = user_item_matrix.index[:100]
 nba_results = []
 
-for household in sample_households:
-    recs = get_nba_recommendations(household, user_similarity_df, user_item_matrix)
-    nba_results.append({
-        'household_key': household,
-        'recommendations': ", ".join(recs)
-    })
+with span('recommend', rows=len(sample_households)):
+    for household in sample_households:
+        recs = get_nba_recommendations(household, user_similarity_df, user_item_matrix)
+        nba_results.append({
+            'household_key': household,
+            'recommendations': ", ".join(recs)
+        })
 
 nba_df = pd.DataFrame(nba_results)
 
@@ -87,7 +102,9 @@ if not os.path.exists(output_dir):
     os.makedirs(output_dir)
 
 output_path = os.path.join(output_dir, 'nba_recommendations.csv')
-nba_df.to_csv(output_path, index=False)
+with span('save', rows=len(nba_df)):
+    nba_df.to_csv(output_path, index=False)
 print(f"Recommendations saved to {output_path}")
+cache.commit()
 
 print("--- NBA Collaborative Filtering Finished ---")
@@ -2,8 +2,15 @@
 import pandas as pd
 import os
 
+from dunnhumby_pipeline import step_cache
+
 print("--- Starting NBA Recommendation Report Generation ---")
 
+# Skip the step when its inputs, parameters and script are unchanged
+cache = step_cache('11')
+if cache.hit():
+    exit()
+
 # 1. Load Data
 nba_path = r'results/nba_recommendations.csv'
 if not os.path.exists(nba_path):
@@ -62,4 +69,5 @@ with open(output_path, 'w', encoding='utf-8') as f:
     f.write(report_content)
 
 print(f"Report saved to {output_path}")
+cache.commit()
 print("--- NBA Recommendation Report Generation Finished ---")
@@ -5,25 +5,35 @@ import os
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from dunnhumby_pipeline import step_cache
+from dunnhumby_storage import load_master, master_table_exists
+
 # 한글 폰트 설정 (Windows 기준)
 plt.rcParams['font.family'] = 'Malgun Gothic'
 plt.rcParams['axes.unicode_minus'] = False
 
 print("--- Starting Enhanced NBA Recommendation Report Generation (KR) ---")
 
+# Skip the step when its inputs, parameters and script are unchanged
+cache = step_cache('12')
+if cache.hit():
+    exit()
+
 # 1. 데이터 로드
 nba_path = r'results/nba_recommendations.csv'
-master_path = r'processed_data/master_transaction_table.parquet'
 
-if not os.path.exists(nba_path) or not os.path.exists(master_path):
+if not os.path.exists(nba_path) or not master_table_exists():
     print("Error: Required data files not found.")
     exit()
 
 df_nba = pd.read_csv(nba_path)
-df_master = pd.read_parquet(master_path)
 
-# 인구통계 정보 추출 (가구당 1개 레코드)
-df_demo = df_master[['household_key', 'AGE_DESC', 'MARITAL_STATUS_CODE', 'INCOME_DESC', 'HOMEOWNER_DESC', 'HH_COMP_DESC']].drop_duplicates()
+# 인구통계 정보 추출 (가구당 1개 레코드) - 추천 대상 가구가 속한 파티션만 읽음
+df_demo = load_master(
+    columns=['household_key', 'AGE_DESC', 'MARITAL_STATUS_CODE', 'INCOME_DESC', 'HOMEOWNER_DESC', 'HH_COMP_DESC'],
+    filters=[('household_key', 'in', df_nba['household_key'].unique().tolist())]
+).drop_duplicates()
+n_commodities = load_master(columns=['COMMODITY_DESC'])['COMMODITY_DESC'].nunique()
 
 # 추천 데이터 결합
 df_nba_merged = pd.merge(df_nba, df_demo, on='household_key', how='left')
@@ -90,7 +100,7 @@ report_content = f"""# NBA (Next Best Action) 강화 분석 리포트
 
 ### 2.2 분석 데이터 규모
 - **가구 수**: {df_nba['household_key'].nunique()} 가구 (추천 대상 샘플 100가구 추출 분석)
-- **상품 카테고리(Commodity)**: {df_master['COMMODITY_DESC'].nunique()} 종
+- **상품 카테고리(Commodity)**: {n_commodities} 종
 - **총 트랜잭션 수**: 약 200만 건 이상의 구매 이력을 바탕으로 유사도 계산
 
 ## 3. 분석 프로세스 및 워크플로우
@@ -140,4 +150,5 @@ with open(output_report_path, 'w', encoding='utf-8') as f:
     f.write(report_content)
 
 print(f"Enhanced report saved to {output_report_path}")
+cache.commit()
 print("--- Enhanced NBA Recommendation Report Generation Finished ---")
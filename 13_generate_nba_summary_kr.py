@@ -2,8 +2,15 @@
 import pandas as pd
 import os
 
+from dunnhumby_pipeline import step_cache
+
 print("--- Starting NBA Summary Report Generation (KR) ---")
 
+# Skip the step when its inputs, parameters and script are unchanged
+cache = step_cache('13')
+if cache.hit():
+    exit()
+
 # 1. 데이터 로드
 nba_path = r'results/nba_recommendations.csv'
 if not os.path.exists(nba_path):
@@ -61,4 +68,5 @@ with open(output_path, 'w', encoding='utf-8') as f:
     f.write(summary_content)
 
 print(f"Summary report saved to {output_path}")
+cache.commit()
 print("--- NBA Summary Report Generation Finished ---")
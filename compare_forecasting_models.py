@@ -1,80 +1,66 @@
-
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from prophet import Prophet
-import pmdarima as pm
-from sklearn.metrics import mean_absolute_error
 import os
 
 # Set style
 plt.style.use('seaborn-v0_8-whitegrid')
 plt.rcParams['font.family'] = 'Malgun Gothic'
 plt.rcParams['axes.unicode_minus'] = False
-os.makedirs('processed_data', exist_ok=True)
 os.makedirs('final_reports/ts/plots/deep_dive', exist_ok=True)
 
-print("--- Generating Model Competition Victory Chart (Prophet vs SARIMA) ---")
-
-# 1. Load Data
-input_path = './processed_data/weekly_sales_top5_timeseries.parquet'
-ts_df = pd.read_parquet(input_path)
-product_id = ts_df.columns[0] # Select first product for comparison
-y = ts_df[product_id]
-
-# Prepare Prophet Data
-df_prophet = pd.DataFrame({
-    'ds': pd.to_datetime('2020-01-01') + pd.to_timedelta(ts_df.index * 7, 'D'),
-    'y': y.values
-})
+print("--- Generating Model Competition Chart (rolling-origin backtest) ---")
 
-train_size = int(len(y) * 0.8)
-train_p = df_prophet.iloc[:train_size]
-test_p = df_prophet.iloc[train_size:]
+# 1. Load the backtest results of 06d_rolling_backtest.py (one row per model, product and fold)
+metrics_path = os.path.join('results', 'backtest', 'backtest_metrics.csv')
+forecasts_path = os.path.join('results', 'backtest', 'backtest_forecasts.parquet')
+try:
+    metrics_df = pd.read_csv(metrics_path)
+    forecasts_df = pd.read_parquet(forecasts_path)
+except Exception as e:
+    print(f"Error loading backtest results (run 06d_rolling_backtest.py first): {e}")
+    exit()
 
-# 2. Train Prophet
-m_prophet = Prophet(yearly_seasonality=True, weekly_seasonality=False, daily_seasonality=False)
-m_prophet.fit(train_p)
-future = m_prophet.make_future_dataframe(periods=len(test_p), freq='W')
-forecast_p = m_prophet.predict(future)
+metrics_df = metrics_df[metrics_df['status'] == 'ok']
+# Mean MASE per model and fold, then its mean and spread over the folds
+fold_mase = metrics_df.groupby(['model', 'fold'])['mase'].mean().unstack('fold')
+summary = pd.DataFrame({'mase': fold_mase.mean(axis=1), 'fold_std': fold_mase.std(axis=1).fillna(0)})
+summary = summary.join(metrics_df.groupby('model')[['mae', 'rmse', 'smape']].mean()).sort_values('mase')
+print("Mean over products and folds:")
+print(summary.round(3).to_string())
+winner = summary.index[0]
 
-# 3. Train SARIMA
-train_s = y.iloc[:train_size]
-test_s = y.iloc[train_size:]
-m_sarima = pm.auto_arima(train_s, m=52, seasonal=True, stepwise=True, suppress_warnings=True)
-forecast_s, conf_int_s = m_sarima.predict(n_periods=len(test_s), return_conf_int=True)
+product_id = forecasts_df['Product_ID'].iloc[0]  # Same product as before: the first top-selling series
+product_fc = forecasts_df[forecasts_df['Product_ID'] == product_id]
+actuals = product_fc.drop_duplicates('week').sort_values('week')
 
-# 4. Plot Comparison
+# 2. Plot
 fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(15, 12), sharex=False)
 
-# Plot 1: Full View & Noise Handling
-ax1.plot(df_prophet['ds'], df_prophet['y'], color='gray', alpha=0.3, label='Actual Data (History)')
-ax1.plot(test_p['ds'], test_p['y'], color='black', lw=2, label='Actual Test Data (Target)')
-ax1.plot(test_p['ds'], forecast_p['yhat'].iloc[-len(test_p):], color='blue', lw=2, label='Prophet Trend (Resilient to Noise)')
-ax1.plot(test_p['ds'], forecast_s, color='red', linestyle='--', label='SARIMA Trend (Sensitive to Noise)')
-
-ax1.set_title(f'Prophet vs SARIMA: 노이즈 대응 및 추세 학습 비교 ({product_id})', fontsize=18, fontweight='bold')
+# Plot 1: every fold's Prophet and SARIMA forecast against the actuals of one product
+ax1.plot(actuals['week'], actuals['actual'], color='black', lw=2, label='Actual Test Data (all folds)')
+for model, color, style in [('prophet', 'blue', '-'), ('sarima', 'red', '--')]:
+    for fold, fold_fc in product_fc[product_fc['model'] == model].groupby('fold'):
+        ax1.plot(fold_fc['week'], fold_fc['forecast'], color=color, linestyle=style, alpha=0.7,
+                 label=f'{model.capitalize()} Forecast' if fold == 0 else None)
+ax1.set_title(f'Prophet vs SARIMA: 폴드별 예측 비교 ({product_id})', fontsize=18, fontweight='bold')
 ax1.legend()
+ax1.set_xlabel('Week Number')
 ax1.set_ylabel('Sales Value ($)')
 
-# Plot 2: Confidence Interval for Churn Detection (The Winner's Edge)
-ax2.plot(test_p['ds'], test_p['y'], 'k.', label='Actual Test Points')
-ax2.fill_between(test_p['ds'], 
-                 forecast_p['yhat_lower'].iloc[-len(test_p):], 
-                 forecast_p['yhat_upper'].iloc[-len(test_p):], 
-                 color='blue', alpha=0.15, label='Prophet 95% Confidence Interval (Robust)')
-ax2.fill_between(test_p['ds'], 
-                 conf_int_s[:, 0], 
-                 conf_int_s[:, 1], 
-                 color='red', alpha=0.1, label='SARIMA Interval (Unstable)')
-
-ax2.set_title('이탈 징후 감지를 위한 신뢰 구간(Confidence Interval) 정교함 비교', fontsize=16, fontweight='bold')
+# Plot 2: mean MASE of every model over products and folds (error bar: spread over folds)
+colors = ['green' if model == winner else 'gray' for model in summary.index]
+ax2.bar(summary.index, summary['mase'], yerr=summary['fold_std'], color=colors, alpha=0.7, capsize=4)
+ax2.axhline(1.0, color='black', linestyle=':', lw=1, label='MASE = 1 (naive forecast)')
+ax2.set_title('모델별 평균 MASE (rolling-origin 백테스트, 낮을수록 우수)', fontsize=16, fontweight='bold')
 ax2.legend()
-ax2.set_ylabel('Sales Value ($)')
+ax2.set_ylabel('MASE')
 
-plt.suptitle('Why Prophet? : 리테일 비선형 모델 경합 승리 증거', fontsize=22, fontweight='bold', y=0.98)
+n_folds = metrics_df['fold'].nunique()
+n_products = metrics_df['Product_ID'].nunique()
+plt.suptitle(f'Why {winner}? : {n_products}개 상품 x {n_folds}개 폴드 경합 결과', fontsize=22, fontweight='bold', y=0.98)
 plt.tight_layout(rect=[0, 0.03, 1, 0.95])
 
 save_path = 'final_reports/ts/plots/deep_dive/model_comparison_victory.png'
 plt.savefig(save_path)
-print(f"Prophet victory chart saved to {save_path}")
+print(f"Model comparison chart saved to {save_path}")
@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+
+from dunnhumby_baselines import MODELS as BASELINE_MODELS, baseline_forecast, classify_demand
+from dunnhumby_global import GlobalRidge
+
+# Rolling-origin (expanding window) backtests.
+#
+# A series of n weeks is cut at K training ends (cutoffs), `step` weeks apart,
+# the last one `horizon` weeks before the end; fold k trains on y[:cutoff_k]
+# and is scored on the next `horizon` weeks. Two kinds of models:
+#   - vectorized (the dunnhumby_baselines models, 'baseline' = routed by demand
+#     class, 'global_ridge'): every product of a fold at once, in this process;
+#   - per-series ('sarima', 'prophet'): series_task in dunnhumby_parallel
+#     workers. With reuse, one task runs all folds of a product in order and
+#     carries the fitted state forward: SARIMA keeps the order found on the
+#     first fold and only updates its parameters with the new weeks
+#     (ARIMA.update), Prophet warm-starts each fold from the previous fit.
+#     Without reuse every (product, fold) is its own task.
+# Every forecast is scored with forecast_metrics into one tidy table: one row
+# per model, product and fold.
+FOLDS = 4
+MIN_TRAIN_WEEKS = 26
+SERIES_MODELS = ('sarima', 'prophet')
+VECTOR_MODELS = tuple(BASELINE_MODELS) + ('baseline', 'global_ridge')
+METRICS = ['mae', 'rmse', 'mase', 'smape']
+
+
+def rolling_origins(n_weeks, horizon, folds=FOLDS, step=None, min_train=MIN_TRAIN_WEEKS):
+    """Training ends (exclusive) of the expanding windows, oldest first; the last fold ends at the final week."""
+    step = step or horizon
+    cutoffs = [n_weeks - horizon - step * k for k in reversed(range(folds))]
+    cutoffs = [c for c in cutoffs if c >= min_train]
+    if not cutoffs:
+        raise ValueError(f"{n_weeks} weeks are too short for a {horizon}-week backtest "
+                         f"with at least {min_train} training weeks")
+    return cutoffs
+
+
+def forecast_metrics(actual, forecast, train):
+    """MAE, RMSE, MASE and sMAPE (%) of every row, as a dict of arrays.
+
+    MASE scales the MAE by the in-sample MAE of the one-step naive forecast on
+    train (nan for a flat training series); sMAPE counts weeks where actual and
+    forecast are both 0 as no error.
+    """
+    actual = np.asarray(actual, dtype='float64')
+    forecast = np.asarray(forecast, dtype='float64')
+    train = np.asarray(train, dtype='float64')
+    error = forecast - actual
+    mae = np.abs(error).mean(axis=1)
+    naive = np.abs(np.diff(train, axis=1)).mean(axis=1) if train.shape[1] > 1 else np.zeros(len(train))
+    denominator = np.abs(actual) + np.abs(forecast)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mase = np.where(naive > 0, mae / naive, np.nan)
+        smape = np.where(denominator > 0, 2 * np.abs(error) / denominator, 0.0).mean(axis=1) * 100
+    return {'mae': mae, 'rmse': np.sqrt((error ** 2).mean(axis=1)), 'mase': mase, 'smape': smape}
+
+
+def vector_fold_forecasts(model, y, cutoff, horizon):
+    """(products x horizon) forecasts of a vectorized model trained on y[:, :cutoff]."""
+    train = y[:, :cutoff]
+    if model == 'baseline':
+        return baseline_forecast(train, horizon)[0]
+    if model == 'global_ridge':
+        return GlobalRidge(horizon=horizon).fit(train).predict(train)
+    return BASELINE_MODELS[model](train, horizon)
+
+
+def _sarima_folds(y, cutoffs, horizon, reuse):
+    import pmdarima as pm
+    from dunnhumby_sarima import AUTO_ARIMA_PARAMS
+
+    forecasts = []
+    model, fitted_to = None, 0
+    for cutoff in cutoffs:
+        if model is None or not reuse:
+            model = pm.auto_arima(y[:cutoff], **AUTO_ARIMA_PARAMS)
+        else:
+            model.update(y[fitted_to:cutoff])
+        fitted_to = cutoff
+        forecasts.append(np.asarray(model.predict(n_periods=horizon), dtype='float64'))
+    return forecasts
+
+
+def _prophet_folds(ds, y, cutoffs, horizon, reuse):
+    from dunnhumby_prophet import fit_forecast, warm_start_params
+
+    df = pd.DataFrame({'ds': pd.to_datetime(ds), 'y': y})
+    forecasts = []
+    init = None
+    for cutoff in cutoffs:
+        model, forecast, _ = fit_forecast(df.iloc[:cutoff], horizon, init=init if reuse else None)
+        forecasts.append(forecast['yhat'].to_numpy(dtype='float64')[-horizon:])
+        init = warm_start_params(model)
+    return forecasts
+
+
+def series_task(payload):
+    """Per-series backtest of one product: payload model, ds, y, cutoffs, horizon, reuse.
+
+    Returns the list of (horizon,) forecasts, one per cutoff.
+    """
+    y = np.asarray(payload['y'], dtype='float64')
+    if payload['model'] == 'sarima':
+        return _sarima_folds(y, payload['cutoffs'], payload['horizon'], payload['reuse'])
+    if payload['model'] == 'prophet':
+        return _prophet_folds(payload['ds'], y, payload['cutoffs'], payload['horizon'], payload['reuse'])
+    raise ValueError(f"unknown per-series model {payload['model']!r}")
+
+
+def series_tasks(model, keys, ds, y, cutoffs, horizon, reuse=True):
+    """(key, payload) tasks of a per-series model: one per product with reuse, else one per product and fold.
+
+    Keys are (model, product key, fold index of the first cutoff).
+    """
+    tasks = []
+    for row, key in enumerate(keys):
+        groups = [list(range(len(cutoffs)))] if reuse else [[k] for k in range(len(cutoffs))]
+        for folds in groups:
+            tasks.append(((model, key, folds[0]), {
+                'model': model,
+                'ds': ds,
+                'y': y[row],
+                'cutoffs': [cutoffs[k] for k in folds],
+                'horizon': horizon,
+                'reuse': reuse,
+            }))
+    return tasks
+
+
+def metrics_frame(model, keys, y, cutoffs, horizon, forecasts, status=None, error=None, weeks=None):
+    """Tidy metrics of one model: forecasts is (folds x products x horizon), nan where a fit failed.
+
+    status / error: (folds x products) arrays of object, default 'ok' / None.
+    weeks: the week labels of y's columns (default 0..n-1), used for cutoff_week.
+    """
+    weeks = np.arange(y.shape[1]) if weeks is None else np.asarray(weeks)
+    frames = []
+    for k, cutoff in enumerate(cutoffs):
+        metrics = forecast_metrics(y[:, cutoff:cutoff + horizon], forecasts[k], y[:, :cutoff])
+        frames.append(pd.DataFrame({
+            'model': model,
+            'Product_ID': keys,
+            'fold': k,
+            'cutoff_week': weeks[cutoff - 1],
+            'train_weeks': cutoff,
+            'horizon': horizon,
+            **metrics,
+            'status': 'ok' if status is None else status[k],
+            'error': None if error is None else error[k],
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def forecasts_frame(model, keys, y, cutoffs, horizon, forecasts, weeks=None):
+    """Tidy forecasts of one model: one row per product, fold and target week, with the actual."""
+    weeks = np.arange(y.shape[1]) if weeks is None else np.asarray(weeks)
+    frames = []
+    for k, cutoff in enumerate(cutoffs):
+        target = np.arange(cutoff, cutoff + horizon)
+        frames.append(pd.DataFrame({
+            'model': model,
+            'Product_ID': np.repeat(keys, horizon),
+            'fold': k,
+            'week': np.tile(weeks[target], len(keys)),
+            'step': np.tile(np.arange(1, horizon + 1), len(keys)),
+            'actual': y[:, target].ravel(),
+            'forecast': np.asarray(forecasts[k], dtype='float64').ravel(),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def demand_classes_at(y, cutoffs):
+    """Demand class of every product on the training part of each fold (folds x products)."""
+    return np.stack([classify_demand(y[:, :cutoff])['demand_class'].to_numpy() for cutoff in cutoffs])
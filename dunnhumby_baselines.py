@@ -0,0 +1,198 @@
+import numpy as np
+import pandas as pd
+
+# Cheap statistical baselines, vectorized over every row of a product x week
+# matrix (rows: products, columns: consecutive weeks). Each model is one loop
+# over the weeks with NumPy operations across all products, so the whole
+# catalog costs about as much as a single per-series fit.
+#   seasonal_naive   the same weeks one season earlier
+#   ses / holt       simple / Holt linear exponential smoothing, with the
+#                    smoothing parameters picked per product from a small grid
+#                    by in-sample one-step squared error
+#   croston / sba / tsb   intermittent demand: demand size and interval (or
+#                    demand probability, TSB) smoothed separately
+#
+# Products are routed by the Syntetos-Boylan demand classes: ADI (average
+# interval between demands) and CV² (squared coefficient of variation of the
+# non-zero demand sizes), both measured from the first week with a sale.
+#   smooth         ADI < 1.32, CV² < 0.49   -> SARIMA / Prophet (ses when no
+#                                              per-series fit is made)
+#   erratic        ADI < 1.32, CV² >= 0.49  -> ses
+#   intermittent   ADI >= 1.32, CV² < 0.49  -> sba
+#   lumpy          ADI >= 1.32, CV² >= 0.49 -> tsb
+#   no_demand      no sale at all           -> zero
+ADI_THRESHOLD = 1.32
+CV2_THRESHOLD = 0.49
+SEASON = 52
+SMOOTHING_GRID = (0.05, 0.1, 0.2, 0.3, 0.5)
+TREND_GRID = (0.01, 0.05, 0.1)
+CROSTON_ALPHA = 0.1
+TSB_BETA = 0.1
+
+# smooth falls back to ses rather than holt: on the 06c holdout holt scores worst
+# on smooth series (MAE 13.40 vs 10.64 for ses), and in the 06d rolling backtest
+# the routed baseline with holt reached mean MASE 0.964 vs 0.834 for ses.
+BASELINE_MODELS = {
+    'smooth': 'ses',
+    'erratic': 'ses',
+    'intermittent': 'sba',
+    'lumpy': 'tsb',
+    'no_demand': 'zero',
+}
+# Demand classes worth a per-series SARIMA / Prophet fit
+EXPENSIVE_CLASSES = ('smooth',)
+
+
+def _as_matrix(y):
+    return np.maximum(np.asarray(y, dtype='float64'), 0)
+
+
+def classify_demand(y, keys=None):
+    """ADI, CV² and demand class of every row of y, as a DataFrame indexed by keys."""
+    y = _as_matrix(y)
+    demand = y > 0
+    n_demand = demand.sum(axis=1)
+    has_demand = n_demand > 0
+    first = np.argmax(demand, axis=1)
+    periods = y.shape[1] - first
+    safe_n = np.maximum(n_demand, 1)
+    adi = np.where(has_demand, periods / safe_n, np.inf)
+    mean_size = y.sum(axis=1) / safe_n
+    var_size = (y ** 2).sum(axis=1) / safe_n - mean_size ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cv2 = np.where(has_demand, np.maximum(var_size, 0) / mean_size ** 2, np.nan)
+
+    intermittent = adi >= ADI_THRESHOLD
+    erratic = cv2 >= CV2_THRESHOLD
+    classes = np.select([~has_demand, intermittent & erratic, intermittent, erratic],
+                        ['no_demand', 'lumpy', 'intermittent', 'erratic'], default='smooth')
+    return pd.DataFrame({'adi': adi, 'cv2': cv2, 'demand_class': classes},
+                        index=pd.Index(keys) if keys is not None else None)
+
+
+def classify_series(ts_df):
+    """classify_demand for a week x product frame (columns are the products)."""
+    return classify_demand(ts_df.to_numpy().T, keys=ts_df.columns)
+
+
+def seasonal_naive(y, horizon, season=SEASON):
+    """The same weeks one season earlier (the last value when the history is shorter than a season)."""
+    y = _as_matrix(y)
+    n_weeks = y.shape[1]
+    if n_weeks < season:
+        return np.repeat(y[:, -1:], horizon, axis=1)
+    steps = np.arange(horizon) % season
+    return y[:, n_weeks - season + steps]
+
+
+def ses(y, horizon, alphas=SMOOTHING_GRID, residuals=False):
+    """Simple exponential smoothing; the flat forecast at the final level of the best alpha per row.
+
+    With residuals, returns (forecasts, one-step in-sample errors of the chosen
+    alpha, rows x (T - 1)); they take a second pass over the weeks.
+    """
+    y = _as_matrix(y)
+    grid = np.asarray(alphas)[None, :]
+    level = np.repeat(y[:, :1], grid.shape[1], axis=1)
+    sse = np.zeros_like(level)
+    for t in range(1, y.shape[1]):
+        error = y[:, t:t + 1] - level
+        sse += error ** 2
+        level += grid * error
+    best = np.argmin(sse, axis=1)
+    final = level[np.arange(len(y)), best]
+    forecasts = np.repeat(final[:, None], horizon, axis=1)
+    if not residuals:
+        return forecasts
+
+    alpha = grid[0, best]
+    level = y[:, 0].copy()
+    errors = np.empty((len(y), max(y.shape[1] - 1, 0)))
+    for t in range(1, y.shape[1]):
+        errors[:, t - 1] = y[:, t] - level
+        level += alpha * errors[:, t - 1]
+    return forecasts, errors
+
+
+def holt(y, horizon, alphas=SMOOTHING_GRID, betas=TREND_GRID):
+    """Holt's linear trend method over an (alpha, beta) grid chosen per row; clipped at 0."""
+    y = _as_matrix(y)
+    grid_alpha, grid_beta = (g.ravel()[None, :] for g in np.meshgrid(alphas, betas))
+    n_grid = grid_alpha.shape[1]
+    level = np.repeat(y[:, :1], n_grid, axis=1)
+    trend = np.repeat(y[:, 1:2] - y[:, :1] if y.shape[1] > 1 else np.zeros((len(y), 1)), n_grid, axis=1)
+    sse = np.zeros_like(level)
+    for t in range(1, y.shape[1]):
+        predicted = level + trend
+        error = y[:, t:t + 1] - predicted
+        sse += error ** 2
+        new_level = predicted + grid_alpha * error
+        trend = trend + grid_beta * (new_level - level - trend)
+        level = new_level
+    rows = np.arange(len(y))
+    best = np.argmin(sse, axis=1)
+    steps = np.arange(1, horizon + 1)[None, :]
+    return np.maximum(level[rows, best][:, None] + steps * trend[rows, best][:, None], 0)
+
+
+def croston(y, horizon, alpha=CROSTON_ALPHA, variant='croston', beta=TSB_BETA):
+    """Croston's method and its SBA / TSB variants; a flat forecast per row.
+
+    croston: size / interval; sba: the same with the (1 - alpha/2) bias
+    correction; tsb: demand probability (updated every week with beta) x size.
+    Sizes start at the mean non-zero demand and intervals at the ADI.
+    """
+    y = _as_matrix(y)
+    demand = y > 0
+    n_demand = demand.sum(axis=1)
+    safe_n = np.maximum(n_demand, 1)
+    size = y.sum(axis=1) / safe_n
+    first = np.argmax(demand, axis=1)
+    interval = (y.shape[1] - first) / safe_n
+    probability = 1.0 / np.maximum(interval, 1.0)
+    since = np.ones(len(y))
+    started = np.zeros(len(y), dtype=bool)
+    for t in range(y.shape[1]):
+        d = demand[:, t]
+        update = d & started  # the first demand only starts the interval count
+        size = np.where(update, size + alpha * (y[:, t] - size), size)
+        interval = np.where(update, interval + alpha * (since - interval), interval)
+        if variant == 'tsb':
+            probability = np.where(started | d, probability + beta * (d - probability), probability)
+        since = np.where(d, 1.0, since + 1.0)
+        started |= d
+
+    if variant == 'tsb':
+        level = probability * size
+    else:
+        level = size / np.maximum(interval, 1.0)
+        if variant == 'sba':
+            level *= 1 - alpha / 2
+    level = np.where(n_demand > 0, level, 0.0)
+    return np.repeat(level[:, None], horizon, axis=1)
+
+
+MODELS = {
+    'seasonal_naive': seasonal_naive,
+    'ses': ses,
+    'holt': holt,
+    'croston': lambda y, h: croston(y, h, variant='croston'),
+    'sba': lambda y, h: croston(y, h, variant='sba'),
+    'tsb': lambda y, h: croston(y, h, variant='tsb'),
+    'zero': lambda y, h: np.zeros((len(y), h)),
+}
+
+
+def baseline_forecast(y, horizon, keys=None, models=BASELINE_MODELS):
+    """Routes every row to the baseline of its demand class and forecasts `horizon` weeks.
+
+    Returns (forecasts rows x horizon, classify_demand frame with a 'model' column).
+    Each model runs once, on the rows routed to it.
+    """
+    y = _as_matrix(y)
+    classes = classify_demand(y, keys=keys)
+    classes['model'] = classes['demand_class'].map(models)
+    forecasts = np.zeros((len(y), horizon))
+    for model, rows in classes.groupby('model', sort=False).indices.items():
+        forecasts[rows] = MODELS[model](y[rows], horizon)
+    return forecasts, classes
@@ -0,0 +1,262 @@
+import csv
+import importlib.util
+import json
+import math
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from dunnhumby_ingest import convert_all, iter_raw_table, load_raw_table
+from dunnhumby_join import DimensionIndex, join_dimensions
+from dunnhumby_profiling import new_run_id, peak_rss_mb
+from dunnhumby_storage import PartitionedWriter, load_master, read_manifest
+from dunnhumby_synthetic import generate, read_generated, scaled_config
+
+# Scaling benchmark on synthetic data (dunnhumby_synthetic). For every scale
+# the source tables are generated once under benchmarks/data/<scale>x/ and each
+# stage runs in a fresh worker process, so its peak RSS is its own:
+#   ingest         CSV -> raw Parquet (00) and the streamed dimension join into
+#                  the partitioned master table (01)
+#   weekly_agg     product x week sales aggregation and top-50 pivot (02a)
+#   apriori        basket x commodity one-hot matrix + Apriori (04 / 08)
+#   cf_similarity  household x commodity matrix + cosine similarity (10)
+#   rfm            per-household R/F/M aggregation and quartile scoring (rfm step 1)
+#   forecast       auto_arima on the top weekly series (04a / 06)
+# Stages whose optional library is not installed are reported as skipped.
+# Results go to benchmarks/results_<run_id>.csv/.json, and scaling_report()
+# flags stages whose time or memory grows faster than the data.
+BENCHMARK_DIR = 'benchmarks'
+DEFAULT_SCALES = [1, 10, 100]
+STAGES = ['ingest', 'weekly_agg', 'apriori', 'cf_similarity', 'rfm', 'forecast']
+
+# Optional libraries a stage needs, as in the pipeline scripts it mirrors
+STAGE_REQUIRES = {'apriori': 'mlxtend', 'cf_similarity': 'sklearn', 'forecast': 'pmdarima'}
+
+# Growth exponent (log time / log rows between two scales) above which a stage
+# is reported as superlinear: 1.0 is linear, 2.0 quadratic
+CLIFF_EXPONENT = 1.3
+
+# Series fitted by the forecast stage; model fits cost per series, not per row
+FORECAST_SERIES = 5
+
+RESULT_FIELDS = ['scale', 'stage', 'status', 'rows', 'seconds', 'cpu_s', 'rows_per_s',
+                 'peak_rss_mb', 'rss_growth_mb', 'detail']
+
+
+def data_paths(scale, root=BENCHMARK_DIR):
+    base = os.path.join(root, 'data', f'{scale:g}x')
+    return {
+        'base': base,
+        'source': os.path.join(base, 'dunnhumby.db'),
+        'raw': os.path.join(base, 'raw'),
+        'master': os.path.join(base, 'master_transaction_table'),
+    }
+
+
+def prepare_data(scale, seed=0, root=BENCHMARK_DIR):
+    """Generates the synthetic source tables of a scale unless an identical set exists."""
+    paths = data_paths(scale, root)
+    existing = read_generated(paths['source'])
+    if existing is None or existing['seed'] != seed or existing['config'] != scaled_config(scale):
+        if os.path.exists(paths['base']):
+            shutil.rmtree(paths['base'])
+        generate(paths['source'], scale=scale, seed=seed)
+    return paths
+
+
+# --- Stages: each takes the data paths and returns (rows processed, detail) ---
+
+def stage_ingest(paths):
+    convert_all(src_dir=paths['source'], dst_dir=paths['raw'])
+    products = load_raw_table('product', dst_dir=paths['raw'])
+    products['CURR_SIZE_OF_PRODUCT'] = products['CURR_SIZE_OF_PRODUCT'].str.strip().replace('', np.nan).astype('category')
+    dimensions = {'PRODUCT_ID': DimensionIndex(products, 'PRODUCT_ID'),
+                  'household_key': DimensionIndex(load_raw_table('hh_demographic', dst_dir=paths['raw']), 'household_key')}
+    if os.path.exists(paths['master']):
+        shutil.rmtree(paths['master'])
+    writer = PartitionedWriter(paths['master'])
+    for chunk in iter_raw_table('transaction_data', 500_000, dst_dir=paths['raw']):
+        writer.write(join_dimensions(chunk, dimensions))
+    rows = writer.close()
+    return rows, f"{len(read_manifest(paths['master'])['partitions'])} partitions"
+
+
+def stage_weekly_agg(paths):
+    df = load_master(columns=['PRODUCT_ID', 'WEEK_NO', 'SALES_VALUE'], root=paths['master'])
+    weekly = df.groupby(['PRODUCT_ID', 'WEEK_NO'])['SALES_VALUE'].sum().reset_index()
+    top = weekly.groupby('PRODUCT_ID')['SALES_VALUE'].sum().nlargest(50).index
+    ts = weekly[weekly['PRODUCT_ID'].isin(top)].pivot(index='WEEK_NO', columns='PRODUCT_ID', values='SALES_VALUE').fillna(0)
+    return len(df), f'{len(weekly):,} product-weeks, pivot {ts.shape}'
+
+
+def stage_apriori(paths, min_support=0.01, min_transactions=5):
+    from mlxtend.frequent_patterns import apriori, association_rules
+
+    df = load_master(columns=['BASKET_ID', 'COMMODITY_DESC', 'QUANTITY'], root=paths['master'])
+    df = df.dropna(subset=['COMMODITY_DESC'])
+    basket = df.groupby(['BASKET_ID', 'COMMODITY_DESC'], observed=True)['QUANTITY'].sum().unstack().fillna(0)
+    basket_sets = basket > 0
+    basket_sets = basket_sets.loc[:, basket_sets.sum() >= min_transactions]
+    itemsets = apriori(basket_sets, min_support=min_support, use_colnames=True)
+    rules = association_rules(itemsets, metric='lift', min_threshold=1) if len(itemsets) else []
+    return len(df), f'{basket_sets.shape[0]:,} baskets x {basket_sets.shape[1]} items, {len(rules)} rules'
+
+
+def stage_cf_similarity(paths):
+    from scipy.sparse import csr_matrix
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    df = load_master(columns=['household_key', 'COMMODITY_DESC'], root=paths['master'])
+    counts = df.groupby(['household_key', 'COMMODITY_DESC'], observed=True).size().reset_index(name='count')
+    matrix = counts.pivot(index='household_key', columns='COMMODITY_DESC', values='count').fillna(0)
+    similarity = cosine_similarity(csr_matrix(matrix.values))
+    return len(df), f'{similarity.shape[0]:,} x {similarity.shape[1]:,} similarity matrix'
+
+
+def stage_rfm(paths):
+    df = load_master(columns=['household_key', 'DAY', 'BASKET_ID', 'SALES_VALUE'], root=paths['master'])
+    last_day = df['DAY'].max()
+    rfm = df.groupby('household_key').agg(
+        LastDay=('DAY', 'max'),
+        Frequency=('BASKET_ID', 'nunique'),
+        Monetary=('SALES_VALUE', 'sum'),
+    )
+    rfm['Recency'] = last_day + 1 - rfm.pop('LastDay')
+    rfm['R_Score'] = pd.qcut(rfm['Recency'].rank(method='first'), q=4, labels=range(4, 0, -1)).astype(int)
+    rfm['F_Score'] = pd.qcut(rfm['Frequency'].rank(method='first'), q=4, labels=range(1, 5)).astype(int)
+    rfm['M_Score'] = pd.qcut(rfm['Monetary'].rank(method='first'), q=4, labels=range(1, 5)).astype(int)
+    # Row-wise apply, as in the RFM scripts
+    rfm['RFM_Segment_Code'] = rfm.apply(lambda x: f"{x['R_Score']}{x['F_Score']}{x['M_Score']}", axis=1)
+    return len(df), f'{len(rfm):,} households'
+
+
+def stage_forecast(paths, n_series=FORECAST_SERIES):
+    import pmdarima as pm
+
+    df = load_master(columns=['PRODUCT_ID', 'WEEK_NO', 'SALES_VALUE'], root=paths['master'])
+    weekly = df.groupby(['PRODUCT_ID', 'WEEK_NO'])['SALES_VALUE'].sum()
+    top = weekly.groupby(level='PRODUCT_ID').sum().nlargest(n_series).index
+    ts = weekly.loc[top].unstack('PRODUCT_ID').fillna(0)
+    for product_id in ts.columns:
+        pm.auto_arima(ts[product_id], start_p=1, start_q=1, test='adf', max_p=3, max_q=3, m=1,
+                      seasonal=False, error_action='ignore', suppress_warnings=True, stepwise=True)
+    return ts.size, f'{ts.shape[1]} series x {ts.shape[0]} weeks'
+
+
+_STAGE_FUNCTIONS = {
+    'ingest': stage_ingest,
+    'weekly_agg': stage_weekly_agg,
+    'apriori': stage_apriori,
+    'cf_similarity': stage_cf_similarity,
+    'rfm': stage_rfm,
+    'forecast': stage_forecast,
+}
+
+
+def _measure(stage, paths):
+    # Runs inside the stage's worker process
+    rss_start = peak_rss_mb()
+    wall, cpu = time.perf_counter(), time.process_time()
+    rows, detail = _STAGE_FUNCTIONS[stage](paths)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    peak = peak_rss_mb()
+    return {
+        'status': 'ok',
+        'rows': rows,
+        'seconds': round(wall, 3),
+        'cpu_s': round(cpu, 3),
+        'rows_per_s': round(rows / wall) if wall > 0 else None,
+        'peak_rss_mb': None if peak is None else round(peak, 1),
+        'rss_growth_mb': None if peak is None or rss_start is None else round(peak - rss_start, 1),
+        'detail': detail,
+    }
+
+
+def run_stage(stage, paths):
+    """Runs one stage in a fresh process; failures (including OOM kills) become 'error' records."""
+    missing = STAGE_REQUIRES.get(stage)
+    if missing and importlib.util.find_spec(missing) is None:
+        return {'status': 'skipped', 'detail': f'{missing} not installed'}
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        try:
+            return pool.submit(_measure, stage, paths).result()
+        except Exception as e:
+            return {'status': 'error', 'detail': f'{type(e).__name__}: {e}'}
+
+
+def run_benchmark(scales=DEFAULT_SCALES, stages=STAGES, seed=0, root=BENCHMARK_DIR, on_event=print):
+    """Runs the stages at each scale and returns the result records.
+
+    Stages after ingest read the master table that ingest built, so a failed
+    ingest marks the remaining stages of that scale as blocked.
+    """
+    records = []
+    for scale in scales:
+        on_event(f"[data] {scale:g}x: preparing synthetic tables...")
+        paths = prepare_data(scale, seed, root)
+        rows = read_generated(paths['source'])['rows']['transaction_data']
+        on_event(f"[data] {scale:g}x: {rows:,} transaction lines in {paths['source']}")
+        ingest_failed = False
+        for stage in stages:
+            if ingest_failed:
+                result = {'status': 'blocked', 'detail': 'ingest failed'}
+            else:
+                result = run_stage(stage, paths)
+                ingest_failed = stage == 'ingest' and result['status'] != 'ok'
+            records.append({'scale': scale, 'stage': stage, **result})
+            on_event(format_record(records[-1]))
+    return records
+
+
+def format_record(r):
+    if r['status'] != 'ok':
+        return f"[{r['status']}] {r['scale']:g}x {r['stage']}: {r.get('detail', '')}"
+    memory = '' if r['peak_rss_mb'] is None else f", peak {r['peak_rss_mb']:,.0f} MB (+{r['rss_growth_mb']:,.0f})"
+    return (f"[ok] {r['scale']:g}x {r['stage']}: {r['seconds']:.2f}s, {r['rows_per_s']:,} rows/s"
+            f"{memory} - {r['detail']}")
+
+
+def scaling_report(records, threshold=CLIFF_EXPONENT):
+    """Growth exponents of time and memory between consecutive scales of each stage.
+
+    Returns one dict per (stage, scale pair); 'superlinear' is True when the
+    time or memory exponent exceeds the threshold.
+    """
+    report = []
+    ok = [r for r in records if r['status'] == 'ok']
+    for stage in dict.fromkeys(r['stage'] for r in ok):
+        runs = sorted((r for r in ok if r['stage'] == stage), key=lambda r: r['scale'])
+        for a, b in zip(runs, runs[1:]):
+            data_ratio = math.log(b['rows'] / a['rows']) if b['rows'] > a['rows'] > 0 else None
+            if not data_ratio:
+                continue
+            time_exp = math.log(b['seconds'] / a['seconds']) / data_ratio if a['seconds'] > 0 and b['seconds'] > 0 else None
+            mem_exp = None
+            if a['rss_growth_mb'] and b['rss_growth_mb'] and a['rss_growth_mb'] > 0 and b['rss_growth_mb'] > 0:
+                mem_exp = math.log(b['rss_growth_mb'] / a['rss_growth_mb']) / data_ratio
+            report.append({
+                'stage': stage,
+                'scales': f"{a['scale']:g}x->{b['scale']:g}x",
+                'time_exponent': None if time_exp is None else round(time_exp, 2),
+                'memory_exponent': None if mem_exp is None else round(mem_exp, 2),
+                'superlinear': any(e is not None and e > threshold for e in (time_exp, mem_exp)),
+            })
+    return report
+
+
+def save_results(records, report, run_id=None, root=BENCHMARK_DIR):
+    """Writes benchmarks/results_<run_id>.csv (one row per stage run) and .json (with the scaling report)."""
+    run_id = run_id or new_run_id()
+    os.makedirs(root, exist_ok=True)
+    base = os.path.join(root, f'results_{run_id}')
+    with open(base + '.csv', 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(records)
+    with open(base + '.json', 'w', encoding='utf-8') as f:
+        json.dump({'run_id': run_id, 'results': records, 'scaling': report}, f, indent=2)
+    return base
@@ -0,0 +1,185 @@
+import ast
+import hashlib
+import json
+import os
+
+# Content-addressed artifact cache for the numbered pipeline steps.
+# A step's cache key is the SHA-256 of its input files, its parameters, its own
+# script source and the source of every local module the script imports, directly
+# or through other local modules (dunnhumby_sarima, dunnhumby_baselines, ...;
+# lazy imports inside functions included). When the key matches the last successful run and the
+# outputs recorded then are still present and unchanged, the step is skipped.
+#   .pipeline_cache/<step>.json   key + output hashes of the last successful run
+#   .pipeline_cache/_files.json   (size, mtime) -> SHA-256 memo, so unchanged
+#                                 files are not re-read on every check
+CACHE_DIR = '.pipeline_cache'
+FILE_MEMO_NAME = '_files.json'
+
+# Set DUNNHUMBY_NO_CACHE=1 to force every step to recompute
+DISABLE_ENV_VAR = 'DUNNHUMBY_NO_CACHE'
+
+# Runner infrastructure every step imports; its code does not shape the outputs
+CODE_EXCLUDE = {'dunnhumby_cache', 'dunnhumby_pipeline', 'dunnhumby_profiling'}
+
+_HASH_BLOCK_SIZE = 1 << 20
+_MISSING = 'missing'
+
+
+class FileHasher:
+    """Hashes files and directories, memoising file hashes by (size, mtime_ns)."""
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.path = os.path.join(cache_dir, FILE_MEMO_NAME)
+        self._memo = {}
+        self._dirty = False
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    self._memo = json.load(f)
+            except ValueError:
+                self._memo = {}  # unreadable memo: files are simply re-hashed
+
+    def file_hash(self, path):
+        st = os.stat(path)
+        stamp = [st.st_size, st.st_mtime_ns]
+        entry = self._memo.get(path)
+        if entry is not None and entry[:2] == stamp:
+            return entry[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+        self._memo[path] = stamp + [digest.hexdigest()]
+        self._dirty = True
+        return digest.hexdigest()
+
+    def hash(self, path):
+        """Hash of a file, of a directory tree (relative paths + file hashes), or 'missing'."""
+        if os.path.isfile(path):
+            return self.file_hash(path)
+        if not os.path.isdir(path):
+            return _MISSING
+        digest = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                digest.update(os.path.relpath(full, path).replace(os.sep, '/').encode())
+                digest.update(self.file_hash(full).encode())
+        return digest.hexdigest()
+
+    def save(self):
+        if self._dirty:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Steps running side by side each write their own temp file; last one wins
+            tmp = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._memo, f)
+            os.replace(tmp, self.path)
+            self._dirty = False
+
+
+def local_imports(script):
+    """Paths of the modules next to `script` that it imports, transitively (CODE_EXCLUDE not followed)."""
+    base = os.path.dirname(os.path.abspath(script))
+    found = {}
+    queue = [script]
+    while queue:
+        path = queue.pop()
+        try:
+            with open(path, 'rb') as f:
+                tree = ast.parse(f.read(), filename=path)
+        except (OSError, SyntaxError):
+            continue  # the script hash still changes; nothing more to follow
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                module = name.split('.')[0]
+                module_path = os.path.join(base, module + '.py')
+                if module in found or module in CODE_EXCLUDE or not os.path.isfile(module_path):
+                    continue
+                found[module] = module_path
+                queue.append(module_path)
+    return [os.path.relpath(found[m]) for m in sorted(found)]
+
+
+def fingerprint(hasher, inputs, params=None, script=None):
+    """Cache key of a step: its input hashes, JSON-encoded params, script source and local modules."""
+    digest = hashlib.sha256()
+    for path in sorted(inputs):
+        digest.update(f'{path}={hasher.hash(path)}\n'.encode())
+    digest.update(json.dumps(params or {}, sort_keys=True, default=str).encode())
+    if script is not None:
+        digest.update(hasher.hash(script).encode())
+        for path in local_imports(script):
+            digest.update(f'{os.path.basename(path)}={hasher.hash(path)}\n'.encode())
+    return digest.hexdigest()
+
+
+class StepCache:
+    """Skip-if-unchanged guard for one pipeline step.
+
+    Typical use at the top of a step script, once its parameters are known:
+
+        cache = StepCache('02a', inputs=[...], outputs=[...], params={'N': N}, script=__file__)
+        if cache.hit():
+            exit()
+        ...  # compute and write the outputs
+        cache.commit()
+
+    Outputs whose names are only known at run time (per-product plots or
+    models) can be registered with add_output() before commit().
+    """
+
+    def __init__(self, step, inputs, outputs, params=None, script=None, cache_dir=CACHE_DIR):
+        self.step = step
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+        self.script = script
+        self.path = os.path.join(cache_dir, f'{step}.json')
+        self.hasher = FileHasher(cache_dir)
+        self._key = None
+
+    @property
+    def key(self):
+        if self._key is None:
+            self._key = fingerprint(self.hasher, self.inputs, self.params, self.script)
+        return self._key
+
+    def hit(self, verbose=True):
+        """True when the inputs, params and script match the last successful run."""
+        key = self.key  # fixed before the step runs, even on a miss
+        if os.environ.get(DISABLE_ENV_VAR) or not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding='utf-8') as f:
+            entry = json.load(f)
+        hit = entry['key'] == key and all(
+            self.hasher.hash(path) == digest for path, digest in entry['outputs'].items())
+        self.hasher.save()
+        if hit and verbose:
+            print(f"[cache] Step {self.step}: inputs unchanged, reusing {len(entry['outputs'])} cached output(s).")
+        return hit
+
+    def add_output(self, path):
+        self.outputs.append(path)
+
+    def commit(self):
+        """Records the current key and output hashes after a successful run."""
+        entry = {
+            'step': self.step,
+            'key': self.key,
+            'params': self.params,
+            'outputs': {path: self.hasher.hash(path) for path in self.outputs},
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, indent=2, default=str)
+        os.replace(tmp, self.path)
+        self.hasher.save()
@@ -0,0 +1,222 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from dunnhumby_schema import enforce_schema
+
+# Precomputed weekly sales cube. Built in the same pass that writes the source
+# rows (01 streams its merged chunks into a CubeBuilder, the integration step
+# its integrated frame), so forecasting entry points slice a few hundred
+# thousand aggregated cells instead of regrouping millions of transaction rows.
+# Each level is a sparse COO Parquet file with one row per non-empty cell:
+#   <cube_dir>/product.parquet     product key x week
+#   <cube_dir>/<rollup>.parquet    e.g. commodity / department x week, summed
+#                                  from the product level via product attributes
+#   <cube_dir>/store.parquet       store x week
+#   <cube_dir>/total.parquet       week
+#   <cube_dir>/day.parquet         DAY (daily totals)
+#   <cube_dir>/attributes.parquet  product key -> descriptive attributes
+#   <cube_dir>/_cube.json          column names, levels and cell counts
+# Cells are summed in float64 and stored as float32: a weekly cell is a sum over
+# at most a few thousand lines, well inside float32 precision.
+CUBE_DIR = os.path.join('processed_data', 'sales_cube')
+# Cube of the integrated dataset; weeks are calendar weeks (date dimension week_index)
+INTEGRATED_CUBE_DIR = 'dunnhumby_sales_cube'
+CUBE_META_NAME = '_cube.json'
+
+# Partial aggregates are merged once they hold this many rows, so a streamed
+# build keeps memory bounded by the number of non-empty cells
+COMPACT_ROWS = 5_000_000
+
+
+def _level_path(cube_dir, level):
+    return os.path.join(cube_dir, f'{level}.parquet')
+
+
+class CubeBuilder:
+    """Accumulates weekly cube cells from blocks of transaction rows.
+
+    key / week / day / store name the columns of the incoming blocks; measures
+    are summed. rollups maps a level name to a product attribute column
+    (e.g. {'commodity': 'COMMODITY_DESC'}); attributes lists further product
+    columns kept in attributes.parquet. Levels whose columns are absent from
+    the blocks are not built.
+    """
+
+    def __init__(self, key='PRODUCT_ID', week='WEEK_NO', measures=('SALES_VALUE', 'QUANTITY'),
+                 rollups=None, attributes=(), store='STORE_ID', day='DAY'):
+        self.key = key
+        self.week = week
+        self.measures = list(measures)
+        self.rollups = dict(rollups or {})
+        self.attributes = list(dict.fromkeys(list(self.rollups.values()) + list(attributes)))
+        self.store = store
+        self.day = day
+        self._partials = {'product': [], 'store': [], 'day': []}
+        self._attrs = []
+        self._rows = 0
+
+    def _groupings(self, df):
+        groupings = {'product': [self.key, self.week]}
+        if self.store in df.columns:
+            groupings['store'] = [self.store, self.week]
+        if self.day in df.columns:
+            groupings['day'] = [self.day]
+        return groupings
+
+    def add(self, df):
+        """Adds one block of rows (any subset of the data, in any order)."""
+        if df.empty:
+            return
+        for level, by in self._groupings(df).items():
+            part = df.groupby(by, observed=True, sort=False)[self.measures].sum()
+            self._partials[level].append(part)
+        attrs = [c for c in self.attributes if c in df.columns]
+        if attrs:
+            self._attrs.append(df[[self.key] + attrs].drop_duplicates(subset=[self.key]))
+        self._rows += len(df)
+        if sum(len(p) for parts in self._partials.values() for p in parts) > COMPACT_ROWS:
+            self._compact()
+
+    def add_existing(self, cube_dir):
+        """Seeds the builder with a previously written cube (incremental runs: cells are additive)."""
+        meta = read_cube_meta(cube_dir)
+        for level, by in (('product', [self.key, self.week]), ('store', [self.store, self.week]), ('day', [self.day])):
+            if level in meta['levels']:
+                self._partials[level].append(pd.read_parquet(_level_path(cube_dir, level)).set_index(by)[self.measures])
+        if os.path.exists(_level_path(cube_dir, 'attributes')):
+            self._attrs.append(pd.read_parquet(_level_path(cube_dir, 'attributes')))
+        self._rows += meta['source_rows']
+
+    def _combine(self, parts):
+        if len(parts) == 1:
+            return parts[0]
+        combined = pd.concat(parts)
+        return combined.groupby(level=list(range(combined.index.nlevels)), observed=True).sum()
+
+    def _compact(self):
+        for level, parts in self._partials.items():
+            if len(parts) > 1:
+                self._partials[level] = [self._combine(parts)]
+
+    def _attribute_table(self):
+        if not self._attrs:
+            return None
+        return pd.concat(self._attrs, ignore_index=True).drop_duplicates(subset=[self.key]).sort_values(self.key)
+
+    def write(self, cube_dir=CUBE_DIR):
+        """Writes all levels and the meta file; returns the meta dict."""
+        os.makedirs(cube_dir, exist_ok=True)
+        levels = {}
+
+        def save(level, cells, by):
+            cells = cells.reset_index().sort_values(by, kind='stable')
+            cells[self.measures] = cells[self.measures].astype('float32')
+            cells.to_parquet(_level_path(cube_dir, level), index=False)
+            levels[level] = {'by': by, 'cells': len(cells)}
+
+        product = self._combine(self._partials['product'])
+        save('product', product, [self.key, self.week])
+
+        attrs = self._attribute_table()
+        if attrs is not None:
+            attrs.to_parquet(_level_path(cube_dir, 'attributes'), index=False)
+            by_product = product.reset_index().merge(attrs, on=self.key, how='left')
+            for level, column in self.rollups.items():
+                cells = by_product.groupby([column, self.week], observed=True)[self.measures].sum()
+                save(level, cells, [column, self.week])
+
+        save('total', product.groupby(level=self.week).sum(), [self.week])
+        if self._partials['store']:
+            save('store', self._combine(self._partials['store']), [self.store, self.week])
+        if self._partials['day']:
+            save('day', self._combine(self._partials['day']), [self.day])
+
+        meta = {
+            'key': self.key,
+            'week': self.week,
+            'day': self.day,
+            'measures': self.measures,
+            'rollups': self.rollups,
+            'source_rows': self._rows,
+            'levels': levels,
+        }
+        with open(os.path.join(cube_dir, CUBE_META_NAME), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        return meta
+
+
+def master_cube_builder():
+    """CubeBuilder for the merged master transaction rows written by 01."""
+    return CubeBuilder(rollups={'commodity': 'COMMODITY_DESC', 'department': 'DEPARTMENT'},
+                       attributes=['SUB_COMMODITY_DESC'])
+
+
+def integrated_cube_builder():
+    """CubeBuilder for the integrated dataset (needs a week_index column, see dunnhumby_dates)."""
+    return CubeBuilder(key='ProductID', week='week_index', measures=('TotalAmount', 'Quantity'),
+                       rollups={'category': 'Category'}, attributes=['ProductName'], store=None)
+
+
+def cube_exists(cube_dir=CUBE_DIR):
+    return os.path.exists(os.path.join(cube_dir, CUBE_META_NAME))
+
+
+def read_cube_meta(cube_dir=CUBE_DIR):
+    with open(os.path.join(cube_dir, CUBE_META_NAME), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_level(level, cube_dir=CUBE_DIR, keys=None, columns=None):
+    """Cells of one cube level as a COO DataFrame, optionally only for the given keys."""
+    meta = read_cube_meta(cube_dir)
+    by = meta['levels'][level]['by']
+    filters = [(by[0], 'in', list(keys))] if keys is not None else None
+    return enforce_schema(pd.read_parquet(_level_path(cube_dir, level), columns=columns, filters=filters), 'sales_cube')
+
+
+def load_attributes(cube_dir=CUBE_DIR):
+    """Product attributes recorded with the cube, indexed by the product key."""
+    meta = read_cube_meta(cube_dir)
+    return enforce_schema(pd.read_parquet(_level_path(cube_dir, 'attributes')), 'sales_cube').set_index(meta['key'])
+
+
+def top_keys(level='product', n=50, cube_dir=CUBE_DIR, value=None):
+    """The n keys of a level with the largest total `value` (default: first measure), largest first."""
+    meta = read_cube_meta(cube_dir)
+    value = value or meta['measures'][0]
+    key = meta['levels'][level]['by'][0]
+    cells = load_level(level, cube_dir, columns=[key, value])
+    totals = cells.groupby(key, observed=True)[value].sum().astype('float64')
+    return totals.nlargest(n).index.tolist()
+
+
+def key_slices(cells, key):
+    """Maps each key of COO cells sorted by key to the slice of its contiguous rows.
+
+    One pass over the key column; per-key series are then cells.iloc[slices[k]]
+    instead of a boolean filter over all cells for every key.
+    """
+    keys, starts, counts = np.unique(cells[key].to_numpy(), return_index=True, return_counts=True)
+    return {k: slice(int(s), int(s + c)) for k, s, c in zip(keys.tolist(), starts, counts)}
+
+
+def weekly_series(level='product', keys=None, top_n=None, cube_dir=CUBE_DIR, value=None):
+    """Week x key matrix of `value` for the given keys (or the top_n keys).
+
+    Columns follow the order of keys (top_n: largest total first). Weeks run
+    from the first to the last week with a non-empty cell among the selected
+    keys; empty cells are 0.
+    """
+    meta = read_cube_meta(cube_dir)
+    value = value or meta['measures'][0]
+    key, week = meta['levels'][level]['by']
+    if keys is None:
+        keys = top_keys(level, top_n, cube_dir, value)
+    cells = load_level(level, cube_dir, keys=keys, columns=[key, week, value])
+    ts = cells.pivot(index=week, columns=key, values=value).astype('float64').fillna(0)
+    all_weeks = pd.RangeIndex(start=ts.index.min(), stop=ts.index.max() + 1, name=week)
+    ts = ts.reindex(all_weeks, fill_value=0)
+    return ts[list(keys)]
@@ -2,56 +2,97 @@ import pandas as pd
 import numpy as np
 import os
 
+from dunnhumby_cube import INTEGRATED_CUBE_DIR, integrated_cube_builder
+from dunnhumby_dates import DATE_DIMENSION_PATH, build_date_dimension, lookup, save_date_dimension
+from dunnhumby_join import DimensionIndex, StarView
+from dunnhumby_schema import enforce_schema, print_memory_report, read_csv_typed, savings_report
+from dunnhumby_storage import (INTEGRATED_DATA_PATH, INTEGRATED_WATERMARK_PREFIX, SHARED_STORE_PATH,
+                               load_integrated, new_rows_mask, read_watermark, write_integrated,
+                               write_shared_store, write_watermark)
+
 # Define file paths
 archive_path = 'Dunnhumby/archive'
 transaction_data_path = os.path.join(archive_path, 'transaction_data.csv')
 product_path = os.path.join(archive_path, 'product.csv')
 hh_demographic_path = os.path.join(archive_path, 'hh_demographic.csv')
 
+# 증분(append-only) 모드: 워터마크(최대 DAY/WEEK_NO, 적재된 BASKET_ID 집합)에 없는
+# 신규 장바구니 행만 병합/변환하여 기존 통합 데이터셋에 추가합니다.
+# 워터마크가 없으면 전체 재생성을 수행합니다.
+INCREMENTAL = False
+
 # --- Phase 1: Data Understanding and Integration ---
 print("--- 1단계: Dunnhumby 데이터 통합 시작 (수정) ---")
 
 try:
     # 1. Load Core Tables
     print(f"'{transaction_data_path}' 로드 중...")
-    transactions = pd.read_csv(transaction_data_path)
+    transactions = read_csv_typed(transaction_data_path, 'transaction_data')
     print(f"'{transaction_data_path}' 로드 완료. 행: {transactions.shape[0]}, 열: {transactions.shape[1]}")
 
     print(f"'{product_path}' 로드 중...")
-    products = pd.read_csv(product_path)
+    products = read_csv_typed(product_path, 'product')
     print(f"'{product_path}' 로드 완료. 행: {products.shape[0]}, 열: {products.shape[1]}")
 
     print(f"'{hh_demographic_path}' 로드 중...")
-    demographics = pd.read_csv(hh_demographic_path)
+    demographics = read_csv_typed(hh_demographic_path, 'hh_demographic')
     print(f"'{hh_demographic_path}' 로드 완료. 행: {demographics.shape[0]}, 열: {demographics.shape[1]}")
 
-    # 2. Merge `product.csv` with `transaction_data.csv`
-    print("\n상품 데이터와 거래 데이터를 병합 중...")
-    df_merged = pd.merge(transactions, products, on='PRODUCT_ID', how='left')
-    print(f"상품 데이터 병합 완료. 행: {df_merged.shape[0]}, 열: {df_merged.shape[1]}")
-
-    # 3. Merge `hh_demographic.csv` with the result
-    print("\n고객 인구통계 데이터와 병합 중...")
-    df_merged = pd.merge(df_merged, demographics, on='household_key', how='left')
-    print(f"고객 인구통계 데이터 병합 완료. 행: {df_merged.shape[0]}, 열: {df_merged.shape[1]}")
+    # 스키마 레지스트리 dtype으로 읽어 절감된 메모리(컬럼별 bytes)를 출력합니다.
+    print_memory_report(savings_report(transactions), 'transaction_data')
+    print_memory_report(savings_report(products), 'product')
+
+    watermark, ingested_baskets = read_watermark(INTEGRATED_WATERMARK_PREFIX)
+    incremental = INCREMENTAL and watermark is not None and os.path.exists(INTEGRATED_DATA_PATH)
+    if incremental:
+        transactions = transactions[new_rows_mask(transactions['BASKET_ID'], ingested_baskets)].reset_index(drop=True)
+        print(f"\n증분 모드: 기존 {watermark['basket_count']:,}개 장바구니 이후 신규 행 {len(transactions):,}건만 처리합니다.")
+        if transactions.empty:
+            print("신규 거래가 없어 통합 데이터셋을 그대로 유지합니다.")
+            exit()
+
+    # First, create 'ProductName' from product attributes (once per product, not per transaction)
+    products['ProductName_combined'] = products['SUB_COMMODITY_DESC'].fillna(products['COMMODITY_DESC'])
+
+    # 2~3. 상품/인구통계 차원 조인
+    # pd.merge로 모든 행에 차원 컬럼을 복제하지 않고, PRODUCT_ID/household_key를 정수 코드로
+    # 매핑한 스타 스키마 뷰를 만듭니다. 차원 컬럼은 실제로 사용될 때만 take()로 수집됩니다.
+    print("\n상품 및 고객 인구통계 차원 인덱스 생성 중...")
+    df_merged = StarView(transactions, {
+        'PRODUCT_ID': DimensionIndex(products, 'PRODUCT_ID'),
+        'household_key': DimensionIndex(demographics, 'household_key'),
+    })
+    print(f"차원 조인 뷰 생성 완료. 행: {df_merged.shape[0]}, 열: {df_merged.shape[1]}")
 
     # 4. Process `DAY` column
     print("\n'DAY' 컬럼을 'OrderDate' (날짜) 형식으로 변환 중...")
-    min_day = df_merged['DAY'].min()
-    base_date = pd.to_datetime('2020-01-01') - pd.Timedelta(days=min_day - 1)
-    df_merged['OrderDate'] = base_date + pd.to_timedelta(df_merged['DAY'] - 1, unit='D')
-    print("'DAY' 컬럼 변환 완료.")
+    # 증분 실행에서도 최초 적재 시의 기준 DAY를 유지해야 OrderDate가 일관됩니다.
+    min_day = watermark['base_day'] if incremental else df_merged['DAY'].min()
+    max_day = max(watermark['max_day'], df_merged['DAY'].max()) if incremental else df_merged['DAY'].max()
+    # DAY별 날짜 차원(날짜, ISO 주차, 주 시작일, 월, 분기, 월 인덱스)을 한 번만 계산하고
+    # 거래 행에는 정수 DAY 코드로 조회(take)하여 붙입니다.
+    date_dim = build_date_dimension(min_day, max_day)
+    save_date_dimension(date_dim, DATE_DIMENSION_PATH)
+    df_merged['OrderDate'] = lookup(date_dim, df_merged['DAY'], 'date')
+    print(f"'DAY' 컬럼 변환 완료. 날짜 차원 {len(date_dim)}일을 '{DATE_DIMENSION_PATH}'로 저장했습니다.")
 
     # 5. Clean up / Select relevant columns
     print("\n분석에 필요한 컬럼 선택 및 이름 조정 중...")
 
-    # First, create 'ProductName' from product attributes BEFORE selection
-    df_merged['ProductName_combined'] = df_merged['SUB_COMMODITY_DESC'].fillna(df_merged['COMMODITY_DESC'])
-    # Handle cases where both are NaN, though unlikely with fillna(COMMODITY_DESC)
-    df_merged['ProductName_combined'] = df_merged['ProductName_combined'].fillna('Unknown Product')
-
+    # Only the dimension attributes used below are gathered from the view
+    df_analysis = df_merged.materialize(columns=[
+        'household_key', 'OrderDate', 'PRODUCT_ID', 'ProductName_combined',
+        'DEPARTMENT', 'BRAND', 'QUANTITY', 'SALES_VALUE',
+        'RETAIL_DISC', 'COUPON_DISC', 'COUPON_MATCH_DISC',
+        'AGE_DESC', 'INCOME_DESC', 'MARITAL_STATUS_CODE', 'HOMEOWNER_DESC',
+        'HH_COMP_DESC', 'HOUSEHOLD_SIZE_DESC', 'KID_CATEGORY_DESC',
+        'WEEK_NO', 'DAY', 'BASKET_ID'
+    ])
+    # Handle cases where both are NaN or the product is missing from product.csv
+    if df_analysis['ProductName_combined'].isna().any():
+        df_analysis['ProductName_combined'] = df_analysis['ProductName_combined'].astype(object).fillna('Unknown Product')
 
-    df_analysis = df_merged.rename(columns={
+    df_analysis = df_analysis.rename(columns={
         'household_key': 'CustomerID',
         'PRODUCT_ID': 'ProductID',
         'SALES_VALUE': 'TotalAmount',
@@ -82,7 +123,8 @@ try:
         'RetailDiscount', 'CouponDiscount', 'CouponMatchDiscount', 'Discount', # Individual + Combined
         'CustomerAge', 'CustomerIncome', 'MARITAL_STATUS_CODE', 'HOMEOWNER_DESC',
         'HH_COMP_DESC', 'HOUSEHOLD_SIZE_DESC', 'KID_CATEGORY_DESC',
-        'WeekNumber', 'BASKET_ID' # Added BASKET_ID for RFM Frequency calculation
+        'WeekNumber', 'BASKET_ID', # Added BASKET_ID for RFM Frequency calculation
+        'DAY' # Key into the date dimension (dunnhumby_dates) for time bucketing
     ]]
 
     # Rename ProductName_combined to ProductName for consistency with Amazon.csv structure
@@ -94,9 +136,34 @@ try:
     print("\n--- 최종 통합 데이터셋 샘플 (상위 5개) ---")
     print(df_analysis.head())
 
-    # Save the integrated dataset for future use
-    df_analysis.to_csv('dunnhumby_integrated_data.csv', index=False)
-    print("\n통합 데이터셋을 'dunnhumby_integrated_data.csv'로 저장했습니다.")
+    # 스키마 레지스트리(dunnhumby_schema)의 컴팩트 dtype 적용
+    df_analysis = enforce_schema(df_analysis, 'integrated')
+
+    if incremental:
+        # 기존 데이터셋은 변환 없이 그대로 읽어 신규 행만 이어 붙입니다.
+        df_analysis = pd.concat([load_integrated(shared=False), df_analysis], ignore_index=True)
+
+    # Save the integrated dataset for future use (typed Parquet, loaded via load_integrated)
+    integrated_table = write_integrated(df_analysis, INTEGRATED_DATA_PATH)
+    prev_baskets = ingested_baskets if incremental else ingested_baskets[:0]
+    prev_day, prev_week = (watermark['max_day'], watermark['max_week']) if incremental else (0, 0)
+    write_watermark(INTEGRATED_WATERMARK_PREFIX,
+                    np.concatenate([prev_baskets, transactions['BASKET_ID'].unique()]),
+                    max(prev_day, transactions['DAY'].max()), max(prev_week, transactions['WEEK_NO'].max()),
+                    base_day=int(min_day))
+    print(f"\n통합 데이터셋을 '{INTEGRATED_DATA_PATH}'로 저장했습니다.")
+
+    # 동시 실행되는 분석 스크립트가 메모리 매핑으로 공유하는 Arrow IPC 스토어 생성
+    write_shared_store(integrated_table, SHARED_STORE_PATH)
+    print(f"공유 메모리 매핑 스토어를 '{SHARED_STORE_PATH}'로 저장했습니다.")
+
+    # 주간 판매 큐브(상품/카테고리 x 달력 주, 일별 합계)를 같은 프레임에서 한 번에 집계합니다.
+    # 시계열 분석 스크립트는 거래 행 대신 이 큐브를 슬라이스합니다.
+    cube = integrated_cube_builder()
+    cube.add(df_analysis[['ProductID', 'ProductName', 'Category', 'Quantity', 'TotalAmount', 'DAY']]
+             .assign(week_index=lookup(date_dim, df_analysis['DAY'], 'week_index')))
+    cube_meta = cube.write(INTEGRATED_CUBE_DIR)
+    print(f"주간 판매 큐브({cube_meta['levels']['product']['cells']:,} 셀)를 '{INTEGRATED_CUBE_DIR}'로 저장했습니다.")
 
     print("\n--- Dunnhumby 데이터 통합 완료. 다음 단계로 진행합니다. ---")
 
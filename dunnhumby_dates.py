@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+from dunnhumby_schema import enforce_schema
+
+# Date dimension keyed on the raw DAY number of transaction_data.csv.
+# The integration step maps the first DAY of the data to BASE_DATE and writes one
+# row per DAY with every calendar attribute the analysis scripts bucket by, so
+# YearMonth / Quarter / week start / cohort month become integer lookups on DAY
+# instead of per-row datetime work.
+DATE_DIMENSION_PATH = 'dunnhumby_date_dimension.parquet'
+BASE_DATE = '2020-01-01'
+
+
+def build_date_dimension(base_day, last_day, base_date=BASE_DATE):
+    """Builds the date dimension for DAY = base_day..last_day, indexed by DAY."""
+    days = np.arange(int(base_day), int(last_day) + 1, dtype='int16')
+    dates = pd.Timestamp(base_date) + pd.to_timedelta(days.astype('int64') - int(base_day), unit='D')
+    iso = dates.isocalendar()
+    # to_period('W') periods run Monday..Sunday, matching the weekly 'ds' used by the TS scripts
+    week_start = dates.to_period('W').start_time
+    month = dates.to_period('M')
+    quarter = dates.to_period('Q')
+
+    dim = pd.DataFrame({
+        'date': dates,
+        'iso_year': iso['year'].to_numpy().astype('int16'),
+        'iso_week': iso['week'].to_numpy().astype('int8'),
+        'week_start': week_start,
+        'month': month.strftime('%Y-%m'),
+        'month_start': month.start_time,
+        'quarter': quarter.strftime('%YQ%q'),
+    }, index=pd.Index(days, name='DAY'))
+    first_month = month[0]
+    dim['week_index'] = ((dim['week_start'] - dim['week_start'].iloc[0]).dt.days // 7).astype('int16')
+    dim['month_index'] = ((month.year - first_month.year) * 12 + (month.month - first_month.month)).astype('int16')
+    dim['quarter_index'] = ((quarter.year - first_month.year) * 4 + (quarter.quarter - first_month.quarter)).astype('int16')
+    dim['month'] = dim['month'].astype('category')
+    dim['quarter'] = dim['quarter'].astype('category')
+    return dim
+
+
+def save_date_dimension(dim, path=DATE_DIMENSION_PATH):
+    dim.to_parquet(path)
+
+
+def load_date_dimension(path=DATE_DIMENSION_PATH):
+    return enforce_schema(pd.read_parquet(path), 'date_dimension')
+
+
+def lookup(dim, days, column):
+    """Gathers a date attribute for an array of DAY values with a single take()."""
+    values = dim[column]
+    pos = np.asarray(days, dtype='int64') - int(dim.index[0])
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return pd.Categorical.from_codes(values.cat.codes.to_numpy()[pos], dtype=values.dtype)
+    return values.to_numpy()[pos]
+
+
+def week_start_of(dim, week_index):
+    """Maps week_index values (e.g. sales cube weeks) to their Monday week_start."""
+    first = dim['week_start'].iloc[0]
+    return first + pd.to_timedelta(np.asarray(week_index, dtype='int64') * 7, unit='D')
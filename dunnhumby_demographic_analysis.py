@@ -4,8 +4,10 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import os
 
+from dunnhumby_storage import INTEGRATED_DATA_PATH, load_integrated
+
 # Define file paths
-integrated_data_path = 'dunnhumby_integrated_data.csv'
+integrated_data_path = INTEGRATED_DATA_PATH
 rfm_segments_path = 'dunnhumby_rfm_segments.csv'
 plots_dir = 'dunnhumby_plots'
 
@@ -21,10 +23,9 @@ try:
         'CustomerID', 'CustomerAge', 'CustomerIncome', 'MARITAL_STATUS_CODE',
         'HOMEOWNER_DESC', 'HH_COMP_DESC', 'HOUSEHOLD_SIZE_DESC', 'KID_CATEGORY_DESC'
     ]
-    # Use an iterator to read the large CSV in chunks if memory is an issue,
-    # but for now, we try to load only specific columns.
+    # Only the demographic columns are decoded from the Parquet file.
     # We only need one entry per customer, so we can drop duplicates.
-    df_demographics = pd.read_csv(integrated_data_path, usecols=demographic_cols).drop_duplicates(subset=['CustomerID'])
+    df_demographics = load_integrated(columns=demographic_cols).drop_duplicates(subset=['CustomerID'])
     print("인구통계학적 데이터를 로드하고 중복을 제거했습니다.")
 
     # 3. Merge RFM data with demographic data
@@ -6,11 +6,15 @@ import seaborn as sns
 import os
 import warnings
 import logging
-import joblib
 from prophet import Prophet
 import pmdarima as pm
 from sklearn.metrics import mean_absolute_error, mean_squared_error
 
+from dunnhumby_cube import INTEGRATED_CUBE_DIR, key_slices, load_attributes, load_level, top_keys
+from dunnhumby_dates import load_date_dimension, week_start_of
+from dunnhumby_registry import ModelRegistry, prophet_state, sarima_state
+from dunnhumby_sarima import OrderCache, product_clusters, search_arima
+
 # 경고 무시
 warnings.filterwarnings("ignore")
 logging.getLogger('prophet').setLevel(logging.WARNING)
@@ -22,37 +26,63 @@ plt.rcParams['axes.unicode_minus'] = False
 plt.rc('font', family='Malgun Gothic') # 명시적 추가 설정
 
 # 설정
-integrated_data_path = 'dunnhumby_integrated_data.csv'
+sales_cube_dir = INTEGRATED_CUBE_DIR
+# 매출 상위 N개 상품 (셀 조회가 상품 수에 선형이므로 1000개까지 늘려도 됩니다)
+TOP_N = 10
 base_output_dir = 'final_reports/ts'
 plots_dir = os.path.join(base_output_dir, 'plots/forecasts')
 validation_plots_dir = os.path.join(base_output_dir, 'plots/validation')
-models_dir = os.path.join(base_output_dir, 'models')
+# 학습된 모델은 파라미터만 모델 레지스트리(dunnhumby_registry)에 저장
+PROPHET_REGISTRY_NAME = 'prophet_detailed'
+SARIMA_REGISTRY_NAME = 'sarima_detailed'
+# 이전 실행(없으면 같은 COMMODITY 상품)에서 선택된 SARIMA 차수 주변만 탐색 (dunnhumby_sarima.OrderCache)
+USE_ORDER_CACHE = True
 
-for directory in [base_output_dir, plots_dir, validation_plots_dir, models_dir]:
+for directory in [base_output_dir, plots_dir, validation_plots_dir]:
     if not os.path.exists(directory):
         os.makedirs(directory)
 
 print("--- Dunnhumby 상품별 수요 예측 고도화 시작 (SARIMA & Prophet) ---")
 
+clusters = product_clusters() if USE_ORDER_CACHE else {}
+order_caches = {}  # (검증/전체 적합, m(계절 주기))별 차수 캐시
+registry = ModelRegistry()
+
+
+def fit_sarima(y, m, product_id, stage):
+    # stage: 'validation' (학습 구간) / 'full' (전체 기간) - 서로 다른 시계열이므로 캐시를 나눕니다
+    params = {'seasonal': True, 'm': m, 'suppress_warnings': True, 'error_action': 'ignore'}
+    if not USE_ORDER_CACHE:
+        return pm.auto_arima(y, **params)
+    key = (stage, m)
+    if key not in order_caches:
+        order_caches[key] = OrderCache(params, clusters, name=f'detailed_ts_{stage}')
+    model, entry = search_arima(y, params, seed=order_caches[key].seed(product_id))
+    order_caches[key].update(product_id, entry)
+    return model
+
+
 try:
     # 1. 데이터 로드
-    df = pd.read_csv(integrated_data_path)
-    df['OrderDate'] = pd.to_datetime(df['OrderDate'])
-    
+    # 통합 단계에서 만든 주간 판매 큐브(상품 x 주)를 사용하므로 거래 행을 다시 집계하지 않습니다.
     # 상품 정보 매핑 (상세 명칭 포함)
-    product_meta = df[['ProductID', 'ProductName', 'Category']].drop_duplicates()
+    product_meta = load_attributes(sales_cube_dir)
     
-    # 총 매출액 기준 상위 10개 상품 + 보고서 삽입용 특정 상품 추출
-    top_n_stats = df.groupby('ProductID')['TotalAmount'].sum().sort_values(ascending=False).head(10)
-    top_n_products = top_n_stats.index.tolist()
+    # 총 매출액 기준 상위 N개 상품 + 보고서 삽입용 특정 상품 추출
+    top_n_products = top_keys('product', TOP_N, sales_cube_dir, value='TotalAmount')
     
     # 보고서 삽입용 특정 상품 ID (가솔린, 유제품, 조리식품, 스낵류)
     special_products = [6534178, 1106523, 1029743, 1082185]
     top_50_products = list(set(top_n_products + special_products))
     print(f"분석 대상 상품 수: {len(top_50_products)} (핵심 품목 집중)")
 
-    # 주간 데이터로 변환 (일요일 기준)
-    df['ds'] = df['OrderDate'].dt.to_period('W').dt.start_time
+    # 대상 상품의 주간 셀만 한 번에 읽고, 큐브의 주 인덱스를 주 시작일(월요일)로 변환
+    weekly_cells = load_level('product', sales_cube_dir, keys=top_50_products,
+                              columns=['ProductID', 'week_index', 'TotalAmount'])
+    weekly_cells['ds'] = week_start_of(load_date_dimension(), weekly_cells['week_index'])
+    weekly_cells['TotalAmount'] = weekly_cells['TotalAmount'].astype('float64')
+    # 셀은 (ProductID, week_index) 순으로 정렬되어 있으므로 상품별 연속 구간을 한 번에 색인합니다.
+    product_slices = key_slices(weekly_cells, 'ProductID')
     
     all_forecasts = []
     validation_metrics = []
@@ -63,7 +93,10 @@ try:
     # 2. 상품별 루프
     for i, product_id in enumerate(top_50_products):
         # 상품명 가져오기 및 정제 (제안서 1.1 반영)
-        p_info = product_meta[product_meta['ProductID'] == product_id].iloc[0]
+        if product_id not in product_slices:
+            print(f"\n[{i+1}/{len(top_50_products)}] 상품 ID {product_id}의 매출 데이터가 없어 스킵합니다.")
+            continue
+        p_info = product_meta.loc[product_id]
         p_name = p_info['ProductName']
         p_cat = p_info['Category']
         
@@ -71,10 +104,10 @@ try:
         if 'COUPON' in p_name.upper() or 'MISC' in p_name.upper():
             p_name = f"{p_name} ({p_cat})"
             
-        print(f"\n[{i+1}/50] 상품: {p_name} (ID: {product_id}) 분석 중...")
+        print(f"\n[{i+1}/{len(top_50_products)}] 상품: {p_name} (ID: {product_id}) 분석 중...")
         
         # 상품별 주간 매출 집합
-        prod_df = df[df['ProductID'] == product_id].groupby('ds')['TotalAmount'].sum().reset_index()
+        prod_df = weekly_cells.iloc[product_slices[product_id]][['ds', 'TotalAmount']].reset_index(drop=True)
         prod_df = prod_df.rename(columns={'TotalAmount': 'y'})
         
         # 누락된 주차 채우기 (0원)
@@ -109,7 +142,7 @@ try:
             # --- 3.2 SARIMA Validation ---
             # 데이터가 충분하면 m=52 (제안서 1.2 반영)
             m_val_val = 52 if len(train_df) >= 52 else 1
-            sarima_val_model = pm.auto_arima(train_df['y'], seasonal=True, m=m_val_val, suppress_warnings=True, error_action='ignore')
+            sarima_val_model = fit_sarima(train_df['y'], m_val_val, product_id, 'validation')
             s_preds_val = sarima_val_model.predict(n_periods=backtest_horizon)
             
             s_mae = mean_absolute_error(test_df['y'], s_preds_val)
@@ -166,7 +199,10 @@ try:
         sarima_upper = [None] * forecast_horizon
         try:
             m_param = 52 if len(prod_df) >= 52 else 1
-            sarima_model = pm.auto_arima(prod_df['y'], seasonal=True, m=m_param, suppress_warnings=True, error_action='ignore')
+            sarima_model = fit_sarima(prod_df['y'], m_param, product_id, 'full')
+            registry.put(SARIMA_REGISTRY_NAME, product_id, 'sarima', sarima_state(sarima_model),
+                         metadata={'order': f"{sarima_model.order}x{sarima_model.seasonal_order}",
+                                   'train_weeks': len(prod_df), 'horizon': forecast_horizon})
             # 신뢰 구간 포함 (제안서 1.2 반영)
             preds, conf_int = sarima_model.predict(n_periods=forecast_horizon, return_conf_int=True)
             sarima_preds = preds.tolist()
@@ -185,7 +221,8 @@ try:
             m_full.fit(prod_df)
             
             # 모델 저장
-            joblib.dump(m_full, os.path.join(models_dir, f'prophet_model_{product_id}.joblib'))
+            registry.put(PROPHET_REGISTRY_NAME, product_id, 'prophet', prophet_state(m_full),
+                         metadata={'train_weeks': len(prod_df), 'horizon': forecast_horizon})
             
             future = m_full.make_future_dataframe(periods=forecast_horizon, freq='W')
             forecast = m_full.predict(future).iloc[-forecast_horizon:]
@@ -236,6 +273,8 @@ try:
         plt.close()
 
     # 7. 파일 저장
+    for order_cache in order_caches.values():
+        order_cache.save()
     results_df = pd.DataFrame(all_forecasts)
     results_df.to_csv(os.path.join(base_output_dir, 'dunnhumby_future_demand_forecasts_top50.csv'), index=False)
     
@@ -248,3 +287,5 @@ except Exception as e:
     print(f"분석 중 오류 발생: {e}")
     import traceback
     traceback.print_exc()
+finally:
+    registry.close()
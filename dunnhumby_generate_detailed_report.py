@@ -2,8 +2,10 @@
 import pandas as pd
 import os
 
+from dunnhumby_storage import INTEGRATED_DATA_PATH, load_integrated
+
 # 파일 경로
-integrated_data_path = 'dunnhumby_integrated_data.csv'
+integrated_data_path = INTEGRATED_DATA_PATH
 base_input_dir = 'final_reports/ts'
 forecast_csv = os.path.join(base_input_dir, 'dunnhumby_future_demand_forecasts_top50.csv')
 metrics_csv = os.path.join(base_input_dir, 'dunnhumby_prophet_backtest_metrics.csv')
@@ -14,7 +16,7 @@ print("--- 고도화된 TS 보고서 생성 시작 ---")
 
 try:
     # 1. 데이터 로드
-    df_raw = pd.read_csv(integrated_data_path)
+    df_raw = load_integrated(columns=['ProductID', 'ProductName'])
     forecast_df = pd.read_csv(forecast_csv)
     metrics_df = pd.read_csv(metrics_csv)
     
@@ -35,7 +37,7 @@ try:
     summary_content = f"""# Dunnhumby 상품별 향후 수요 예측 요약 보고서
 
 ## 1. 분석 개요
-- **원천 데이터**: `dunnhumby_integrated_data.csv`
+- **원천 데이터**: `dunnhumby_integrated_data.parquet`
 - **분석 대상**: 매출 상위 50개 상품 (Top 50 Products)
 - **예측 기간**: 향후 12주 (주간 단위)
 - **핵심 모델**: ARIMA/Prophet 최적 하이브리드 조합
@@ -73,7 +75,7 @@ try:
 ## 1. 분석 방법론 및 데이터 프로세스 (Methodology)
 본 분석은 데이터의 무결성과 모델의 정밀도를 보장하기 위해 다음과 같은 고도화된 프로세스를 통해 수행되었습니다.
 
-- **데이터셋 정보**: `dunnhumby_integrated_data.csv` (트랜잭션 및 인구통계 통합본)
+- **데이터셋 정보**: `dunnhumby_integrated_data.parquet` (트랜잭션 및 인구통계 통합본)
 - **전처리 프로세스**: 
     1. **데이터 집계**: 상품별 주간 매출액(TotalAmount) 합산 및 인덱스 재정렬
     2. **결측치 보정**: 거래가 없는 주차를 0원 처리하여 고정 주간 시계열 구축
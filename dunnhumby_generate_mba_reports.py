@@ -22,7 +22,7 @@ try:
 
 ## 1. 분석 개요
 - **분석 대상**: 매출 상위 50개 상품군 간 연관 규칙
-- **원천 데이터**: `dunnhumby_integrated_data.csv` (전체 거래 기간)
+- **원천 데이터**: `dunnhumby_integrated_data.parquet` (전체 거래 기간)
 - **핵심 지표**: {stability_metrics.strip()}
 
 ## 2. 핵심 요약 (Executive Summary)
@@ -73,7 +73,7 @@ try:
 - **고신뢰도 품목 (Confidence > 0.5)**: 주력 상품(A) 구매 시 보조 상품(B)에 대한 타겟 쿠폰 발송.
 
 ---
-*원천 데이터셋 정보: dunnhumby_integrated_data.csv / 분석 수행일: 2025-05-22*
+*원천 데이터셋 정보: dunnhumby_integrated_data.parquet / 분석 수행일: 2025-05-22*
 """
     with open(detailed_report_path, 'w', encoding='utf-8') as f:
         f.write(detailed_content)
@@ -73,7 +73,7 @@ try:
 - **단계 2 (교차 구매)**: 추천 상품군이 기존 구매 카테고리와 다른 경우, 해당 카테고리 진입 유도를 위한 소액 할인권 배치.
 
 ---
-*원천 데이터셋 정보: dunnhumby_integrated_data.csv / 분석 수행일: 2025-05-22*
+*원천 데이터셋 정보: dunnhumby_integrated_data.parquet / 분석 수행일: 2025-05-22*
 """
     with open(detailed_report_path, 'w', encoding='utf-8') as f:
         f.write(detailed_content)
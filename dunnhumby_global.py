@@ -0,0 +1,142 @@
+import numpy as np
+
+# Global (pooled) forecasting model over the whole product x week matrix.
+#
+# Instead of one SARIMA/Prophet fit per product, a single ridge regression is
+# trained on every (product, origin week) window of the catalog at once. Each
+# window is scaled by the product's recent mean level, so products of any size
+# share the same weights. Features at an origin t (the last observed week):
+#   lags            y[t - k + 1] for k in LAGS
+#   rolling means   mean of the last w weeks for w in ROLLING_WINDOWS
+#   seasonal        the H weeks one SEASON earlier than the forecast weeks
+#   bias
+# and the targets are y[t + 1 .. t + H]. With the same origins for every horizon
+# the H direct models share X'X, so training is one pass that accumulates X'X
+# and X'Y over product chunks, followed by one (F x F) solve for all horizons.
+# Prediction is a single matrix product for every product.
+LAGS = (1, 2, 3, 4, 8, 13)
+ROLLING_WINDOWS = (4, 13, 26)
+SEASON = 52
+SCALE_WINDOW = 26
+RIDGE_ALPHA = 1.0
+CHUNK_ROWS = 10_000   # Products per feature chunk (bounds the memory of one pass)
+INTERVAL_Z = 1.96     # ~95% interval from the per-horizon residual std
+
+
+def _origin_scale(csum, origins, window):
+    # Mean of the last `window` weeks at each origin (shorter at the start of the history)
+    starts = np.maximum(origins + 1 - window, 0)
+    return (csum[:, origins + 1] - csum[:, starts]) / (origins + 1 - starts)
+
+
+class GlobalRidge:
+    """Direct multi-horizon ridge regression pooled over all series.
+
+    fit(y) learns one weight vector per horizon from every product and origin
+    of y (rows: products, columns: consecutive weeks); predict(y) forecasts the
+    `horizon` weeks after the last column for every row at once.
+    """
+
+    def __init__(self, horizon=12, lags=LAGS, rolling_windows=ROLLING_WINDOWS, season=SEASON,
+                 scale_window=SCALE_WINDOW, alpha=RIDGE_ALPHA):
+        self.horizon = horizon
+        self.lags = tuple(lags)
+        self.rolling_windows = tuple(rolling_windows)
+        self.season = season
+        self.scale_window = scale_window
+        self.alpha = alpha
+        self.weights = None
+        self.residual_std = None
+        self.n_windows = 0
+
+    @property
+    def n_features(self):
+        return len(self.lags) + len(self.rolling_windows) + (self.horizon if self.season else 0) + 1
+
+    def min_history(self):
+        """Weeks of history needed before the first usable origin."""
+        needed = max(self.lags + self.rolling_windows)
+        if self.season:
+            needed = max(needed, self.season)
+        return needed
+
+    def _features(self, y, csum, origins):
+        """(rows, origins, features) scaled feature array and the (rows, origins) scales."""
+        scale = _origin_scale(csum, origins, self.scale_window)
+        safe = np.where(scale > 0, scale, 1.0)[:, :, None]
+        parts = [y[:, origins[:, None] - np.array(self.lags)[None, :] + 1]]
+        parts.append(np.stack([_origin_scale(csum, origins, w) for w in self.rolling_windows], axis=2))
+        if self.season:
+            steps = np.arange(1, self.horizon + 1)
+            parts.append(y[:, origins[:, None] + steps[None, :] - self.season])
+        features = np.concatenate(parts, axis=2) / safe
+        bias = np.ones(features.shape[:2] + (1,), dtype=features.dtype)
+        return np.concatenate([features, bias], axis=2), scale
+
+    def _chunks(self, y):
+        for start in range(0, y.shape[0], CHUNK_ROWS):
+            chunk = np.asarray(y[start:start + CHUNK_ROWS], dtype='float64')
+            csum = np.concatenate([np.zeros((chunk.shape[0], 1)), np.cumsum(chunk, axis=1)], axis=1)
+            yield start, chunk, csum
+
+    def fit(self, y):
+        n_weeks = y.shape[1]
+        origins = np.arange(self.min_history() - 1, n_weeks - self.horizon)
+        if len(origins) == 0:
+            raise ValueError(f"{n_weeks} weeks of history are too short: the model needs "
+                             f"{self.min_history() + self.horizon}")
+        steps = np.arange(1, self.horizon + 1)
+        f = self.n_features
+        xtx = np.zeros((f, f))
+        xty = np.zeros((f, self.horizon))
+        yty = np.zeros(self.horizon)
+        n_windows = 0
+        for _, chunk, csum in self._chunks(y):
+            features, scale = self._features(chunk, csum, origins)
+            targets = chunk[:, origins[:, None] + steps[None, :]]
+            # Windows of a product with no recent sales carry no level to learn from
+            active = scale > 0
+            x = features[active]
+            t = targets[active] / scale[active][:, None]
+            xtx += x.T @ x
+            xty += x.T @ t
+            yty += np.einsum('ij,ij->j', t, t)
+            n_windows += len(x)
+        if n_windows == 0:
+            raise ValueError("no series with sales to train on")
+
+        penalty = np.full(f, self.alpha)
+        penalty[-1] = 0.0  # the bias is not shrunk
+        self.weights = np.linalg.solve(xtx + np.diag(penalty), xty)
+        # Residual sum of squares per horizon from the accumulated moments
+        sse = yty - 2 * np.einsum('fh,fh->h', self.weights, xty) + np.einsum('fh,fg,gh->h', self.weights, xtx, self.weights)
+        self.residual_std = np.sqrt(np.maximum(sse, 0) / n_windows)
+        self.n_windows = n_windows
+        return self
+
+    def predict(self, y, intervals=False):
+        """Forecasts (rows x horizon) after the last week of y, or (forecast, lower, upper) with intervals.
+
+        Forecasts are clipped at 0; a product without sales in the last
+        scale_window weeks is forecast at 0.
+        """
+        if self.weights is None:
+            raise ValueError("the model is not fitted")
+        if y.shape[1] < self.min_history():
+            raise ValueError(f"predict needs at least {self.min_history()} weeks of history")
+        origin = np.array([y.shape[1] - 1])
+        forecast = np.empty((y.shape[0], self.horizon))
+        lower = np.empty_like(forecast)
+        upper = np.empty_like(forecast)
+        for start, chunk, csum in self._chunks(y):
+            features, scale = self._features(chunk, csum, origin)
+            rows = slice(start, start + chunk.shape[0])
+            scale = scale[:, 0][:, None]
+            point = (features[:, 0, :] @ self.weights) * scale
+            forecast[rows] = np.maximum(point, 0)
+            width = INTERVAL_Z * self.residual_std[None, :] * scale
+            lower[rows] = np.maximum(point - width, 0)
+            upper[rows] = np.maximum(point + width, 0)
+        if intervals:
+            return forecast, lower, upper
+        return forecast
@@ -0,0 +1,272 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.linalg import splu
+
+from dunnhumby_baselines import ses
+
+# Product hierarchy and forecast reconciliation.
+#
+# Every product rolls up through product.csv's SUB_COMMODITY_DESC -> COMMODITY_DESC
+# -> DEPARTMENT to one total. A Hierarchy holds the summing matrix S (all nodes x
+# products, sparse 0/1) with the nodes stacked top-down:
+#   total | departments | commodities | sub-commodities | products
+# so S @ Y_bottom gives every level's series at once. Nodes are paths: the same
+# commodity name under two departments is two nodes.
+#
+# Base forecasts come from any vectorized forecaster f(Y, horizon) -> (forecasts,
+# in-sample residuals) applied to the rows of a level; the default, SES with its
+# smoothing picked per series, is nonlinear, so the base forecasts of an
+# aggregate and of its parts disagree. (A linear forecaster such as the moving
+# average is coherent by construction, and every method below then returns the
+# same forecasts.) They are reconciled with
+#   bottom_up   S @ bottom forecasts
+#   top_down    forecasts of one level split over its products by historical
+#               share, then S @ that (cheap: only the aggregate level is modeled)
+#   mint        minimum-trace: y~ = y^ - W C' (C W C')^-1 C y^ with C = [I  -S_agg],
+#               which only solves a system over the aggregate nodes. W is diagonal
+#               (ols / wls_struct / wls_var, sparse LU) or the shrunk residual
+#               covariance (mint_shrink, dense, small hierarchies only). Only the
+#               selected levels are modeled; the others are filled in first
+#               (fill_levels) from the nearest modeled level below (summed) or,
+#               failing that, above (split by historical share).
+HIERARCHY_LEVELS = ['DEPARTMENT', 'COMMODITY_DESC', 'SUB_COMMODITY_DESC']
+TOTAL_LEVEL = 'total'
+UNKNOWN_NODE = 'UNKNOWN'
+PATH_SEPARATOR = ' / '
+
+# mint_shrink builds a dense (nodes x nodes) covariance; beyond this use wls_var
+MAX_DENSE_NODES = 5_000
+
+
+class Hierarchy:
+    """Summing matrix and node labels for products keyed by `key`, in bottom_keys order."""
+
+    def __init__(self, products, bottom_keys, levels=HIERARCHY_LEVELS, key='PRODUCT_ID'):
+        self.key = key
+        self.bottom_keys = np.asarray(bottom_keys)
+        n_bottom = len(self.bottom_keys)
+        attrs = products.drop_duplicates(subset=[key]).set_index(key)[levels].reindex(self.bottom_keys)
+        attrs = attrs.astype(object).fillna(UNKNOWN_NODE).astype(str)
+
+        blocks = [sparse.csr_matrix(np.ones((1, n_bottom)))]
+        frames = [pd.DataFrame({'level': TOTAL_LEVEL, 'node': [TOTAL_LEVEL]})]
+        self.codes = {}
+        path = None
+        for level in levels:
+            path = attrs[level] if path is None else path + PATH_SEPARATOR + attrs[level]
+            codes, labels = pd.factorize(path, sort=True)
+            self.codes[level] = codes
+            blocks.append(sparse.csr_matrix((np.ones(n_bottom), (codes, np.arange(n_bottom))),
+                                            shape=(len(labels), n_bottom)))
+            frames.append(pd.DataFrame({'level': level, 'node': labels.astype(str)}))
+        blocks.append(sparse.identity(n_bottom, format='csr'))
+        frames.append(pd.DataFrame({'level': key, 'node': self.bottom_keys.astype(str)}))
+
+        self.levels = [TOTAL_LEVEL] + list(levels) + [key]
+        self.S = sparse.vstack(blocks, format='csr')
+        self.nodes = pd.concat(frames, ignore_index=True)
+        self.n_bottom = n_bottom
+        self.n_aggregate = self.S.shape[0] - n_bottom
+        bounds = np.cumsum([0] + [b.shape[0] for b in blocks])
+        self._slices = {level: slice(int(a), int(b)) for level, a, b in zip(self.levels, bounds[:-1], bounds[1:])}
+
+    @property
+    def n_nodes(self):
+        return self.S.shape[0]
+
+    def rows(self, level):
+        """Slice of the node rows of one level."""
+        return self._slices[level]
+
+    def level_codes(self, level):
+        """For each product, the position of its `level` ancestor within that level."""
+        if level == TOTAL_LEVEL:
+            return np.zeros(self.n_bottom, dtype='int64')
+        if level == self.key:
+            return np.arange(self.n_bottom)
+        return self.codes[level]
+
+    def level_matrix(self, level):
+        """Rows of S for one level: (level nodes x products) membership."""
+        return self.S[self.rows(level)]
+
+    def aggregate(self, y_bottom):
+        """Series of every node from the product series (products x time, dense or sparse)."""
+        out = self.S @ y_bottom
+        return out.toarray() if sparse.issparse(out) else np.asarray(out)
+
+
+def moving_average_forecast(y, horizon, window=13):
+    """Flat forecast at the mean of the last `window` periods, for every row of y at once.
+
+    Returns (forecasts rows x horizon, one-step in-sample residuals rows x (T - window)).
+    """
+    y = np.asarray(y, dtype='float64')
+    window = min(window, y.shape[1])
+    csum = np.concatenate([np.zeros((y.shape[0], 1)), np.cumsum(y, axis=1)], axis=1)
+    means = (csum[:, window:] - csum[:, :-window]) / window
+    forecasts = np.repeat(means[:, -1:], horizon, axis=1)
+    residuals = y[:, window:] - means[:, :-1]
+    return forecasts, residuals
+
+
+def ses_forecast(y, horizon):
+    """dunnhumby_baselines.ses for every row of y, with its one-step in-sample residuals."""
+    return ses(_dense(y), horizon, residuals=True)
+
+
+def historical_shares(hierarchy, y_bottom, level):
+    """Share of each product in its `level` ancestor over the history (equal split if the ancestor never sold)."""
+    totals = np.asarray(y_bottom.sum(axis=1)).ravel()
+    codes = hierarchy.level_codes(level)
+    parent_totals = np.bincount(codes, weights=totals)
+    parent_counts = np.bincount(codes)
+    parent = parent_totals[codes]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(parent > 0, totals / parent, 1.0 / parent_counts[codes])
+
+
+def bottom_up(hierarchy, bottom_forecasts):
+    return hierarchy.aggregate(bottom_forecasts)
+
+
+def top_down(hierarchy, level_forecasts, level, shares):
+    """Disaggregates forecasts of `level` to products by shares, then sums back up."""
+    codes = hierarchy.level_codes(level)
+    split = sparse.csr_matrix((shares, (np.arange(hierarchy.n_bottom), codes)),
+                              shape=(hierarchy.n_bottom, level_forecasts.shape[0]))
+    return hierarchy.aggregate(split @ level_forecasts)
+
+
+def _membership(hierarchy, upper, lower):
+    """(upper level nodes x lower level nodes) 0/1 matrix: lower node j lies under upper node i."""
+    counts = hierarchy.level_matrix(upper) @ hierarchy.level_matrix(lower).T
+    return (counts > 0).astype('float64')
+
+
+def fill_levels(hierarchy, values, levels, node_totals):
+    """Fills the rows of the levels not in `levels` of a nodes x k array in place.
+
+    A level is the sum of the nearest modeled level below it; a level with none
+    below (e.g. the products) splits the nearest modeled level above it by each
+    node's share of its ancestor's node_totals (equal split if it never sold).
+    """
+    order = hierarchy.levels  # top-down
+    depth = {level: i for i, level in enumerate(order)}
+    for level in order:
+        if level in levels:
+            continue
+        rows = hierarchy.rows(level)
+        below = [m for m in levels if depth[m] > depth[level]]
+        if below:
+            source = min(below, key=depth.get)
+            values[rows] = _membership(hierarchy, level, source) @ values[hierarchy.rows(source)]
+            continue
+        source = max(levels, key=depth.get)
+        parent = np.asarray(_membership(hierarchy, source, level).argmax(axis=0)).ravel()
+        totals = node_totals[rows]
+        parent_totals = np.bincount(parent, weights=totals)[parent]
+        parent_counts = np.bincount(parent)[parent]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shares = np.where(parent_totals > 0, totals / parent_totals, 1.0 / parent_counts)
+        values[rows] = shares[:, None] * values[hierarchy.rows(source)][parent]
+    return values
+
+
+def mint_weights(hierarchy, residuals=None, method='wls_var'):
+    """W for mint: a diagonal (1-D array) or, for mint_shrink, a dense covariance matrix."""
+    if method == 'ols':
+        return np.ones(hierarchy.n_nodes)
+    if method == 'wls_struct':
+        return np.asarray(hierarchy.S.sum(axis=1)).ravel()
+    if residuals is None:
+        raise ValueError(f"'{method}' needs in-sample residuals for every node")
+    if method == 'wls_var':
+        var = np.nanmean(np.square(residuals), axis=1)
+        # Series that never sold have zero variance; keep W positive definite
+        return np.maximum(var, np.finfo('float64').eps)
+    if method == 'mint_shrink':
+        if hierarchy.n_nodes > MAX_DENSE_NODES:
+            raise ValueError(f"mint_shrink needs a dense {hierarchy.n_nodes:,}-node covariance; use 'wls_var'")
+        return _shrunk_covariance(residuals)
+    raise ValueError(f"unknown MinT weights: {method}")
+
+
+def _shrunk_covariance(residuals):
+    """Schafer-Strimmer shrinkage of the residual covariance towards its diagonal."""
+    x = residuals[:, ~np.isnan(residuals).any(axis=0)].T
+    n = x.shape[0]
+    cov = x.T @ x / n
+    std = np.sqrt(np.maximum(np.diag(cov), np.finfo('float64').eps))
+    corr = cov / np.outer(std, std)
+    xs = x / std
+    v = (xs.T ** 2 @ xs ** 2 - (xs.T @ xs) ** 2 / n) / (n * (n - 1))
+    np.fill_diagonal(v, 0)
+    d = np.square(corr)
+    np.fill_diagonal(d, 0)
+    lam = float(np.clip(v.sum() / d.sum(), 0, 1)) if d.sum() > 0 else 1.0
+    shrunk = (1 - lam) * cov
+    shrunk[np.diag_indices_from(shrunk)] = np.diag(cov) + np.finfo('float64').eps
+    return shrunk
+
+
+def mint(hierarchy, base_forecasts, weights):
+    """MinT reconciliation of base forecasts for every node (nodes x horizon)."""
+    base = np.asarray(base_forecasts, dtype='float64')
+    n_agg = hierarchy.n_aggregate
+    s_agg = hierarchy.S[:n_agg]
+    # Incoherence of the base forecasts: aggregates minus the sum of their products
+    gap = base[:n_agg] - s_agg @ base[n_agg:]
+    if weights.ndim == 1:
+        w_agg, w_bottom = weights[:n_agg], weights[n_agg:]
+        cwc = sparse.diags(w_agg) + s_agg @ sparse.diags(w_bottom) @ s_agg.T
+        x = splu(sparse.csc_matrix(cwc)).solve(gap)
+        correction = np.vstack([x, -(s_agg.T @ x)])
+        return base - weights[:, None] * correction
+    c = sparse.hstack([sparse.identity(n_agg), -s_agg], format='csr')
+    wct = (c @ weights).T
+    x = np.linalg.solve(c @ wct, gap)
+    return base - wct @ x
+
+
+def reconcile(hierarchy, y_bottom, horizon, method='mint', level=None, weights='wls_var',
+              forecast_fn=ses_forecast, levels=None):
+    """Forecasts every node for `horizon` periods, coherent across the hierarchy.
+
+    Only the levels a method needs are modeled: products for bottom_up, `level`
+    for top_down, and `levels` (default: all) for mint, with `weights` as in
+    mint_weights; the unmodeled levels' forecasts and residuals are filled in by
+    fill_levels before reconciling. Returns a nodes x horizon array in
+    hierarchy.nodes order.
+    """
+    if method == 'bottom_up':
+        forecasts, _ = forecast_fn(_dense(y_bottom), horizon)
+        return bottom_up(hierarchy, forecasts)
+    if method == 'top_down':
+        level = level or TOTAL_LEVEL
+        forecasts, _ = forecast_fn(hierarchy.aggregate(y_bottom)[hierarchy.rows(level)], horizon)
+        return top_down(hierarchy, forecasts, level, historical_shares(hierarchy, y_bottom, level))
+    if method == 'mint':
+        series = hierarchy.aggregate(y_bottom)
+        levels = list(levels) if levels else list(hierarchy.levels)
+        unknown = [lv for lv in levels if lv not in hierarchy.levels]
+        if unknown:
+            raise ValueError(f"unknown hierarchy level(s): {unknown} (choose from {hierarchy.levels})")
+        if len(levels) == len(hierarchy.levels):
+            forecasts, residuals = forecast_fn(series, horizon)
+        else:
+            modeled = np.concatenate([np.arange(hierarchy.n_nodes)[hierarchy.rows(lv)] for lv in levels])
+            level_forecasts, level_residuals = forecast_fn(series[modeled], horizon)
+            forecasts = np.zeros((hierarchy.n_nodes, horizon))
+            residuals = np.zeros((hierarchy.n_nodes, level_residuals.shape[1]))
+            forecasts[modeled], residuals[modeled] = level_forecasts, level_residuals
+            node_totals = series.sum(axis=1)
+            fill_levels(hierarchy, forecasts, levels, node_totals)
+            fill_levels(hierarchy, residuals, levels, node_totals)
+        return mint(hierarchy, forecasts, mint_weights(hierarchy, residuals, weights))
+    raise ValueError(f"unknown reconciliation method: {method}")
+
+
+def _dense(y):
+    return y.toarray() if sparse.issparse(y) else np.asarray(y)
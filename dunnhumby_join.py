@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+# Keys whose value range is at most this wide are resolved through a direct-address
+# array (one int32 slot per possible key); wider key ranges such as PRODUCT_ID
+# (up to ~18M) fall back to a binary search over the sorted dimension keys.
+DENSE_LOOKUP_MAX_SPAN = 1 << 22
+
+
+class DimensionIndex:
+    """Integer-indexed view of a dimension table (products, demographics, ...).
+
+    Each dimension row gets a dense code 0..n-1. Fact keys are mapped to those
+    codes once, and attributes are then gathered with NumPy take() instead of a
+    hash join. String columns are held as categorical codes, so a gathered
+    attribute is a categorical column and no strings are copied per fact row.
+    """
+
+    def __init__(self, dim_df, key):
+        dim_df = dim_df.drop_duplicates(subset=[key]).reset_index(drop=True)
+        self.key = key
+        self.keys = dim_df[key].to_numpy(dtype='int64')
+        self.columns = [c for c in dim_df.columns if c != key]
+        self._columns = {}
+        for col in self.columns:
+            values = dim_df[col]
+            if values.dtype == object or pd.api.types.is_string_dtype(values):
+                values = values.astype('category')
+            self._columns[col] = values
+
+        key_min, key_max = (int(self.keys.min()), int(self.keys.max())) if len(self.keys) else (0, -1)
+        self._offset = key_min
+        if key_max - key_min < DENSE_LOOKUP_MAX_SPAN:
+            self._dense = np.full(key_max - key_min + 1, -1, dtype='int32')
+            self._dense[self.keys - key_min] = np.arange(len(self.keys), dtype='int32')
+        else:
+            self._dense = None
+            self._order = np.argsort(self.keys, kind='stable')
+            self._sorted_keys = self.keys[self._order]
+
+    def codes(self, fact_keys):
+        """Maps fact key values to dimension row codes; -1 where the key is unknown."""
+        fact_keys = np.asarray(fact_keys, dtype='int64')
+        if self._dense is not None:
+            pos = fact_keys - self._offset
+            in_range = (pos >= 0) & (pos < len(self._dense))
+            codes = np.full(len(fact_keys), -1, dtype='int32')
+            codes[in_range] = self._dense[pos[in_range]]
+            return codes
+        pos = np.searchsorted(self._sorted_keys, fact_keys)
+        pos[pos == len(self._sorted_keys)] = 0
+        found = self._sorted_keys[pos] == fact_keys
+        return np.where(found, self._order[pos], -1).astype('int32')
+
+    def gather(self, col, codes, index=None):
+        """Gathers one attribute for the given row codes (-1 -> missing)."""
+        values = self._columns[col]
+        missing = codes < 0
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Appending a -1 sentinel lets code -1 pick "missing" without a mask pass
+            cat_codes = np.append(values.cat.codes.to_numpy(), -1)
+            gathered = pd.Categorical.from_codes(cat_codes[codes], dtype=values.dtype)
+            return pd.Series(gathered, index=index, name=col)
+        arr = values.to_numpy()
+        if missing.any():
+            arr = np.append(arr.astype('float64' if arr.dtype.kind in 'iub' else arr.dtype), np.nan)
+        return pd.Series(arr[codes], index=index, name=col)
+
+
+class StarView:
+    """Star-schema view: a fact table plus dimension indexes, resolved lazily.
+
+    Fact columns are returned as-is. Dimension attributes are gathered only
+    when they are first accessed, and the key-to-code mapping of each dimension
+    is computed once and reused. materialize() produces the same columns, in the
+    same order, as chained left pd.merge calls on the dimension keys.
+    """
+
+    def __init__(self, fact, dimensions):
+        self.fact = fact
+        self.dimensions = dimensions
+        self._codes = {}
+        self._resolved = {}
+
+    @property
+    def columns(self):
+        cols = list(self.fact.columns)
+        for dim in self.dimensions.values():
+            cols.extend(c for c in dim.columns if c not in cols)
+        return cols
+
+    @property
+    def shape(self):
+        return len(self.fact), len(self.columns)
+
+    def _dimension_for(self, col):
+        for key, dim in self.dimensions.items():
+            if col in dim.columns:
+                return key, dim
+        raise KeyError(col)
+
+    def __getitem__(self, col):
+        if col in self.fact.columns:
+            return self.fact[col]
+        if col not in self._resolved:
+            key, dim = self._dimension_for(col)
+            if key not in self._codes:
+                self._codes[key] = dim.codes(self.fact[key].to_numpy())
+            self._resolved[col] = dim.gather(col, self._codes[key], index=self.fact.index)
+        return self._resolved[col]
+
+    def __setitem__(self, col, values):
+        self.fact[col] = values
+
+    def materialize(self, columns=None):
+        columns = self.columns if columns is None else columns
+        return pd.DataFrame({col: self[col] for col in columns}, index=self.fact.index)
+
+
+def join_dimensions(fact, dimensions):
+    """Eagerly joins all dimension attributes onto the fact table (left join semantics)."""
+    return StarView(fact, dimensions).materialize().reset_index(drop=True)
@@ -1,22 +1,25 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
 
+from dunnhumby_dates import load_date_dimension, lookup
+from dunnhumby_storage import INTEGRATED_DATA_PATH, load_integrated
+
 # Define integrated data path
-integrated_data_path = 'dunnhumby_integrated_data.csv'
+integrated_data_path = INTEGRATED_DATA_PATH
 plots_dir = 'dunnhumby_plots'
 
 # --- Phase 2: Analysis Execution - KPI Analysis ---
 print("--- Dunnhumby KPI 분석: 월별 활성 사용자 (MAU) ---")
 
 try:
-    df = pd.read_csv(integrated_data_path)
-    df['OrderDate'] = pd.to_datetime(df['OrderDate'])
+    df = load_integrated(columns=['CustomerID', 'DAY'])
     
     # Calculate MAU
-    df['YearMonth'] = df['OrderDate'].dt.to_period('M')
-    mau = df.groupby('YearMonth')['CustomerID'].nunique()
+    # Month bucket is an integer lookup on DAY in the precomputed date dimension
+    dates = load_date_dimension()
+    df['YearMonth'] = lookup(dates, df['DAY'], 'month')
+    mau = df.groupby('YearMonth', observed=True)['CustomerID'].nunique()
 
     print("\n--- 월별 활성 사용자 수 (MAU) ---")
     print(mau)
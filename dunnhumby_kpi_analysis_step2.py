@@ -1,34 +1,32 @@
 
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
 import os
 import datetime as dt
 
+from dunnhumby_dates import load_date_dimension, lookup
+from dunnhumby_storage import INTEGRATED_DATA_PATH, load_integrated
+
 # Define integrated data path and plots directory
-integrated_data_path = 'dunnhumby_integrated_data.csv'
+integrated_data_path = INTEGRATED_DATA_PATH
 plots_dir = 'dunnhumby_plots'
 
 # --- Phase 2: Analysis Execution - KPI Analysis ---
 print("--- Dunnhumby KPI 분석: 코호트 분석을 통한 고객 유지율 (Retention) ---")
 
 try:
-    df = pd.read_csv(integrated_data_path)
-    df['OrderDate'] = pd.to_datetime(df['OrderDate'])
+    df = load_integrated(columns=['CustomerID', 'DAY'])
     
     # --- Cohort Analysis ---
-    df['OrderMonth'] = df['OrderDate'].apply(lambda x: x.strftime('%Y-%m'))
+    # Order month is an integer month index looked up by DAY in the date dimension,
+    # so cohort month and cohort index are plain integer arithmetic
+    dates = load_date_dimension()
+    df['OrderMonth'] = lookup(dates, df['DAY'], 'month_index')
     df['CohortMonth'] = df.groupby('CustomerID')['OrderMonth'].transform('min')
 
     # Calculate cohort index
-    # Convert OrderMonth and CohortMonth to datetime objects for calculation
-    order_month_dt = pd.to_datetime(df['OrderMonth'])
-    cohort_month_dt = pd.to_datetime(df['CohortMonth'])
-
-    years_diff = order_month_dt.dt.year - cohort_month_dt.dt.year
-    months_diff = order_month_dt.dt.month - cohort_month_dt.dt.month
-    df['CohortIndex'] = years_diff * 12 + months_diff + 1
+    df['CohortIndex'] = df['OrderMonth'] - df['CohortMonth'] + 1
 
     # Calculate cohort counts
     cohort_data = df.groupby(['CohortMonth', 'CohortIndex'])['CustomerID'].nunique().reset_index()
@@ -37,7 +35,8 @@ try:
     # Calculate retention rate
     cohort_size = cohort_count.iloc[:, 0]
     cohort_retention = cohort_count.divide(cohort_size, axis=0)
-    cohort_retention.index = pd.to_datetime(cohort_retention.index).strftime('%Y-%m')
+    month_labels = dates.drop_duplicates('month_index').set_index('month_index')['month'].astype(str)
+    cohort_retention.index = month_labels.loc[cohort_retention.index].to_numpy()
 
     print("\n--- Dunnhumby 고객 유지율 (Retention Rate) 테이블 ---")
     # Display only a subset of columns for readability if there are too many months
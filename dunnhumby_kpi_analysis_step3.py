@@ -1,28 +1,30 @@
 
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
 
+from dunnhumby_dates import load_date_dimension, lookup
+from dunnhumby_storage import INTEGRATED_DATA_PATH, load_integrated
+
 # Define integrated data path and plots directory
-integrated_data_path = 'dunnhumby_integrated_data.csv'
+integrated_data_path = INTEGRATED_DATA_PATH
 plots_dir = 'dunnhumby_plots'
 
 # --- Phase 2: Analysis Execution - KPI Analysis ---
 print("--- Dunnhumby KPI 분석: 결제 유저당 평균 수익 (ARPPU) ---")
 
 try:
-    df = pd.read_csv(integrated_data_path)
-    df['OrderDate'] = pd.to_datetime(df['OrderDate'])
+    df = load_integrated(columns=['CustomerID', 'DAY', 'TotalAmount'])
     
     # Calculate Monthly Revenue and Paying Users (PU)
-    df['YearMonth'] = df['OrderDate'].dt.to_period('M')
+    # Month bucket (as month start date) is an integer lookup on DAY in the date dimension
+    dates = load_date_dimension()
+    df['YearMonth'] = lookup(dates, df['DAY'], 'month_start')
     monthly_revenue = df.groupby('YearMonth')['TotalAmount'].sum()
     paying_users = df.groupby('YearMonth')['CustomerID'].nunique() # PU is unique CustomerID
 
     # Calculate ARPPU
     arppu = monthly_revenue / paying_users
-    arppu.index = arppu.index.to_timestamp() # Convert PeriodIndex to DatetimeIndex for plotting
 
     print("\n--- 월별 결제 유저당 평균 수익 (ARPPU) ---")
     print(arppu.round(2))
@@ -4,14 +4,16 @@ from mlxtend.frequent_patterns import apriori, association_rules
 from mlxtend.preprocessing import TransactionEncoder
 import os
 
+from dunnhumby_storage import INTEGRATED_DATA_PATH, load_integrated
+
 # Define integrated data path
-integrated_data_path = 'dunnhumby_integrated_data.csv'
+integrated_data_path = INTEGRATED_DATA_PATH
 
 # --- Phase 2: Analysis Execution - Market Basket Analysis ---
 print("--- Dunnhumby 교차 구매 분석 (장바구니 분석) ---")
 
 try:
-    df = pd.read_csv(integrated_data_path)
+    df = load_integrated(columns=['BASKET_ID', 'ProductName'])
     
     # --- Data Preparation for Market Basket Analysis ---
     
@@ -0,0 +1,135 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from dunnhumby_cube import CUBE_DIR, load_level, read_cube_meta
+
+# Full-catalog product x week sales matrix in CSR form, written by 02a next to
+# the top-N series. Most products sell in a handful of weeks, so a dense
+# week x product frame for the whole catalog is almost all zeros; here only the
+# non-zero cells are kept.
+#
+# On disk it is an uncompressed Arrow IPC file with one row per product:
+#   <key>   int32             product key, ascending
+#   weeks   list<int16>       week offsets from first_week of the non-zero cells
+#   values  list<float32>     the cell values, same order
+# An Arrow list column is CSR: its offsets are indptr, its flattened children
+# are indices/data. The file is memory-mapped on read, so opening it costs
+# nothing and fetching one product touches only that product's pages.
+# key / week / value names, first_week and n_weeks are kept in the schema metadata.
+PRODUCT_MATRIX_PATH = os.path.join('processed_data', 'weekly_sales_all_products.arrow')
+MATRIX_META_KEY = b'series_matrix'
+
+
+def build_series_matrix(cells, key, week, value, first_week=None, n_weeks=None):
+    """Builds the CSR Arrow table from COO cells (one row per key x week)."""
+    # Keys whose cells are all zero get no row at all
+    cells = cells.loc[cells[value] != 0, [key, week, value]].sort_values([key, week], kind='stable')
+    week_no = cells[week].to_numpy().astype('int64')
+    first_week = int(week_no.min()) if first_week is None else int(first_week)
+    n_weeks = int(week_no.max()) - first_week + 1 if n_weeks is None else int(n_weeks)
+
+    keys, counts = np.unique(cells[key].to_numpy(), return_counts=True)
+    offsets = np.zeros(len(keys) + 1, dtype='int32')
+    np.cumsum(counts, out=offsets[1:])
+    weeks = pa.ListArray.from_arrays(pa.array(offsets), pa.array(week_no - first_week, type=pa.int16()))
+    values = pa.ListArray.from_arrays(pa.array(offsets), pa.array(cells[value].to_numpy(), type=pa.float32()))
+
+    meta = {'key': key, 'week': week, 'value': value, 'first_week': first_week, 'n_weeks': n_weeks, 'nnz': int(offsets[-1])}
+    schema = pa.schema([(key, pa.int32()), ('weeks', weeks.type), ('values', values.type)],
+                       metadata={MATRIX_META_KEY: json.dumps(meta)})
+    return pa.Table.from_arrays([pa.array(keys, type=pa.int32()), weeks, values], schema=schema)
+
+
+def write_series_matrix(path=PRODUCT_MATRIX_PATH, level='product', cube_dir=CUBE_DIR, value=None):
+    """Writes the matrix of one cube level (default: all products) and returns its metadata."""
+    cube_meta = read_cube_meta(cube_dir)
+    value = value or cube_meta['measures'][0]
+    key, week = cube_meta['levels'][level]['by']
+    cells = load_level(level, cube_dir, columns=[key, week, value])
+    table = build_series_matrix(cells, key, week, value)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    # Readers that are already attached keep their mapping of the old file
+    os.replace(tmp_path, path)
+    return json.loads(table.schema.metadata[MATRIX_META_KEY])
+
+
+class SeriesMatrix:
+    """Read-only, memory-mapped view of a matrix written by write_series_matrix.
+
+    series(key) returns one product as a dense weekly Series over the full week
+    range (float64, zeros for weeks without sales), the same shape 02a's
+    weekly_series gives per column. Iterating yields (key, series) pairs in key
+    order without ever building the dense matrix.
+    """
+
+    def __init__(self, path=PRODUCT_MATRIX_PATH):
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        meta = json.loads(table.schema.metadata[MATRIX_META_KEY])
+        self.key = meta['key']
+        self.value = meta['value']
+        self.nnz = meta['nnz']
+        self.weeks = pd.RangeIndex(meta['first_week'], meta['first_week'] + meta['n_weeks'], name=meta['week'])
+        self.keys = table.column(self.key).to_numpy()
+        weeks = table.column('weeks').combine_chunks()
+        values = table.column('values').combine_chunks()
+        self.indptr = weeks.offsets.to_numpy()
+        self.indices = weeks.values.to_numpy()
+        self.data = values.values.to_numpy()
+
+    @property
+    def shape(self):
+        return len(self.keys), len(self.weeks)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        pos = np.searchsorted(self.keys, key)
+        return pos < len(self.keys) and self.keys[pos] == key
+
+    def _position(self, key):
+        pos = int(np.searchsorted(self.keys, key))
+        if pos == len(self.keys) or self.keys[pos] != key:
+            raise KeyError(key)
+        return pos
+
+    def row(self, key):
+        """Sparse row of one key: (week offsets, values) of its non-zero cells."""
+        pos = self._position(key)
+        start, stop = self.indptr[pos], self.indptr[pos + 1]
+        return self.indices[start:stop], self.data[start:stop]
+
+    def series(self, key):
+        """Dense weekly Series of one key over the full week range."""
+        weeks, values = self.row(key)
+        dense = np.zeros(len(self.weeks), dtype='float64')
+        dense[weeks] = values
+        return pd.Series(dense, index=self.weeks, name=key)
+
+    def totals(self):
+        """Total value per key (one pass over the data, no densifying)."""
+        # Every stored row has at least one cell, so reduceat never sees an empty segment
+        sums = np.add.reduceat(self.data.astype('float64'), self.indptr[:-1]) if self.nnz else np.zeros(0)
+        return pd.Series(sums, index=pd.Index(self.keys, name=self.key), name=self.value)
+
+    def iter_series(self, keys=None):
+        """Yields (key, dense weekly Series) for the given keys (default: all, in key order)."""
+        for key in (self.keys if keys is None else keys):
+            yield key, self.series(key)
+
+    def __iter__(self):
+        return self.iter_series()
+
+    def to_scipy(self):
+        """The matrix as a scipy.sparse.csr_matrix (rows follow self.keys, columns self.weeks)."""
+        from scipy.sparse import csr_matrix
+        return csr_matrix((self.data, self.indices, self.indptr), shape=self.shape)
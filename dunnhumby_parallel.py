@@ -0,0 +1,160 @@
+import multiprocessing as mp
+import os
+import time
+from collections import deque
+from multiprocessing.connection import wait
+
+# Process pool for independent per-series tasks (one model fit per product).
+# Unlike concurrent.futures, every task gets a wall-clock timeout: a worker
+# whose task overruns is terminated and replaced, the task is recorded as
+# 'timeout' and the rest of its chunk goes back to the queue. A task that raises
+# is recorded as 'failed' with its error, and a worker that dies (crash, OOM
+# kill) fails only the task it was running. None of these stop the run.
+#
+# Each worker talks to this process over its own pipe, so killing one cannot
+# leave a shared queue lock held. func must be a module-level function of one
+# picklable payload: workers may be spawned (Windows), which re-imports func's
+# module in the child.
+#
+# The default pool size is WORKERS_ENV_VAR when set: the pipeline runner
+# (dunnhumby_pipeline.run_pipeline) sets it to the CPUs left over by the steps
+# running alongside, so concurrent steps do not each start one worker per CPU.
+WORKERS_ENV_VAR = 'DUNNHUMBY_POOL_WORKERS'
+DEFAULT_WORKERS = int(os.environ.get(WORKERS_ENV_VAR) or 0) or os.cpu_count() or 1
+POLL_SECONDS = 0.2
+
+
+def _worker_loop(func, conn):
+    while True:
+        chunk = conn.recv()
+        if chunk is None:
+            return
+        for key, payload in chunk:
+            conn.send(('start', key, None))
+            start = time.perf_counter()
+            try:
+                record = {'status': 'ok', 'result': func(payload), 'error': None}
+            except Exception as e:
+                record = {'status': 'failed', 'result': None, 'error': f"{type(e).__name__}: {e}"}
+            record['seconds'] = time.perf_counter() - start
+            conn.send(('done', key, record))
+
+
+def _run_serial(func, tasks, on_result):
+    records = {}
+    for key, payload in tasks:
+        start = time.perf_counter()
+        try:
+            record = {'status': 'ok', 'result': func(payload), 'error': None}
+        except Exception as e:
+            record = {'status': 'failed', 'result': None, 'error': f"{type(e).__name__}: {e}"}
+        record['seconds'] = time.perf_counter() - start
+        records[key] = record
+        if on_result:
+            on_result(key, record)
+    return records
+
+
+def run_parallel(func, tasks, workers=None, chunksize=1, timeout=None, on_result=None):
+    """Runs func(payload) for every (key, payload) in tasks and returns {key: record}.
+
+    A record has status ('ok' / 'failed' / 'timeout'), result (func's return
+    value when ok), error and seconds. on_result(key, record) is called in this
+    process as each task finishes, in completion order. Keys must be unique and
+    picklable. With workers=1 and no timeout the tasks run in this process.
+    """
+    tasks = list(tasks)
+    workers = max(1, min(workers or DEFAULT_WORKERS, len(tasks) or 1))
+    if workers == 1 and timeout is None:
+        return _run_serial(func, tasks, on_result)
+
+    payloads = dict(tasks)
+    pending = deque([key for key, _ in tasks[i:i + chunksize]] for i in range(0, len(tasks), chunksize))
+    ctx = mp.get_context()
+    active = {}
+    records = {}
+    next_id = [0]
+
+    def record(key, rec):
+        records[key] = rec
+        if on_result:
+            on_result(key, rec)
+
+    def handle(w, message):
+        kind, key, rec = message
+        if kind == 'start':
+            w['running'], w['started'] = key, time.perf_counter()
+        elif key not in records:
+            record(key, rec)
+            w['running'] = None
+            w['chunk'] = [k for k in w['chunk'] if k != key]
+
+    def start_worker():
+        worker_id = next_id[0]
+        next_id[0] += 1
+        conn, child_conn = ctx.Pipe()
+        proc = ctx.Process(target=_worker_loop, args=(func, child_conn), daemon=True)
+        proc.start()
+        child_conn.close()
+        active[worker_id] = {'proc': proc, 'conn': conn, 'chunk': [], 'running': None, 'started': None}
+
+    def retire(worker_id, status, error):
+        # The task it was running gets `status`; the rest of its chunk is queued again
+        w = active.pop(worker_id)
+        if w['proc'].is_alive():
+            w['proc'].terminate()
+        w['proc'].join()
+        w['conn'].close()
+        # Chunks run in order, so the first unfinished key is the one that was running
+        # even if its 'start' message never arrived
+        unfinished = [k for k in w['chunk'] if k not in records]
+        key = w['running'] if w['running'] is not None else (unfinished[0] if unfinished else None)
+        if key is not None and key not in records:
+            started = w['started'] if w['running'] is not None else time.perf_counter()
+            record(key, {'status': status, 'result': None, 'error': error,
+                         'seconds': time.perf_counter() - started})
+        rest = [k for k in w['chunk'] if k != key and k not in records]
+        if rest:
+            pending.appendleft(rest)
+        if pending:
+            start_worker()
+
+    for _ in range(workers):
+        start_worker()
+    try:
+        while len(records) < len(tasks):
+            for w in active.values():
+                if not w['chunk'] and pending:
+                    w['chunk'] = pending.popleft()
+                    w['conn'].send([(k, payloads[k]) for k in w['chunk']])
+
+            dead = set()
+            by_conn = {w['conn']: worker_id for worker_id, w in active.items()}
+            for conn in wait(list(by_conn), timeout=POLL_SECONDS):
+                worker_id = by_conn[conn]
+                try:
+                    while conn.poll():
+                        handle(active[worker_id], conn.recv())
+                except (EOFError, OSError):
+                    dead.add(worker_id)
+
+            now = time.perf_counter()
+            for worker_id, w in list(active.items()):
+                if timeout is not None and w['running'] is not None and now - w['started'] > timeout:
+                    retire(worker_id, 'timeout', f"exceeded {timeout:g}s")
+                elif worker_id in dead or not w['proc'].is_alive():
+                    w['proc'].join()
+                    retire(worker_id, 'failed', f"worker exited with code {w['proc'].exitcode}")
+            if not active:
+                start_worker()
+    finally:
+        for w in active.values():
+            try:
+                w['conn'].send(None)
+            except OSError:
+                pass
+        for w in active.values():
+            w['proc'].join(timeout=5)
+            if w['proc'].is_alive():
+                w['proc'].terminate()
+    return records
@@ -0,0 +1,382 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from dunnhumby_cache import CACHE_DIR, StepCache
+from dunnhumby_cube import CUBE_DIR, INTEGRATED_CUBE_DIR
+from dunnhumby_dates import DATE_DIMENSION_PATH
+from dunnhumby_matrix import PRODUCT_MATRIX_PATH
+from dunnhumby_parallel import WORKERS_ENV_VAR
+from dunnhumby_profiling import RUN_ID_ENV_VAR, new_run_id, profile_step
+from dunnhumby_storage import INTEGRATED_DATA_PATH, MASTER_DATASET_DIR
+
+# Declared inputs and outputs of the pipeline steps. Paths are the artifacts
+# each script reads and writes (relative to the project root). The artifact
+# cache fingerprints the inputs, and the runner derives the step DAG from them:
+# a step depends on every step that writes one of its inputs. 'pool': True marks
+# the steps that fit in a dunnhumby_parallel process pool; the runner runs one of
+# them at a time and gives it the CPUs the other running steps leave free.
+RAW_DIR = 'dunnhumby.db'
+RAW_PARQUET_DIR = os.path.join('processed_data', 'raw')
+TOP5_TS_PATH = os.path.join('processed_data', 'weekly_sales_top5_timeseries.parquet')
+TOP50_TS_PATH = os.path.join('processed_data', 'weekly_sales_top50_timeseries.parquet')
+FORECASTS_CSV = os.path.join('results', 'forecasts', 'future_demand_forecasts_top50.csv')
+GLOBAL_FORECASTS_CSV = os.path.join('results', 'forecasts', 'future_demand_forecasts_global.csv')
+BASELINE_FORECASTS_CSV = os.path.join('results', 'forecasts', 'future_demand_forecasts_baseline.csv')
+BACKTEST_CSV = 'prophet_backtest_metrics.csv'
+ROLLING_BACKTEST_METRICS_CSV = os.path.join('results', 'backtest', 'backtest_metrics.csv')
+ROLLING_BACKTEST_FORECASTS_PATH = os.path.join('results', 'backtest', 'backtest_forecasts.parquet')
+CROSS_SELLING_RULES_CSV = os.path.join('results', 'cross_selling', 'cross_selling_rules.csv')
+NBA_RECOMMENDATIONS_CSV = os.path.join('results', 'nba_recommendations.csv')
+ARCHIVE_DIR = os.path.join('Dunnhumby', 'archive')
+RFM_SEGMENTS_CSV = 'dunnhumby_rfm_segments.csv'
+TS_REPORT_DIR = os.path.join('final_reports', 'ts')
+TS_FORECASTS_CSV = os.path.join(TS_REPORT_DIR, 'dunnhumby_future_demand_forecasts_top50.csv')
+TS_BACKTEST_CSV = os.path.join(TS_REPORT_DIR, 'dunnhumby_prophet_backtest_metrics.csv')
+ANALYSIS_PLOTS_DIR = 'dunnhumby_plots'
+
+_SOURCE_TABLES = ['transaction_data', 'product', 'hh_demographic']
+
+STEPS = {
+    '00': {
+        'script': '00_convert_raw_tables.py',
+        'inputs': [RAW_DIR],
+        'outputs': [RAW_PARQUET_DIR],
+    },
+    '01': {
+        'script': '01_preprocess_data.py',
+        'inputs': [os.path.join(RAW_DIR, f'{t}.csv') for t in _SOURCE_TABLES]
+                  + [os.path.join(RAW_PARQUET_DIR, f'{t}.parquet') for t in _SOURCE_TABLES],
+        'outputs': [MASTER_DATASET_DIR, CUBE_DIR],
+    },
+    '02': {
+        'script': '02_demand_forecasting_prep.py',
+        'inputs': [CUBE_DIR],
+        'outputs': [TOP5_TS_PATH, os.path.join('plots', 'weekly_sales_top5.png')],
+    },
+    '02a': {
+        'script': '02a_demand_forecasting_prep_top50.py',
+        'inputs': [CUBE_DIR],
+        'outputs': [TOP50_TS_PATH, PRODUCT_MATRIX_PATH, os.path.join('plots', 'weekly_sales_top50.png')],
+    },
+    '03': {
+        'script': '03_demand_forecasting_model.py',
+        'inputs': [TOP5_TS_PATH],
+        'outputs': [],
+    },
+    '04': {
+        'script': '04_nba_association_rules.py',
+        'inputs': [MASTER_DATASET_DIR],
+        'outputs': [os.path.join('results', 'association_rules.csv')],
+    },
+    '04a': {
+        'script': '04a_demand_forecasting_sarima_top50.py',
+        'inputs': [TOP50_TS_PATH],
+        'outputs': ['sarima_mae_results_top50.csv'],
+        'pool': True,
+    },
+    '05': {
+        'script': '05_demand_forecasting_prophet.py',
+        'inputs': [TOP50_TS_PATH],
+        'outputs': ['prophet_mae_results_top50.csv'],
+        'pool': True,
+    },
+    '06': {
+        'script': '06_future_demand_forecast.py',
+        'inputs': [TOP50_TS_PATH, PRODUCT_MATRIX_PATH],  # the matrix when TOP_N is set
+        'outputs': [FORECASTS_CSV, BACKTEST_CSV],
+        'pool': True,
+    },
+    '06a': {
+        'script': '06a_hierarchical_forecast.py',
+        'inputs': [PRODUCT_MATRIX_PATH, os.path.join(RAW_DIR, 'product.csv')],
+        'outputs': [os.path.join('results', 'hierarchical', 'hierarchical_backtest_mae.csv'),
+                    os.path.join('results', 'hierarchical', 'hierarchical_forecasts.parquet')],
+    },
+    '06b': {
+        'script': '06b_global_forecast.py',
+        'inputs': [PRODUCT_MATRIX_PATH],
+        'outputs': [GLOBAL_FORECASTS_CSV],
+    },
+    '06c': {
+        'script': '06c_baseline_forecast.py',
+        'inputs': [PRODUCT_MATRIX_PATH],
+        'outputs': [BASELINE_FORECASTS_CSV],
+    },
+    '06d': {
+        'script': '06d_rolling_backtest.py',
+        'inputs': [TOP50_TS_PATH],
+        'outputs': [ROLLING_BACKTEST_METRICS_CSV, ROLLING_BACKTEST_FORECASTS_PATH],
+        'pool': True,
+    },
+    '07': {
+        'script': '07_generate_reports.py',
+        # GLOBAL_FORECASTS_CSV is read when 07's FORECAST_SOURCE is 'global'
+        'inputs': [FORECASTS_CSV, GLOBAL_FORECASTS_CSV, BACKTEST_CSV, os.path.join(RAW_DIR, 'product.csv')],
+        'outputs': ['future_demand_summary_report.md', 'future_demand_detailed_report.md'],
+    },
+    '08': {
+        'script': '08_mba_cross_selling.py',
+        'inputs': [MASTER_DATASET_DIR],
+        'outputs': [CROSS_SELLING_RULES_CSV],
+    },
+    '09': {
+        'script': '09_generate_mba_report.py',
+        'inputs': [CROSS_SELLING_RULES_CSV],
+        'outputs': ['cross_selling_opportunities.md', 'cross_selling_summary_report.md'],
+    },
+    '10': {
+        'script': '10_nba_collaborative_filtering.py',
+        'inputs': [MASTER_DATASET_DIR],
+        'outputs': [NBA_RECOMMENDATIONS_CSV],
+    },
+    '11': {
+        'script': '11_nba_recommendation_report.py',
+        'inputs': [NBA_RECOMMENDATIONS_CSV],
+        'outputs': ['nba_recommendation_report.md'],
+    },
+    '12': {
+        'script': '12_nba_enhanced_reporting.py',
+        'inputs': [NBA_RECOMMENDATIONS_CSV, MASTER_DATASET_DIR],
+        'outputs': ['nba_enhanced_report_kr.md'],
+    },
+    '13': {
+        'script': '13_generate_nba_summary_kr.py',
+        'inputs': [NBA_RECOMMENDATIONS_CSV],
+        'outputs': ['nba_summary_report_kr.md'],
+    },
+    'compare': {
+        'script': 'compare_forecasting_models.py',
+        'inputs': [ROLLING_BACKTEST_METRICS_CSV, ROLLING_BACKTEST_FORECASTS_PATH],
+        'outputs': [os.path.join(TS_REPORT_DIR, 'plots', 'deep_dive', 'model_comparison_victory.png')],
+    },
+
+    # Integrated-dataset analysis track (dunnhumby_*.py)
+    'integration': {
+        'script': 'dunnhumby_data_integration.py',
+        'inputs': [os.path.join(ARCHIVE_DIR, f'{t}.csv') for t in _SOURCE_TABLES],
+        'outputs': [INTEGRATED_DATA_PATH, DATE_DIMENSION_PATH, INTEGRATED_CUBE_DIR],
+    },
+    'rfm1': {
+        'script': 'dunnhumby_rfm_analysis_step1.py',
+        'inputs': [INTEGRATED_DATA_PATH, DATE_DIMENSION_PATH],
+        'outputs': [RFM_SEGMENTS_CSV],
+    },
+    'rfm2': {
+        'script': 'dunnhumby_rfm_analysis_step2.py',
+        'inputs': [RFM_SEGMENTS_CSV],
+        'outputs': [os.path.join(ANALYSIS_PLOTS_DIR, 'dunnhumby_segment_distribution.png')],
+    },
+    'kpi1': {
+        'script': 'dunnhumby_kpi_analysis_step1.py',
+        'inputs': [INTEGRATED_DATA_PATH, DATE_DIMENSION_PATH],
+        'outputs': [os.path.join(ANALYSIS_PLOTS_DIR, 'dunnhumby_monthly_active_users.png')],
+    },
+    'kpi2': {
+        'script': 'dunnhumby_kpi_analysis_step2.py',
+        'inputs': [INTEGRATED_DATA_PATH, DATE_DIMENSION_PATH],
+        'outputs': [os.path.join(ANALYSIS_PLOTS_DIR, 'dunnhumby_cohort_retention_heatmap.png')],
+    },
+    'kpi3': {
+        'script': 'dunnhumby_kpi_analysis_step3.py',
+        'inputs': [INTEGRATED_DATA_PATH, DATE_DIMENSION_PATH],
+        'outputs': [os.path.join(ANALYSIS_PLOTS_DIR, 'dunnhumby_monthly_arppu.png')],
+    },
+    'promotion': {
+        'script': 'dunnhumby_promotion_analysis.py',
+        'inputs': [INTEGRATED_DATA_PATH],
+        'outputs': [os.path.join(ANALYSIS_PLOTS_DIR, 'dunnhumby_discount_effect_comparison.png')],
+    },
+    'demographic': {
+        'script': 'dunnhumby_demographic_analysis.py',
+        'inputs': [INTEGRATED_DATA_PATH, RFM_SEGMENTS_CSV],
+        'outputs': [os.path.join(ANALYSIS_PLOTS_DIR, 'dunnhumby_segment_distribution_by_age.png')],
+    },
+    'persona': {
+        'script': 'dunnhumby_teammate_persona_analysis.py',
+        'inputs': [INTEGRATED_DATA_PATH, DATE_DIMENSION_PATH],
+        'outputs': ['dunnhumby_persona_segments.csv'],
+    },
+    'refined_mba': {
+        'script': 'dunnhumby_refined_mba_analysis.py',
+        'inputs': [INTEGRATED_DATA_PATH, DATE_DIMENSION_PATH, RFM_SEGMENTS_CSV],
+        'outputs': [os.path.join('final_reports', 'mba', 'dunnhumby_high_stability_mba_rules.csv')],
+    },
+    'refined_nba': {
+        'script': 'dunnhumby_refined_nba_analysis.py',
+        'inputs': [INTEGRATED_DATA_PATH, os.path.join(ARCHIVE_DIR, 'hh_demographic.csv')],
+        'outputs': [os.path.join('final_reports', 'nba', 'dunnhumby_explainable_nba_results.csv')],
+    },
+    'time_series': {
+        'script': 'dunnhumby_time_series_analysis.py',
+        'inputs': [INTEGRATED_CUBE_DIR, DATE_DIMENSION_PATH],
+        'outputs': [os.path.join(ANALYSIS_PLOTS_DIR, 'dunnhumby_prophet_forecast.png')],
+    },
+    'detailed_ts': {
+        'script': 'dunnhumby_detailed_ts_analysis.py',
+        'inputs': [INTEGRATED_CUBE_DIR, DATE_DIMENSION_PATH],
+        'outputs': [TS_FORECASTS_CSV, TS_BACKTEST_CSV],
+    },
+    'detailed_report': {
+        'script': 'dunnhumby_generate_detailed_report.py',
+        'inputs': [INTEGRATED_DATA_PATH, TS_FORECASTS_CSV, TS_BACKTEST_CSV],
+        'outputs': [os.path.join(TS_REPORT_DIR, 'dunnhumby_future_demand_summary_report.md'),
+                    os.path.join(TS_REPORT_DIR, 'dunnhumby_future_demand_detailed_report.md')],
+    },
+}
+
+# Runner state and per-step logs
+RUN_STATE_PATH = os.path.join(CACHE_DIR, '_run_state.json')
+LOG_DIR = os.path.join(CACHE_DIR, 'logs')
+
+
+def step_cache(step, params=None):
+    """StepCache for a registered step, fingerprinting its declared inputs and its script.
+
+    Also starts the step's profile (dunnhumby_profiling), so every step records
+    at least its total wall/CPU time and peak RSS.
+    """
+    spec = STEPS[step]
+    profile_step(step)
+    return StepCache(step, spec['inputs'], spec['outputs'], params=params, script=spec['script'])
+
+
+def _produces(output, path):
+    # An output directory produces every path below it, and vice versa
+    output, path = os.path.normpath(output), os.path.normpath(path)
+    return output == path or path.startswith(output + os.sep) or output.startswith(path + os.sep)
+
+
+def dependency_graph(steps=STEPS):
+    """Maps each step to the set of steps that write one of its inputs."""
+    graph = {}
+    for name, spec in steps.items():
+        graph[name] = {other for other, other_spec in steps.items() if other != name
+                       and any(_produces(out, inp) for out in other_spec['outputs'] for inp in spec['inputs'])}
+    return graph
+
+
+def topological_order(graph):
+    """Steps in dependency order (ties keep registry order); raises ValueError on a cycle."""
+    order, remaining = [], dict(graph)
+    while remaining:
+        ready = [s for s, deps in remaining.items() if not deps & set(remaining)]
+        if not ready:
+            raise ValueError(f"Dependency cycle between steps: {sorted(remaining)}")
+        order.extend(ready)
+        for s in ready:
+            del remaining[s]
+    return order
+
+
+def with_upstream(targets, graph):
+    """The target steps plus every step they transitively depend on."""
+    selected, stack = set(), list(targets)
+    while stack:
+        step = stack.pop()
+        if step not in selected:
+            selected.add(step)
+            stack.extend(graph[step])
+    return selected
+
+
+def read_run_state(path=RUN_STATE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_run_state(state, path=RUN_STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def run_step(step, log_dir=LOG_DIR, run_id=None, pool_workers=None):
+    """Runs one step script in its own Python process; returns its state record.
+
+    The scripts report most errors by printing and calling exit(), so a step
+    counts as failed when it exits non-zero or leaves a declared output missing.
+    pool_workers caps the step's dunnhumby_parallel pool size.
+    """
+    spec = STEPS[step]
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, f'{step}.log')
+    env = dict(os.environ, PYTHONIOENCODING='utf-8', MPLBACKEND='Agg')
+    if run_id:
+        env[RUN_ID_ENV_VAR] = run_id  # all steps of a run profile into one directory
+    if pool_workers:
+        env[WORKERS_ENV_VAR] = str(pool_workers)
+    start = time.perf_counter()
+    with open(log_path, 'w', encoding='utf-8') as log:
+        proc = subprocess.run([sys.executable, spec['script']], stdout=log, stderr=subprocess.STDOUT, env=env)
+    missing = [path for path in spec['outputs'] if not os.path.exists(path)]
+    ok = proc.returncode == 0 and not missing
+    return {
+        'status': 'done' if ok else 'failed',
+        'returncode': proc.returncode,
+        'missing_outputs': missing,
+        'seconds': round(time.perf_counter() - start, 2),
+        'log': log_path,
+    }
+
+
+def run_pipeline(targets=None, workers=None, resume=False, on_event=print, run_id=None):
+    """Runs the pipeline DAG, executing independent steps in parallel processes.
+
+    targets limits the run to those steps and their upstream steps (default:
+    every registered step). With resume=True the steps that completed in the
+    previous run are not re-run, so the run picks up at the step that failed.
+    A failed step blocks only its downstream steps; other branches keep going.
+    Steps marked 'pool' run one at a time, each with a worker pool of the CPUs
+    not taken by the other steps running when it starts (at least one).
+    Step profiles are written to profiles/<run_id>/ (see dunnhumby_profiling).
+    Returns the run state: {step: {'status': 'done' | 'failed' | 'blocked', ...}}.
+    """
+    graph = dependency_graph()
+    selected = with_upstream(targets, graph) if targets else set(STEPS)
+    order = [s for s in topological_order(graph) if s in selected]
+    previous = read_run_state()
+    state = {s: previous[s] for s in order if resume and previous.get(s, {}).get('status') == 'done'}
+    for step in state:
+        on_event(f"[resume] {step}: completed in the previous run, skipped")
+    pending = [s for s in order if s not in state]
+    workers = workers or os.cpu_count() or 1
+    cpus = os.cpu_count() or 1
+    run_id = run_id or new_run_id()
+
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            for step in list(pending):
+                deps = graph[step] & selected
+                if any(state.get(d, {}).get('status') in ('failed', 'blocked') for d in deps):
+                    state[step] = {'status': 'blocked'}
+                    pending.remove(step)
+                    on_event(f"[blocked] {step}: an upstream step failed")
+                elif all(state.get(d, {}).get('status') == 'done' for d in deps) and len(running) < workers:
+                    pool_step = STEPS[step].get('pool', False)
+                    if pool_step and any(STEPS[s].get('pool') for s in running.values()):
+                        continue  # wait for the running pool step
+                    pool_workers = max(1, cpus - len(running)) if pool_step else None
+                    running[pool.submit(run_step, step, LOG_DIR, run_id, pool_workers)] = step
+                    pending.remove(step)
+                    on_event(f"[start] {step}: {STEPS[step]['script']}"
+                             + (f" ({pool_workers} pool workers)" if pool_workers else ''))
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step = running.pop(future)
+                state[step] = future.result()
+                on_event(f"[{state[step]['status']}] {step} ({state[step]['seconds']:.1f}s, log: {state[step]['log']})")
+            _write_run_state({**previous, **state})
+
+    _write_run_state({**previous, **state})
+    return state
@@ -0,0 +1,215 @@
+import atexit
+import csv
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Lightweight per-step instrumentation. A step script calls profile_step() once
+# and wraps its hot paths (load, groupby, pivot, apriori, auto_arima, Prophet
+# fit, plotting, save) in span() blocks. Each span records wall time, CPU time,
+# the process peak RSS and an optional row count; nested spans form a stack.
+# At exit the spans are written to
+#   profiles/<run_id>/<step>.json  and  <step>.csv
+# and summarize() folds all steps of a run into a flame-style summary
+# (profiles/<run_id>/folded.txt, one "step;span;child <microseconds>" line per
+# stack, readable by flamegraph.pl / speedscope).
+PROFILE_DIR = 'profiles'
+
+# The pipeline runner sets DUNNHUMBY_RUN_ID so all steps of one run share a
+# directory; DUNNHUMBY_PROFILE=0 turns recording off.
+RUN_ID_ENV_VAR = 'DUNNHUMBY_RUN_ID'
+ENABLE_ENV_VAR = 'DUNNHUMBY_PROFILE'
+
+TRACE_FIELDS = ['step', 'path', 'name', 'depth', 'start', 'wall_s', 'cpu_s',
+                'peak_rss_mb', 'rss_growth_mb', 'rows']
+
+
+def peak_rss_mb():
+    """High-water mark of the process resident set size in MB (None if unavailable)."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        return peak / 1024**2 if sys.platform == 'darwin' else peak / 1024
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / 1024**2
+    return None
+
+
+def new_run_id():
+    return time.strftime('%Y%m%d-%H%M%S')
+
+
+class Span:
+    __slots__ = ('name', 'path', 'depth', 'rows', '_t0', '_c0', '_m0', 'record')
+
+    def __init__(self, name, path, depth, rows):
+        self.name = name
+        self.path = path
+        self.depth = depth
+        self.rows = rows
+        self.record = None
+
+
+class StepProfiler:
+    """Collects the spans of one step and writes them out at interpreter exit."""
+
+    def __init__(self, step, run_id=None, profile_dir=PROFILE_DIR, enabled=True):
+        self.step = step
+        self.run_id = run_id or os.environ.get(RUN_ID_ENV_VAR) or new_run_id()
+        self.out_dir = os.path.join(profile_dir, self.run_id)
+        self.enabled = enabled
+        self.records = []
+        self._stack = []
+        self._origin = time.perf_counter()
+        self._root = None
+        if enabled:
+            self._root = self._open(step, None)
+            atexit.register(self.write)
+
+    def _open(self, name, rows):
+        parent = self._stack[-1].path if self._stack else None
+        sp = Span(name, f'{parent};{name}' if parent else name, len(self._stack), rows)
+        sp._t0, sp._c0, sp._m0 = time.perf_counter(), time.process_time(), peak_rss_mb()
+        self._stack.append(sp)
+        return sp
+
+    def _close(self, sp):
+        wall = time.perf_counter() - sp._t0
+        cpu = time.process_time() - sp._c0
+        peak = peak_rss_mb()
+        self._stack.remove(sp)
+        sp.record = {
+            'step': self.step,
+            'path': sp.path,
+            'name': sp.name,
+            'depth': sp.depth,
+            'start': round(sp._t0 - self._origin, 6),
+            'wall_s': round(wall, 6),
+            'cpu_s': round(cpu, 6),
+            'peak_rss_mb': None if peak is None else round(peak, 1),
+            'rss_growth_mb': None if peak is None or sp._m0 is None else round(peak - sp._m0, 1),
+            'rows': sp.rows,
+        }
+        self.records.append(sp.record)
+
+    @contextmanager
+    def span(self, name, rows=None):
+        if not self.enabled:
+            yield Span(name, name, 0, rows)
+            return
+        sp = self._open(name, rows)
+        try:
+            yield sp
+        finally:
+            self._close(sp)
+
+    def write(self):
+        """Closes any open spans (including the step root) and writes the trace."""
+        if not self.enabled:
+            return
+        while self._stack:
+            self._close(self._stack[-1])
+        os.makedirs(self.out_dir, exist_ok=True)
+        records = sorted(self.records, key=lambda r: r['start'])
+        base = os.path.join(self.out_dir, self.step)
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump({'step': self.step, 'run_id': self.run_id, 'spans': records}, f, indent=1)
+        with open(base + '.csv', 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=TRACE_FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+        self.enabled = False
+
+
+_profiler = None
+
+
+def profile_step(step, run_id=None):
+    """Starts profiling the current process as pipeline step `step`."""
+    global _profiler
+    enabled = os.environ.get(ENABLE_ENV_VAR, '1') != '0'
+    _profiler = StepProfiler(step, run_id=run_id, enabled=enabled)
+    return _profiler
+
+
+@contextmanager
+def span(name, rows=None):
+    """Times a block as a child of the innermost open span.
+
+    Set the yielded span's .rows inside the block when the row count is only
+    known afterwards. Outside a profiled step this is a no-op.
+    """
+    if _profiler is None:
+        yield Span(name, name, 0, rows)
+        return
+    with _profiler.span(name, rows) as sp:
+        yield sp
+
+
+def load_run(run_dir):
+    """All span records of a run directory."""
+    records = []
+    for name in sorted(os.listdir(run_dir)):
+        if name.endswith('.json'):
+            with open(os.path.join(run_dir, name), encoding='utf-8') as f:
+                records.extend(json.load(f)['spans'])
+    return records
+
+
+def summarize(run_dir, top=25, out=print):
+    """Aggregates a run into a flame-style summary and writes folded.txt.
+
+    Spans with the same stack path (e.g. every auto_arima call of the 04a
+    loop) are merged; self time is a span's wall time minus its children's.
+    Returns the aggregated rows sorted by self time.
+    """
+    total = defaultdict(lambda: {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'rows': 0, 'peak_rss_mb': 0.0})
+    children = defaultdict(float)
+    for r in load_run(run_dir):
+        agg = total[r['path']]
+        agg['calls'] += 1
+        agg['wall_s'] += r['wall_s']
+        agg['cpu_s'] += r['cpu_s']
+        agg['rows'] += r['rows'] or 0
+        agg['peak_rss_mb'] = max(agg['peak_rss_mb'], r['peak_rss_mb'] or 0.0)
+        if ';' in r['path']:
+            children[r['path'].rsplit(';', 1)[0]] += r['wall_s']
+
+    rows = []
+    for path, agg in total.items():
+        rows.append({'path': path, **agg, 'self_s': max(agg['wall_s'] - children[path], 0.0)})
+    rows.sort(key=lambda r: r['self_s'], reverse=True)
+
+    with open(os.path.join(run_dir, 'folded.txt'), 'w', encoding='utf-8') as f:
+        for r in sorted(rows, key=lambda r: r['path']):
+            f.write(f"{r['path']} {int(r['self_s'] * 1e6)}\n")
+
+    out(f"\n--- Profile summary: {run_dir} (top {min(top, len(rows))} by self time) ---")
+    out(f"{'self s':>9} {'total s':>9} {'cpu s':>9} {'calls':>6} {'rows':>12} {'peak MB':>8}  stack")
+    for r in rows[:top]:
+        out(f"{r['self_s']:>9.2f} {r['wall_s']:>9.2f} {r['cpu_s']:>9.2f} {r['calls']:>6} "
+            f"{r['rows']:>12,} {r['peak_rss_mb']:>8.0f}  {r['path']}")
+    return rows
+
+
+if __name__ == '__main__':
+    # Usage: python dunnhumby_profiling.py [run_dir]   (default: latest run)
+    if len(sys.argv) > 1:
+        run_dir = sys.argv[1]
+    else:
+        runs = sorted(d for d in os.listdir(PROFILE_DIR) if os.path.isdir(os.path.join(PROFILE_DIR, d)))
+        run_dir = os.path.join(PROFILE_DIR, runs[-1])
+    summarize(run_dir)
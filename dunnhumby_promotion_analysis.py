@@ -1,19 +1,20 @@
 
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
 
+from dunnhumby_storage import INTEGRATED_DATA_PATH, load_integrated
+
 # Define integrated data path and plots directory
-integrated_data_path = 'dunnhumby_integrated_data.csv'
+integrated_data_path = INTEGRATED_DATA_PATH
 plots_dir = 'dunnhumby_plots'
 
 # --- Phase 2: Analysis Execution - Promotion Effect Analysis ---
 print("--- Dunnhumby 프로모션 효과 분석 ---")
 
 try:
-    df = pd.read_csv(integrated_data_path)
+    df = load_integrated(columns=['Discount', 'TotalAmount', 'Quantity'])
     
     # Define 'Has_Discount' based on the 'Discount' column (absolute sum of all discounts)
     df['Has_Discount'] = df['Discount'] > 0
@@ -0,0 +1,116 @@
+import logging
+import time
+
+import pandas as pd
+from prophet import Prophet
+
+from dunnhumby_profiling import span
+from dunnhumby_registry import prophet_state
+
+# Batched Prophet engine for 05 / 06. Products are fitted by prophet_task in
+# dunnhumby_parallel workers (a batch = the chunk of products a worker takes at
+# a time), with two savings over a fresh model per fit:
+#   - the compiled Stan model is loaded once per worker process and shared by
+#     every Prophet instance it creates (SharedBackendProphet), instead of being
+#     reloaded for each instance;
+#   - the full-data fit starts from the backtest fit's parameters (warm start),
+#     so L-BFGS begins near the optimum and needs far fewer iterations.
+PROPHET_PARAMS = {'yearly_seasonality': True, 'weekly_seasonality': False, 'daily_seasonality': False}
+FORECAST_COLUMNS = ['ds', 'yhat', 'yhat_lower', 'yhat_upper']
+
+logging.getLogger('prophet').setLevel(logging.WARNING)
+logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+
+
+class SharedBackendProphet(Prophet):
+    """Prophet whose Stan backend is created once per process and then reused."""
+
+    _shared_backends = {}
+
+    def _load_stan_backend(self, stan_backend):
+        key = stan_backend or 'default'
+        if key not in self._shared_backends:
+            super()._load_stan_backend(stan_backend)
+            self._shared_backends[key] = self.stan_backend
+        self.stan_backend = self._shared_backends[key]
+
+
+def new_prophet(**params):
+    return SharedBackendProphet(**{**PROPHET_PARAMS, **params})
+
+
+def warm_start_params(model):
+    """Fitted parameters of a model in the form Prophet.fit(init=...) accepts."""
+    res = {}
+    for pname in ['k', 'm', 'sigma_obs']:
+        res[pname] = model.params[pname][0][0]
+    for pname in ['delta', 'beta']:
+        res[pname] = model.params[pname][0]
+    return res
+
+
+def fit_forecast(df, horizon, init=None):
+    """Fits a model on df (ds, y) and predicts the history plus `horizon` weeks.
+
+    With init the fit is warm-started; if the warm start does not fit the new
+    model (e.g. a different number of changepoints) it is refitted cold.
+    Returns (model, forecast, warm_started).
+    """
+    model = new_prophet()
+    warm = init is not None
+    try:
+        model.fit(df, init=init) if warm else model.fit(df)
+    except Exception:
+        if not warm:
+            raise
+        model, warm = new_prophet(), False
+        model.fit(df)
+    future = model.make_future_dataframe(periods=horizon, freq='W')
+    forecast = model.predict(future)[FORECAST_COLUMNS]
+    return model, forecast, warm
+
+
+def prophet_task(payload):
+    """Backtest and/or full-data Prophet fit of one product.
+
+    payload: product_id, ds, y (equal-length sequences), backtest_split (rows
+    used to fit the backtest model, None: no backtest), backtest_horizon,
+    forecast_horizon (None: no full-data fit), warm_start, save_model (the
+    last model fitted is returned as model_state for the model registry).
+
+    A failure of one stage is returned as its error rather than raised, so the
+    other stage's result is kept.
+    """
+    df = pd.DataFrame({'ds': pd.to_datetime(payload['ds']), 'y': payload['y']})
+    result = {'backtest': None, 'backtest_error': None, 'forecast': None, 'forecast_error': None,
+              'warm_started': False, 'fit_seconds': {}}
+    model = None
+    init = None
+
+    if payload.get('backtest_split') is not None:
+        try:
+            start = time.perf_counter()
+            with span('backtest_prophet_fit', rows=payload['backtest_split']):
+                model, result['backtest'], _ = fit_forecast(df.iloc[:payload['backtest_split']],
+                                                         payload['backtest_horizon'])
+            result['fit_seconds']['backtest'] = time.perf_counter() - start
+            if payload.get('warm_start', True):
+                init = warm_start_params(model)
+        except Exception as e:
+            result['backtest_error'] = f"{type(e).__name__}: {e}"
+
+    if payload.get('forecast_horizon') is not None:
+        try:
+            start = time.perf_counter()
+            with span('prophet_fit', rows=len(df)):
+                model, result['forecast'], result['warm_started'] = fit_forecast(
+                    df, payload['forecast_horizon'], init=init)
+            result['fit_seconds']['forecast'] = time.perf_counter() - start
+        except Exception as e:
+            result['forecast_error'] = f"{type(e).__name__}: {e}"
+            model = None
+
+    if model is not None and payload.get('save_model'):
+        with span('save'):
+            result['model_state'] = prophet_state(model)
+    return result
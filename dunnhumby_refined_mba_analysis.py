@@ -6,8 +6,11 @@ from mlxtend.preprocessing import TransactionEncoder
 import os
 import random
 
+from dunnhumby_dates import load_date_dimension, lookup
+from dunnhumby_storage import INTEGRATED_DATA_PATH, load_integrated
+
 # 설정
-integrated_data_path = 'dunnhumby_integrated_data.csv'
+integrated_data_path = INTEGRATED_DATA_PATH
 rfm_segments_path = 'dunnhumby_rfm_segments.csv'
 base_output_dir = 'final_reports/mba'
 if not os.path.exists(base_output_dir):
@@ -17,8 +20,7 @@ print("--- Dunnhumby 고도화된 MBA 분석 (장바구니 및 교차 구매 분
 
 try:
     # 1. 데이터 로드
-    df = pd.read_csv(integrated_data_path)
-    df['OrderDate'] = pd.to_datetime(df['OrderDate'])
+    df = load_integrated(columns=['CustomerID', 'DAY', 'BASKET_ID', 'ProductName'])
     
     # RFM 세그먼트 정보 로드 (있는 경우)
     has_segments = os.path.exists(rfm_segments_path)
@@ -105,7 +107,7 @@ try:
 
     # --- 4. 시간적 분석 (Temporal Analysis) --- (제안서 2.3 반영)
     print("\n[시간적 분석] 분기별(Quarterly) 구매 패턴 변화를 추적합니다...")
-    df_mba['Quarter'] = df_mba['OrderDate'].dt.to_period('Q')
+    df_mba['Quarter'] = lookup(load_date_dimension(), df_mba['DAY'], 'quarter')
     quarters = sorted(df_mba['Quarter'].unique())
     temporal_results = {}
     for q in quarters:
@@ -6,12 +6,14 @@ import os
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
 
+from dunnhumby_storage import INTEGRATED_DATA_PATH, load_integrated
+
 # 한글 깨짐 해결을 위한 폰트 설정 (Windows 기준 Malgun Gothic)
 plt.rcParams['font.family'] = 'Malgun Gothic'
 plt.rcParams['axes.unicode_minus'] = False
 
 # 설정
-integrated_data_path = 'dunnhumby_integrated_data.csv'
+integrated_data_path = INTEGRATED_DATA_PATH
 demographic_path = 'Dunnhumby/archive/hh_demographic.csv' # 원천 데이터 연계
 base_output_dir = 'final_reports/nba'
 if not os.path.exists(base_output_dir):
@@ -22,7 +24,7 @@ print("--- Dunnhumby 고도화된 NBA 추천 엔진 (Hybrid & Explainable) 시
 try:
     # 1. 데이터 로드 및 통합 (제안서 4.2 데이터 원천 명시 반영)
     cols = ['CustomerID', 'ProductID', 'ProductName', 'Category', 'TotalAmount']
-    df = pd.read_csv(integrated_data_path, usecols=cols)
+    df = load_integrated(columns=cols)
     demo_df = pd.read_csv(demographic_path)
     
     # 상위 500개 상품 위주 분석
@@ -40,7 +42,7 @@ try:
     
     # Content-Based (Product Name & Category)
     print("[CBF] 컨텐츠 유사도 계산 중...")
-    item_info['features'] = item_info['ProductName'] + " " + item_info['Category'].fillna('')
+    item_info['features'] = item_info['ProductName'].astype(str) + " " + item_info['Category'].astype(object).fillna('')
     tfidf = TfidfVectorizer(stop_words='english')
     tfidf_matrix = tfidf.fit_transform(item_info['features'])
     content_similarity = cosine_similarity(tfidf_matrix)
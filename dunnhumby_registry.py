@@ -0,0 +1,169 @@
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# Model registry: the fitted parameters of every per-product model in one
+# SQLite file, instead of one pickled model object per product and run.
+#   models(name, product_id, version, kind, created, metadata, state)
+# name is the model set (e.g. 'prophet_forecast' for 06), kind the model family
+# ('prophet' / 'sarima'); the primary key (name, product_id, version) makes
+# loading one product's model a single index lookup. state is the compact
+# serialization of the fit, zlib-compressed JSON:
+#   prophet   Prophet's own model_to_json
+#   sarima    the SARIMAX specification, its fitted coefficients and the series
+#             it was fitted on (the state space filter needs it to forecast)
+# metadata is free-form JSON (training weeks, MAE, order, ...). Each put adds a
+# version; only the newest KEEP_VERSIONS per product are kept.
+#
+# forecast() predicts from a stored state without refitting: load_model
+# deserializes Prophet / runs the SARIMA Kalman filter with the stored
+# coefficients once, predict() then only extrapolates (dunnhumby_serving keeps
+# loaded models in memory between requests).
+REGISTRY_PATH = os.path.join('models', 'model_registry.sqlite')
+KEEP_VERSIONS = 3
+INTERVAL_ALPHA = 0.05
+
+# SARIMAX constructor arguments that are data, not specification
+_DATA_KWDS = {'endog', 'exog', 'dates', 'freq', 'missing'}
+
+
+def prophet_state(model):
+    from prophet.serialize import model_to_json
+    return json.loads(model_to_json(model))
+
+
+def sarima_state(model):
+    """Serializable state of a fitted pmdarima ARIMA (or a statsmodels SARIMAX results object)."""
+    res = getattr(model, 'arima_res_', model)
+    init = {k: v for k, v in res.model._get_init_kwds().items()
+            if k not in _DATA_KWDS and (v is None or isinstance(v, (bool, int, float, str, tuple, list)))}
+    return {
+        'init': init,
+        'params': np.asarray(res.params, dtype='float64').tolist(),
+        'endog': np.asarray(res.model.endog, dtype='float64').ravel().tolist(),
+    }
+
+
+def _encode(state):
+    return zlib.compress(json.dumps(state).encode('utf-8'))
+
+
+def _decode(blob):
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+class ModelRegistry:
+    """Versioned store of fitted model states, keyed by (name, product id)."""
+
+    def __init__(self, path=REGISTRY_PATH, keep_versions=KEEP_VERSIONS):
+        self.path = path
+        self.keep_versions = keep_versions
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Steps running side by side share the file; SQLite serializes the writers
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS models (
+            name TEXT NOT NULL,
+            product_id TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            created REAL NOT NULL,
+            metadata TEXT NOT NULL,
+            state BLOB NOT NULL,
+            PRIMARY KEY (name, product_id, version))""")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def put(self, name, product_id, kind, state, metadata=None):
+        """Stores a new version of a product's model and returns its version number."""
+        product_id = str(product_id)
+        with self.conn:
+            (latest,) = self.conn.execute(
+                "SELECT COALESCE(MAX(version), 0) FROM models WHERE name = ? AND product_id = ?",
+                (name, product_id)).fetchone()
+            version = latest + 1
+            self.conn.execute("INSERT INTO models VALUES (?, ?, ?, ?, ?, ?, ?)",
+                              (name, product_id, version, kind, time.time(),
+                               json.dumps(metadata or {}, default=str), _encode(state)))
+            self.conn.execute("DELETE FROM models WHERE name = ? AND product_id = ? AND version <= ?",
+                              (name, product_id, version - self.keep_versions))
+        return version
+
+    def get(self, name, product_id, version=None):
+        """{name, product_id, version, kind, created, metadata, state} of one model (latest version by default), or None."""
+        query = "SELECT name, product_id, version, kind, created, metadata, state FROM models " \
+                "WHERE name = ? AND product_id = ?"
+        args = [name, str(product_id)]
+        if version is None:
+            query += " ORDER BY version DESC LIMIT 1"
+        else:
+            query += " AND version = ?"
+            args.append(version)
+        row = self.conn.execute(query, args).fetchone()
+        if row is None:
+            return None
+        return {'name': row[0], 'product_id': row[1], 'version': row[2], 'kind': row[3], 'created': row[4],
+                'metadata': json.loads(row[5]), 'state': _decode(row[6])}
+
+    def latest_version(self, name, product_id):
+        """Newest stored version of a product's model, or None."""
+        (version,) = self.conn.execute("SELECT MAX(version) FROM models WHERE name = ? AND product_id = ?",
+                                       (name, str(product_id))).fetchone()
+        return version
+
+    def revision(self, name):
+        """(models, newest creation time) of a model set; changes whenever a model is stored."""
+        return self.conn.execute("SELECT COUNT(*), COALESCE(MAX(created), 0) FROM models WHERE name = ?",
+                                 (name,)).fetchone()
+
+    def entries(self, name=None):
+        """Index of the stored models (without their states) as a DataFrame."""
+        query = "SELECT name, product_id, version, kind, created, metadata, LENGTH(state) AS state_bytes FROM models"
+        args = []
+        if name is not None:
+            query += " WHERE name = ?"
+            args.append(name)
+        df = pd.read_sql_query(query + " ORDER BY name, product_id, version", self.conn, params=args)
+        df['created'] = pd.to_datetime(df['created'], unit='s')
+        return df
+
+
+def load_model(record):
+    """Predictor of a stored model: the Prophet model, or the SARIMAX results filtered with the stored coefficients."""
+    if record['kind'] == 'prophet':
+        from prophet.serialize import model_from_json
+        return model_from_json(json.dumps(record['state']))
+    if record['kind'] == 'sarima':
+        from statsmodels.tsa.statespace.sarimax import SARIMAX
+        state = record['state']
+        return SARIMAX(np.asarray(state['endog']), **state['init']).filter(np.asarray(state['params']))
+    raise ValueError(f"unknown model kind {record['kind']!r}")
+
+
+def predict(kind, model, horizon):
+    """Forecast DataFrame (yhat, yhat_lower, yhat_upper; plus ds for Prophet) of the `horizon`
+    periods after the training data of a load_model predictor."""
+    if kind == 'prophet':
+        future = model.make_future_dataframe(periods=horizon, freq='W', include_history=False)
+        return model.predict(future)[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].reset_index(drop=True)
+    predicted = model.get_forecast(horizon)
+    conf_int = np.asarray(predicted.conf_int(alpha=INTERVAL_ALPHA))
+    return pd.DataFrame({'yhat': np.asarray(predicted.predicted_mean),
+                         'yhat_lower': conf_int[:, 0], 'yhat_upper': conf_int[:, 1]})
+
+
+def forecast(record, horizon):
+    """predict() of a stored model, without refitting."""
+    return predict(record['kind'], load_model(record), horizon)
@@ -3,27 +3,32 @@ import pandas as pd
 import datetime as dt
 import os
 
+from dunnhumby_dates import load_date_dimension, lookup
+from dunnhumby_storage import INTEGRATED_DATA_PATH, load_integrated
+
 # Define integrated data path
-integrated_data_path = 'dunnhumby_integrated_data.csv'
+integrated_data_path = INTEGRATED_DATA_PATH
 
 # --- Phase 2: Analysis Execution - RFM Analysis ---
 print("--- Dunnhumby RFM 분석: R/F/M 값 계산 및 고객 세분화 ---")
 
 try:
-    df = pd.read_csv(integrated_data_path)
-    df['OrderDate'] = pd.to_datetime(df['OrderDate'])
+    df = load_integrated(columns=['CustomerID', 'DAY', 'BASKET_ID', 'TotalAmount'])
     
     # Set a snapshot date for Recency calculation (one day after the last transaction)
-    snapshot_date = df['OrderDate'].max() + dt.timedelta(days=1)
+    last_day = df['DAY'].max()
+    snapshot_date = pd.Timestamp(lookup(load_date_dimension(), [last_day], 'date')[0]) + dt.timedelta(days=1)
     print(f"\n분석 기준일(Snapshot Date): {snapshot_date.strftime('%Y-%m-%d')}")
 
     # Calculate R, F, M values
     # Frequency: Use BASKET_ID for distinct transactions per customer
+    # Recency is computed on the integer DAY key (snapshot DAY - last purchase DAY)
     rfm_df = df.groupby('CustomerID').agg(
-        Recency=('OrderDate', lambda x: (snapshot_date - x.max()).days),
+        LastDay=('DAY', 'max'),
         Frequency=('BASKET_ID', 'nunique'), # Count distinct baskets for frequency
         Monetary=('TotalAmount', 'sum')
     )
+    rfm_df.insert(0, 'Recency', (last_day + 1 - rfm_df.pop('LastDay')).astype(int))
     
     print("\n고객별 R, F, M 값을 계산했습니다.")
 
@@ -0,0 +1,272 @@
+import json
+import os
+import sqlite3
+from collections import Counter
+
+import numpy as np
+import pmdarima as pm
+from scipy.stats import chi2
+from sklearn.metrics import mean_absolute_error
+
+from dunnhumby_cache import CACHE_DIR
+from dunnhumby_ingest import load_raw_table, raw_table_exists
+from dunnhumby_profiling import span
+from dunnhumby_registry import sarima_state
+from dunnhumby_schema import read_csv_typed
+
+# Per-product SARIMA fit used by 04a, serially or in dunnhumby_parallel workers.
+# A task is one picklable payload dict and returns only small results (order,
+# MAE, the forecast and its interval); with save_model the fitted coefficients
+# come back as a compact model registry state, not as a pickled model.
+AUTO_ARIMA_PARAMS = {
+    'start_p': 1, 'start_q': 1,
+    'test': 'adf',
+    'max_p': 3, 'max_q': 3,
+    'm': 52,             # Yearly seasonality
+    'd': None,
+    'seasonal': True,
+    'start_P': 0,
+    'D': 1,
+    'trace': False,      # Set to False to reduce log spam
+    'error_action': 'ignore',
+    'suppress_warnings': True,
+    'stepwise': True,
+}
+
+# Order-selection cache. A refresh seeds auto_arima with the order selected for
+# the same product last time (or, for a new product, the most common order in
+# its commodity cluster) and searches only +/-1 around it with d and D fixed,
+# which also skips the unit-root tests. The full stepwise search is run only
+# when the seeded model's residual diagnostics are worse: Ljung-Box rejects
+# white noise where the cached model did not, or the residual scale grows by
+# more than RESID_TOLERANCE. Workers get the seed in their payload and return
+# the selected order; the parent updates and saves the cache. Steps run side by
+# side (04a, 06, detailed_ts), so the cache is a SQLite table and save() writes
+# only the entries this run updated.
+ORDER_CACHE_PATH = os.path.join(CACHE_DIR, 'arima_orders.sqlite')
+CLUSTER_LEVEL = 'COMMODITY_DESC'
+LJUNG_BOX_ALPHA = 0.05
+LJUNG_BOX_LAGS = 10
+RESID_TOLERANCE = 0.10
+
+
+def product_clusters(level=CLUSTER_LEVEL):
+    """{product id: cluster label} from product.csv (empty if the table is not available)."""
+    if raw_table_exists('product'):
+        products = load_raw_table('product', columns=['PRODUCT_ID', level])
+    elif os.path.exists(os.path.join('dunnhumby.db', 'product.csv')):
+        products = read_csv_typed(os.path.join('dunnhumby.db', 'product.csv'), 'product')
+    else:
+        return {}
+    products = products.drop_duplicates(subset=['PRODUCT_ID'])
+    return dict(zip(products['PRODUCT_ID'].tolist(), products[level].astype(str).tolist()))
+
+
+def ljung_box_pvalue(resid, lags=LJUNG_BOX_LAGS):
+    """Ljung-Box p-value of the residual autocorrelations up to `lags` (nan if too short)."""
+    resid = np.asarray(resid, dtype='float64')
+    n = len(resid)
+    lags = min(lags, n // 5)
+    if lags < 1 or not resid.std():
+        return float('nan')
+    resid = resid - resid.mean()
+    denom = resid @ resid
+    acf = np.array([resid[k:] @ resid[:-k] / denom for k in range(1, lags + 1)])
+    q = n * (n + 2) * np.sum(acf ** 2 / (n - np.arange(1, lags + 1)))
+    return float(chi2.sf(q, lags))
+
+
+def residual_diagnostics(model, y):
+    """Ljung-Box p-value and residual std / series std of a fitted model."""
+    order, seasonal_order = model.order, model.seasonal_order
+    # The first d + D*m residuals only absorb the differencing start-up
+    burn_in = order[1] + seasonal_order[1] * seasonal_order[3]
+    resid = np.asarray(model.resid(), dtype='float64')[burn_in:]
+    scale = float(np.std(y)) or 1.0
+    return {'ljung_box_p': ljung_box_pvalue(resid),
+            'resid_scale': float(np.std(resid)) / scale if len(resid) else float('nan')}
+
+
+def _worse(diagnostics, reference):
+    p, scale = diagnostics['ljung_box_p'], diagnostics['resid_scale']
+    ref_p = reference.get('ljung_box_p', float('nan')) if reference else float('nan')
+    if p < LJUNG_BOX_ALPHA and not ref_p < LJUNG_BOX_ALPHA:
+        return True
+    ref_scale = reference.get('resid_scale') if reference else None
+    return ref_scale is not None and scale > ref_scale * (1 + RESID_TOLERANCE)
+
+
+# pmdarima's auto_arima defaults for the order bounds a caller does not set
+_DEFAULT_MAX_ORDERS = {'max_p': 5, 'max_q': 5, 'max_P': 2, 'max_Q': 2}
+
+
+def seeded_params(params, seed):
+    """auto_arima parameters for a +/-1 search around a seed entry with d and D fixed,
+    within the caller's own order bounds."""
+    bounds = {**_DEFAULT_MAX_ORDERS, **{k: v for k, v in params.items() if k in _DEFAULT_MAX_ORDERS}}
+
+    def around(name, value):
+        upper = bounds[f'max_{name}']
+        return {f'start_{name}': min(value, upper), f'max_{name}': min(value + 1, upper)}
+
+    p, d, q = seed['order']
+    P, D, Q, m = seed['seasonal_order']
+    narrow = {**params, **around('p', p), **around('q', q), 'd': d}
+    if params.get('seasonal'):
+        narrow.update({**around('P', P), **around('Q', Q), 'D': D})
+    return narrow
+
+
+def search_arima(y, params, seed=None):
+    """auto_arima with an optional cached seed; returns (model, cache entry).
+
+    seed: an OrderCache entry (order, seasonal_order and, for the same product,
+    the reference diagnostics). The reference is the diagnostics of the last
+    full search, so repeated seeded refreshes cannot drift by RESID_TOLERANCE
+    each time. The entry's 'search' says whether the seeded search was kept
+    ('seeded') or the full search ran ('full').
+    """
+    if seed is not None:
+        model = pm.auto_arima(y, **seeded_params(params, seed))
+        diagnostics = residual_diagnostics(model, y)
+        reference = seed.get('reference')
+        if not _worse(diagnostics, reference):
+            return model, _entry(model, diagnostics, 'seeded', reference or diagnostics)
+    model = pm.auto_arima(y, **params)
+    diagnostics = residual_diagnostics(model, y)
+    return model, _entry(model, diagnostics, 'full', diagnostics)
+
+
+def _entry(model, diagnostics, search, reference):
+    return {'order': list(model.order), 'seasonal_order': list(model.seasonal_order),
+            'diagnostics': diagnostics, 'reference': reference, 'search': search}
+
+
+class OrderCache:
+    """Selected ARIMA orders per product, for one caller and auto_arima configuration.
+
+    Stored in the SQLite table orders(config, product_id, entry) at
+    ORDER_CACHE_PATH. config is the caller's name plus its full search
+    parameters, so callers searching different spaces or fitting different
+    series (04a's train split, 06's full series, ...) never seed or judge each
+    other's orders. An entry (JSON) holds order, seasonal_order, cluster and the
+    residual diagnostics of the selected model and of the reference
+    (last full-search) model.
+    """
+
+    def __init__(self, params, clusters=None, name='default', path=ORDER_CACHE_PATH):
+        self.path = path
+        self.config = f"{name}:{json.dumps(params, sort_keys=True, default=str)}"
+        self.clusters = clusters or {}
+        self.entries = {}
+        self._updated = set()
+        if os.path.exists(path):
+            conn = self._connect()
+            try:
+                rows = conn.execute("SELECT product_id, entry FROM orders WHERE config = ?", (self.config,))
+                self.entries = {product_id: json.loads(entry) for product_id, entry in rows}
+            finally:
+                conn.close()
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=60)
+        conn.execute("CREATE TABLE IF NOT EXISTS orders (config TEXT NOT NULL, product_id TEXT NOT NULL, "
+                     "entry TEXT NOT NULL, PRIMARY KEY (config, product_id))")
+        return conn
+
+    def seed(self, product_id):
+        """The product's own entry, else the most common order of its cluster, else None."""
+        entry = self.entries.get(str(product_id))
+        if entry is not None:
+            return entry
+        cluster = self.clusters.get(product_id)
+        if cluster is None:
+            return None
+        orders = Counter((tuple(e['order']), tuple(e['seasonal_order']))
+                         for e in self.entries.values() if e.get('cluster') == cluster)
+        if not orders:
+            return None
+        order, seasonal_order = orders.most_common(1)[0][0]
+        return {'order': list(order), 'seasonal_order': list(seasonal_order)}
+
+    def update(self, product_id, entry):
+        self.entries[str(product_id)] = {**entry, 'cluster': self.clusters.get(product_id)}
+        self._updated.add(str(product_id))
+
+    def save(self):
+        """Writes the entries updated since the last save; other products' and steps' rows are left alone."""
+        if not self._updated:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO orders VALUES (?, ?, ?)",
+                                 [(self.config, product_id, json.dumps(self.entries[product_id]))
+                                  for product_id in sorted(self._updated)])
+        finally:
+            conn.close()
+        self._updated.clear()
+
+
+def sarima_task(payload):
+    """Fits auto_arima on the training part of one product's weekly series and scores the forecast.
+
+    payload: product_id, y (weekly pd.Series), train_ratio, horizon, save_model
+    (return the model_state), order_seed (OrderCache entry or None). Returns a
+    dict with 'skipped' set when the series cannot be evaluated; exceptions
+    propagate so the runner records a failure.
+    """
+    y = payload['y']
+    horizon = payload['horizon']
+    if y.sum() == 0:
+        return {'skipped': 'no sales data'}
+
+    # --- Split data: train_ratio for training, the rest for testing ---
+    train_size = int(len(y) * payload['train_ratio'])
+    train, test = y[0:train_size], y[train_size:]
+    if len(test) < horizon:
+        return {'skipped': f"Not enough test data ({len(test)} weeks) to evaluate a {horizon}-week forecast"}
+
+    with span('auto_arima', rows=len(train)):
+        model, order_entry = search_arima(train, AUTO_ARIMA_PARAMS, seed=payload.get('order_seed'))
+    with span('predict', rows=horizon):
+        forecast, conf_int = model.predict(n_periods=horizon, return_conf_int=True)
+
+    return {
+        'order': f"{model.order}x{model.seasonal_order}",
+        'mae': mean_absolute_error(test[:horizon], forecast),
+        'train_size': train_size,
+        'forecast': np.asarray(forecast),
+        'conf_int': np.asarray(conf_int),
+        'order_entry': order_entry,
+        'model_state': sarima_state(model) if payload.get('save_model') else None,
+    }
+
+
+# Non-seasonal "fast mode" search used by 06 next to the Prophet forecast
+FAST_AUTO_ARIMA_PARAMS = {
+    'start_p': 1, 'start_q': 1,
+    'test': 'adf',
+    'max_p': 3, 'max_q': 3,
+    'm': 1,
+    'seasonal': False,
+    'start_P': 0, 'D': 0,
+    'trace': False,
+    'error_action': 'ignore',
+    'suppress_warnings': True,
+    'stepwise': True,
+}
+
+
+def sarima_forecast_task(payload):
+    """Fits the fast-mode auto_arima on payload['y'] and forecasts payload['horizon'] periods.
+
+    payload also takes order_seed and save_model as in sarima_task.
+    """
+    y = payload['y']
+    with span('auto_arima', rows=len(y)):
+        model, order_entry = search_arima(y, FAST_AUTO_ARIMA_PARAMS, seed=payload.get('order_seed'))
+    forecast, conf_int = model.predict(n_periods=payload['horizon'], return_conf_int=True)
+    return {'order': str(model.order), 'forecast': np.asarray(forecast), 'conf_int': np.asarray(conf_int),
+            'order_entry': order_entry, 'model_state': sarima_state(model) if payload.get('save_model') else None}
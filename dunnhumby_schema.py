@@ -0,0 +1,249 @@
+import os
+import sys
+
+import pandas as pd
+
+# Central dtype registry for the Dunnhumby source tables and the artifacts
+# derived from them. Keys are stored in the narrowest integer type that holds
+# the full Complete Journey value range, descriptive text columns as
+# categoricals; columns that are not declared keep the type inferred on read.
+# Currency columns (SALES_VALUE and the discounts) stay float64:
+# they are summed over millions of rows, where float32 rounding would show up
+# in the reported totals.
+SOURCE_SCHEMAS = {
+    'transaction_data': {
+        'household_key': 'int32',
+        'BASKET_ID': 'int64',       # values above 2**31
+        'DAY': 'int16',
+        'PRODUCT_ID': 'int32',
+        'QUANTITY': 'int32',
+        'SALES_VALUE': 'float64',
+        'STORE_ID': 'int16',
+        'RETAIL_DISC': 'float64',
+        'TRANS_TIME': 'int16',      # HHMM
+        'WEEK_NO': 'int8',
+        'COUPON_DISC': 'float64',
+        'COUPON_MATCH_DISC': 'float64',
+    },
+    'product': {
+        'PRODUCT_ID': 'int32',
+        'MANUFACTURER': 'int32',
+        'DEPARTMENT': 'category',
+        'BRAND': 'category',
+        'COMMODITY_DESC': 'category',
+        'SUB_COMMODITY_DESC': 'category',
+        # CURR_SIZE_OF_PRODUCT is left as parsed text; 01 strips it before categorising
+    },
+    'hh_demographic': {
+        'AGE_DESC': 'category',
+        'MARITAL_STATUS_CODE': 'category',
+        'INCOME_DESC': 'category',
+        'HOMEOWNER_DESC': 'category',
+        'HH_COMP_DESC': 'category',
+        'HOUSEHOLD_SIZE_DESC': 'category',
+        'KID_CATEGORY_DESC': 'category',
+        'household_key': 'int32',
+    },
+    'causal_data': {
+        'PRODUCT_ID': 'int32',
+        'STORE_ID': 'int16',
+        'WEEK_NO': 'int8',
+        'display': 'category',
+        'mailer': 'category',
+    },
+    'coupon': {
+        'COUPON_UPC': 'int64',
+        'PRODUCT_ID': 'int32',
+        'CAMPAIGN': 'int16',
+    },
+    'coupon_redempt': {
+        'household_key': 'int32',
+        'DAY': 'int16',
+        'COUPON_UPC': 'int64',
+        'CAMPAIGN': 'int16',
+    },
+    'campaign_table': {
+        'DESCRIPTION': 'category',
+        'household_key': 'int32',
+        'CAMPAIGN': 'int16',
+    },
+    'campaign_desc': {
+        'DESCRIPTION': 'category',
+        'CAMPAIGN': 'int16',
+        'START_DAY': 'int16',
+        'END_DAY': 'int16',
+    },
+}
+
+DERIVED_SCHEMAS = {
+    # 01_preprocess_data.py: transactions left-joined with products and demographics
+    'master_transaction_table': {
+        **SOURCE_SCHEMAS['transaction_data'],
+        **SOURCE_SCHEMAS['product'],
+        'CURR_SIZE_OF_PRODUCT': 'category',
+        **SOURCE_SCHEMAS['hh_demographic'],
+    },
+    # dunnhumby_data_integration.py: renamed analysis dataset
+    'integrated': {
+        'CustomerID': 'int32',
+        'OrderDate': 'datetime64[ns]',
+        'ProductID': 'int32',
+        'ProductName': 'category',
+        'Category': 'category',
+        'Brand': 'category',
+        'Quantity': 'int32',
+        'TotalAmount': 'float64',
+        'RetailDiscount': 'float64',
+        'CouponDiscount': 'float64',
+        'CouponMatchDiscount': 'float64',
+        'Discount': 'float64',
+        'CustomerAge': 'category',
+        'CustomerIncome': 'category',
+        'MARITAL_STATUS_CODE': 'category',
+        'HOMEOWNER_DESC': 'category',
+        'HH_COMP_DESC': 'category',
+        'HOUSEHOLD_SIZE_DESC': 'category',
+        'KID_CATEGORY_DESC': 'category',
+        'WeekNumber': 'int8',
+        'BASKET_ID': 'int64',
+        'DAY': 'int16',
+    },
+    # dunnhumby_cube.py: weekly cube cells of the master table (PRODUCT_ID x WEEK_NO, ...)
+    # and of the integrated dataset (ProductID x calendar week_index, ...)
+    'sales_cube': {
+        'PRODUCT_ID': 'int32',
+        'ProductID': 'int32',
+        'STORE_ID': 'int16',
+        'WEEK_NO': 'int8',
+        'week_index': 'int16',
+        'DAY': 'int16',
+        'SALES_VALUE': 'float32',
+        'QUANTITY': 'float32',
+        'TotalAmount': 'float32',
+        'Quantity': 'float32',
+        'COMMODITY_DESC': 'category',
+        'SUB_COMMODITY_DESC': 'category',
+        'DEPARTMENT': 'category',
+        'ProductName': 'category',
+        'Category': 'category',
+    },
+    # dunnhumby_dates.py
+    'date_dimension': {
+        'iso_year': 'int16',
+        'iso_week': 'int8',
+        'month': 'category',
+        'quarter': 'category',
+        'week_index': 'int16',
+        'month_index': 'int16',
+        'quarter_index': 'int16',
+    },
+}
+
+
+def schema_for(name):
+    """Returns the {column: dtype} declaration of a source table or derived artifact."""
+    if name in SOURCE_SCHEMAS:
+        return SOURCE_SCHEMAS[name]
+    return DERIVED_SCHEMAS[name]
+
+
+def read_csv_typed(path, table, **kwargs):
+    """pd.read_csv with the registry dtypes of a source table applied while parsing."""
+    return pd.read_csv(path, dtype=SOURCE_SCHEMAS[table], **kwargs)
+
+
+def _target_dtype(series, dtype):
+    if dtype == 'category' and isinstance(series.dtype, pd.CategoricalDtype):
+        return None
+    if str(series.dtype) == dtype:
+        return None
+    if dtype.startswith('datetime64') and pd.api.types.is_datetime64_dtype(series.dtype):
+        return None
+    # Integer keys that picked up missing values in a left join stay float
+    if dtype.startswith(('int', 'uint')) and series.isna().any():
+        return None
+    return dtype
+
+
+def enforce_schema(df, name, downcast=True):
+    """Casts a frame to the registry dtypes of `name` (only columns that are present).
+
+    Columns that are already in their declared dtype are left untouched, so
+    read-only zero-copy columns (see load_integrated) are not copied. With
+    downcast=True undeclared integer columns are shrunk to the smallest integer
+    type that holds their values.
+    """
+    schema = schema_for(name)
+    casts = {}
+    for col in df.columns:
+        if col in schema:
+            target = _target_dtype(df[col], schema[col])
+            if target is not None:
+                casts[col] = target
+        elif downcast and df[col].dtype.kind in 'iu':
+            shrunk = pd.to_numeric(df[col], downcast='integer' if df[col].dtype.kind == 'i' else 'unsigned')
+            if shrunk.dtype != df[col].dtype:
+                df[col] = shrunk
+    return df.astype(casts) if casts else df
+
+
+def memory_report(before, after):
+    """Per-column memory comparison of two versions of the same frame.
+
+    Returns a DataFrame indexed by column with the dtypes and deep memory usage
+    before and after, the bytes saved, and a TOTAL row.
+    """
+    before_bytes = before.memory_usage(deep=True, index=False)
+    after_bytes = after.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'dtype_after': after.dtypes.reindex(before.columns).astype(str),
+        'bytes_before': before_bytes,
+        'bytes_after': after_bytes.reindex(before.columns),
+    })
+    report['bytes_saved'] = report['bytes_before'] - report['bytes_after']
+    report.loc['TOTAL', ['bytes_before', 'bytes_after', 'bytes_saved']] = report[
+        ['bytes_before', 'bytes_after', 'bytes_saved']].sum()
+    report[['bytes_before', 'bytes_after', 'bytes_saved']] = report[
+        ['bytes_before', 'bytes_after', 'bytes_saved']].astype('int64')
+    return report.fillna('')
+
+
+def _as_inferred(df):
+    # The dtypes pd.read_csv infers without a dtype map: int64 / float64 / object
+    inferred = {}
+    for col in df.columns:
+        kind = df[col].dtype.kind
+        if kind in 'iu':
+            inferred[col] = 'int64'
+        elif kind == 'f':
+            inferred[col] = 'float64'
+        elif isinstance(df[col].dtype, pd.CategoricalDtype):
+            inferred[col] = object
+    return df.astype(inferred)
+
+
+def savings_report(df):
+    """memory_report of a registry-typed frame against the same data in inferred dtypes."""
+    return memory_report(_as_inferred(df), df)
+
+
+def print_memory_report(report, title):
+    total = report.loc['TOTAL']
+    saved_pct = 100 * total['bytes_saved'] / total['bytes_before'] if total['bytes_before'] else 0.0
+    print(f"\n--- Memory: {title} ---")
+    print(report.to_string())
+    print(f"{total['bytes_before'] / 1024**2:.2f} MB -> {total['bytes_after'] / 1024**2:.2f} MB "
+          f"({saved_pct:.1f}% saved)")
+
+
+if __name__ == '__main__':
+    # Bytes saved per column for every source table: untyped read_csv vs registry dtypes
+    # Usage: python dunnhumby_schema.py [source_dir]
+    src_dir = sys.argv[1] if len(sys.argv) > 1 else 'dunnhumby.db'
+    for table in SOURCE_SCHEMAS:
+        path = os.path.join(src_dir, f'{table}.csv')
+        if not os.path.exists(path):
+            print(f"\n{path} not found, skipped.")
+            continue
+        print_memory_report(memory_report(pd.read_csv(path), read_csv_typed(path, table)), table)
@@ -0,0 +1,179 @@
+import json
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from dunnhumby_registry import REGISTRY_PATH, ModelRegistry, load_model, predict
+
+# Forecast serving from the model registry (dunnhumby_registry), without
+# refitting. ForecastService loads a product's stored state on its first
+# request, deserializes it once (Prophet model / SARIMAX results filtered with
+# the stored coefficients) and keeps the CACHE_SIZE most recently used models in
+# memory, so a repeated request only extrapolates. Before each use the cached
+# version is checked against the registry (one index lookup): a model stored by
+# a later fitting run replaces the cached one.
+#
+# serve() answers the same batch call over HTTP (standard library only):
+#   GET  /forecast?product_id=1&product_id=2&horizon=12[&model=prophet_forecast]
+#   POST /forecast   {"product_ids": [1, 2], "horizon": 12, "model": "prophet_forecast"}
+#   GET  /health     cache statistics
+DEFAULT_MODEL = 'prophet_forecast'   # The full-data Prophet fits of 06
+DEFAULT_HORIZON = 12
+MAX_HORIZON = 104
+CACHE_SIZE = 256
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+
+
+def _forecast_rows(predicted):
+    rows = []
+    for step, row in enumerate(predicted.itertuples(index=False), start=1):
+        item = {'step': step}
+        if 'ds' in predicted.columns:
+            item['ds'] = pd.Timestamp(row.ds).strftime('%Y-%m-%d')
+        item.update(yhat=float(row.yhat), yhat_lower=float(row.yhat_lower), yhat_upper=float(row.yhat_upper))
+        rows.append(item)
+    return rows
+
+
+class ForecastService:
+    """Batch forecasts from stored models, with an LRU cache of loaded models."""
+
+    def __init__(self, registry_path=REGISTRY_PATH, model=DEFAULT_MODEL, cache_size=CACHE_SIZE):
+        self.registry = ModelRegistry(registry_path)
+        self.model = model
+        self.cache_size = cache_size
+        self._models = OrderedDict()  # (name, product_id) -> {version, kind, metadata, predictor}, oldest use first
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        self.registry.close()
+
+    def _loaded(self, name, product_id):
+        key = (name, str(product_id))
+        version = self.registry.latest_version(name, product_id)
+        if version is None:
+            self._models.pop(key, None)
+            return None
+        entry = self._models.get(key)
+        if entry is not None and entry['version'] == version:
+            self.hits += 1
+            self._models.move_to_end(key)
+            return entry
+        self.misses += 1
+        record = self.registry.get(name, product_id, version)
+        entry = {'version': version, 'kind': record['kind'], 'metadata': record['metadata'],
+                 'predictor': load_model(record)}
+        self._models[key] = entry
+        self._models.move_to_end(key)
+        while len(self._models) > self.cache_size:
+            self._models.popitem(last=False)
+        return entry
+
+    def forecast(self, product_ids, horizon=DEFAULT_HORIZON, model=None):
+        """One result per product: product_id, model, status ('ok' / 'missing' / 'failed'),
+        milliseconds, and version, kind and forecast (rows of step, ds for Prophet,
+        yhat, yhat_lower, yhat_upper) when ok, else error.
+
+        A product without a stored model or whose prediction fails does not
+        fail the batch.
+        """
+        horizon = int(horizon)
+        if not 1 <= horizon <= MAX_HORIZON:
+            raise ValueError(f"horizon must be between 1 and {MAX_HORIZON} weeks")
+        name = model or self.model
+        results = []
+        for product_id in product_ids:
+            start = time.perf_counter()
+            result = {'product_id': str(product_id), 'model': name}
+            try:
+                entry = self._loaded(name, product_id)
+                if entry is None:
+                    result.update(status='missing', error=f"no stored {name} model")
+                else:
+                    predicted = predict(entry['kind'], entry['predictor'], horizon)
+                    result.update(status='ok', version=entry['version'], kind=entry['kind'],
+                                  forecast=_forecast_rows(predicted))
+            except Exception as e:
+                result.update(status='failed', error=f"{type(e).__name__}: {e}")
+            result['milliseconds'] = round((time.perf_counter() - start) * 1000, 3)
+            results.append(result)
+        return results
+
+    def stats(self):
+        return {'model': self.model, 'cached_models': len(self._models), 'cache_size': self.cache_size,
+                'hits': self.hits, 'misses': self.misses}
+
+
+def forecast_frame(results):
+    """Tidy DataFrame of the ok results of ForecastService.forecast: one row per product and step."""
+    rows = [{'Product_ID': r['product_id'], 'Model': r['model'], 'Version': r['version'], **row}
+            for r in results if r['status'] == 'ok' for row in r['forecast']]
+    return pd.DataFrame(rows)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None  # set by serve()
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _answer(self, product_ids, horizon, model):
+        if not product_ids:
+            return self._send(400, {'error': 'no product ids'})
+        start = time.perf_counter()
+        try:
+            results = self.service.forecast(product_ids, horizon, model)
+        except ValueError as e:
+            return self._send(400, {'error': str(e)})
+        self._send(200, {'horizon': int(horizon), 'results': results,
+                         'milliseconds': round((time.perf_counter() - start) * 1000, 3)})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/health':
+            return self._send(200, self.service.stats())
+        if url.path != '/forecast':
+            return self._send(404, {'error': f"unknown path {url.path}"})
+        query = parse_qs(url.query)
+        product_ids = [p for value in query.get('product_id', []) for p in value.split(',') if p]
+        try:
+            horizon = int(query.get('horizon', [DEFAULT_HORIZON])[0])
+        except ValueError:
+            return self._send(400, {'error': 'horizon must be an integer'})
+        self._answer(product_ids, horizon, query.get('model', [None])[0])
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/forecast':
+            return self._send(404, {'error': f"unknown path {self.path}"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+            horizon = int(body.get('horizon', DEFAULT_HORIZON))
+        except (ValueError, AttributeError, TypeError):
+            return self._send(400, {'error': 'expected a JSON object with product_ids, horizon and model'})
+        product_ids = body.get('product_ids') or []
+        if isinstance(product_ids, (str, int)):
+            product_ids = [product_ids]
+        self._answer(product_ids, horizon, body.get('model'))
+
+
+def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Answers forecast requests over HTTP until interrupted (one request at a time)."""
+    handler = type('ForecastHandler', (_Handler,), {'service': service})
+    server = HTTPServer((host, port), handler)
+    print(f"Serving {service.model} forecasts on http://{host}:{port}/forecast (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
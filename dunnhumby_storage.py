@@ -0,0 +1,330 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from dunnhumby_schema import DERIVED_SCHEMAS, enforce_schema
+
+# Hive-style partitioned layout of the master transaction table written by
+# 01_preprocess_data.py:
+#   processed_data/master_transaction_table/week_bucket=<b>/hh_bucket=<h>/part-0.parquet
+# week_bucket groups WEEK_NO into fixed-size ranges (13 weeks ~ one quarter) and
+# hh_bucket is household_key modulo HOUSEHOLD_BUCKETS, so weekly forecasting can
+# skip whole quarters and per-household NBA can skip whole household shards.
+MASTER_DATASET_DIR = os.path.join('processed_data', 'master_transaction_table')
+MASTER_LEGACY_PATH = os.path.join('processed_data', 'master_transaction_table.parquet')
+MANIFEST_NAME = '_manifest.json'
+# Watermark prefix of the master table: <dir>/_watermark.json + <dir>/_baskets.parquet
+MASTER_WATERMARK_PREFIX = os.path.join(MASTER_DATASET_DIR, '')
+
+WEEK_BUCKET_SIZE = 13
+HOUSEHOLD_BUCKETS = 16
+
+
+def week_bucket(week_no):
+    return (week_no - 1) // WEEK_BUCKET_SIZE
+
+
+def household_bucket(household_key):
+    return household_key % HOUSEHOLD_BUCKETS
+
+
+class PartitionedWriter:
+    """Appends DataFrame chunks to a Hive-partitioned Parquet dataset.
+
+    One ParquetWriter is kept open per (week_bucket, hh_bucket) partition, so a
+    streamed input produces one file per partition with one row group per chunk
+    instead of a file per chunk. The first chunk fixes the schema for all files.
+
+    With append=True the writer extends an existing dataset: rows for partitions
+    that already exist are buffered and those partition files alone are rewritten
+    on close(); every other partition is left untouched.
+    """
+
+    def __init__(self, root=MASTER_DATASET_DIR, append=False):
+        self.root = root
+        self.schema = None
+        self._writers = {}
+        self._pending = {}
+        self._stats = {}
+        self.rows_written = 0
+        if append:
+            for p in read_manifest(root)['partitions']:
+                self._stats[(p['week_bucket'], p['hh_bucket'])] = p
+            if self._stats:
+                first = next(iter(self._stats.values()))
+                self.schema = pq.read_schema(os.path.join(root, first['path']))
+        self._existing = set(self._stats)
+        os.makedirs(root, exist_ok=True)
+
+    @property
+    def rewritten_partitions(self):
+        return sorted(self._pending)
+
+    def write(self, df):
+        if df.empty:
+            return
+        keys = pd.DataFrame({
+            'week_bucket': week_bucket(df['WEEK_NO'].astype('int32')),
+            'hh_bucket': household_bucket(df['household_key'].astype('int32')),
+        })
+        for (wb, hb), idx in keys.groupby(['week_bucket', 'hh_bucket']).groups.items():
+            key = (int(wb), int(hb))
+            part = df.loc[idx]
+            table = pa.Table.from_pandas(part, preserve_index=False)
+            if self.schema is None:
+                self.schema = table.schema
+            else:
+                table = table.cast(self.schema)
+            if key in self._existing:
+                self._pending.setdefault(key, []).append(table)
+            else:
+                self._writer_for(key).write_table(table)
+
+            stats = self._stats[key]
+            stats['rows'] += len(part)
+            stats['week_min'] = min(stats['week_min'], int(part['WEEK_NO'].min()))
+            stats['week_max'] = max(stats['week_max'], int(part['WEEK_NO'].max()))
+            self.rows_written += len(part)
+
+    def _writer_for(self, key):
+        if key not in self._writers:
+            wb, hb = key
+            rel_path = os.path.join(f'week_bucket={wb}', f'hh_bucket={hb}', 'part-0.parquet')
+            os.makedirs(os.path.join(self.root, os.path.dirname(rel_path)), exist_ok=True)
+            self._writers[key] = pq.ParquetWriter(os.path.join(self.root, rel_path), self.schema)
+            self._stats[key] = {
+                'path': rel_path.replace(os.sep, '/'),
+                'week_bucket': wb,
+                'hh_bucket': hb,
+                'rows': 0,
+                'week_min': float('inf'),
+                'week_max': float('-inf'),
+            }
+        return self._writers[key]
+
+    def _rewrite_partition(self, key, tables):
+        path = os.path.join(self.root, self._stats[key]['path'])
+        combined = pa.concat_tables([pq.read_table(path).cast(self.schema)] + tables)
+        pq.write_table(combined, path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+    def close(self):
+        """Closes all partition files and writes the manifest. Returns the total row count."""
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+        for key, tables in self._pending.items():
+            self._rewrite_partition(key, tables)
+        partitions = sorted(self._stats.values(), key=lambda p: (p['week_bucket'], p['hh_bucket']))
+        write_manifest(self.root, partitions, self.schema)
+        return sum(p['rows'] for p in partitions)
+
+
+def write_manifest(root, partitions, schema):
+    manifest = {
+        'week_bucket_size': WEEK_BUCKET_SIZE,
+        'household_buckets': HOUSEHOLD_BUCKETS,
+        'columns': schema.names if schema is not None else [],
+        'total_rows': sum(p['rows'] for p in partitions),
+        'partitions': partitions,
+    }
+    with open(os.path.join(root, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def read_manifest(root=MASTER_DATASET_DIR):
+    with open(os.path.join(root, MANIFEST_NAME), encoding='utf-8') as f:
+        return json.load(f)
+
+
+# --- Incremental ingestion watermarks ---
+# A watermark records what an ingestion step has already absorbed: the highest
+# DAY / WEEK_NO seen and the sorted set of BASKET_IDs, so a later run only has to
+# process rows whose basket is not in that set (new weeks or late-arriving baskets).
+
+def _watermark_paths(prefix):
+    return prefix + '_watermark.json', prefix + '_baskets.parquet'
+
+
+def read_watermark(prefix):
+    """Returns (watermark dict, sorted BASKET_ID array), or (None, empty array) if absent."""
+    json_path, baskets_path = _watermark_paths(prefix)
+    if not (os.path.exists(json_path) and os.path.exists(baskets_path)):
+        return None, np.array([], dtype='int64')
+    with open(json_path, encoding='utf-8') as f:
+        watermark = json.load(f)
+    baskets = pq.read_table(baskets_path).column('BASKET_ID').to_numpy()
+    return watermark, baskets
+
+
+def write_watermark(prefix, baskets, max_day, max_week, **extra):
+    json_path, baskets_path = _watermark_paths(prefix)
+    baskets = np.unique(np.asarray(baskets, dtype='int64'))
+    pq.write_table(pa.table({'BASKET_ID': baskets}), baskets_path)
+    watermark = {'max_day': int(max_day), 'max_week': int(max_week), 'basket_count': int(len(baskets)), **extra}
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(watermark, f, indent=2)
+
+
+def new_rows_mask(basket_ids, ingested_baskets):
+    """Boolean mask of rows whose BASKET_ID is not in the sorted ingested set."""
+    basket_ids = np.asarray(basket_ids, dtype='int64')
+    if len(ingested_baskets) == 0:
+        return np.ones(len(basket_ids), dtype=bool)
+    pos = np.searchsorted(ingested_baskets, basket_ids)
+    pos[pos == len(ingested_baskets)] = 0
+    return ingested_baskets[pos] != basket_ids
+
+
+def master_table_exists(root=MASTER_DATASET_DIR):
+    return os.path.exists(os.path.join(root, MANIFEST_NAME)) or os.path.exists(MASTER_LEGACY_PATH)
+
+
+def _partition_may_match(partition, filters):
+    """Decides from the manifest alone whether a partition can contain matching rows.
+
+    Only predicates on WEEK_NO and household_key are used for pruning; any other
+    predicate is left to the row-level filter.
+    """
+    for col, op, value in filters:
+        if col == 'WEEK_NO':
+            lo, hi = partition['week_min'], partition['week_max']
+            if op in ('=', '==') and not lo <= value <= hi:
+                return False
+            if op == 'in' and not any(lo <= v <= hi for v in value):
+                return False
+            if op == '>' and hi <= value:
+                return False
+            if op == '>=' and hi < value:
+                return False
+            if op == '<' and lo >= value:
+                return False
+            if op == '<=' and lo > value:
+                return False
+        elif col == 'household_key':
+            if op in ('=', '==') and household_bucket(value) != partition['hh_bucket']:
+                return False
+            if op == 'in' and partition['hh_bucket'] not in {household_bucket(v) for v in value}:
+                return False
+    return True
+
+
+def load_master(columns=None, filters=None, root=MASTER_DATASET_DIR):
+    """Loads the master transaction table with column and predicate pushdown.
+
+    filters is a list of (column, op, value) tuples combined with AND, in the same
+    form pd.read_parquet accepts, e.g. [('WEEK_NO', '>=', 40), ('household_key', 'in', ids)].
+    Partitions that cannot match are skipped using the manifest, and only the
+    requested columns are decoded from the remaining files. Falls back to the
+    monolithic master_transaction_table.parquet if the partitioned dataset has
+    not been built yet. Columns are returned in their registry dtypes.
+    """
+    filters = list(filters or [])
+    expression = pq.filters_to_expression(filters) if filters else None
+
+    if not os.path.exists(os.path.join(root, MANIFEST_NAME)):
+        df = pd.read_parquet(MASTER_LEGACY_PATH, columns=columns, filters=filters or None)
+        return enforce_schema(df, 'master_transaction_table')
+
+    manifest = read_manifest(root)
+    paths = [os.path.join(root, p['path']) for p in manifest['partitions']
+             if _partition_may_match(p, filters)]
+    if not paths:
+        return pd.DataFrame(columns=columns or manifest['columns'])
+
+    dataset = ds.dataset(paths, format='parquet')
+    df = dataset.to_table(columns=columns, filter=expression).to_pandas()
+    return enforce_schema(df, 'master_transaction_table')
+
+
+# Typed, dictionary-encoded analysis dataset written by dunnhumby_data_integration.py.
+# OrderDate is stored as a native Arrow date32 and the descriptive columns as
+# dictionary (categorical) columns, so loading it needs no CSV parsing and no
+# pd.to_datetime pass.
+INTEGRATED_DATA_PATH = 'dunnhumby_integrated_data.parquet'
+
+INTEGRATED_CATEGORICAL_COLUMNS = [
+    col for col, dtype in DERIVED_SCHEMAS['integrated'].items() if dtype == 'category'
+]
+
+# Uncompressed Arrow IPC copy of the integrated dataset, also written by the
+# integration step. Analysis scripts memory-map it read-only, so concurrent jobs
+# share one copy of the data through the OS page cache instead of each holding
+# a private pandas copy.
+SHARED_STORE_PATH = 'dunnhumby_integrated_data.arrow'
+INTEGRATED_WATERMARK_PREFIX = 'dunnhumby_integrated_data'
+
+
+def write_integrated(df, path=INTEGRATED_DATA_PATH, row_group_size=256_000):
+    """Writes the integrated analysis frame as a typed Parquet file.
+
+    Rows are expected in transaction (OrderDate) order so that row-group
+    statistics let date and week filters skip most of the file.
+    """
+    df = df.copy()
+    for col in INTEGRATED_CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if 'OrderDate' in table.column_names:
+        idx = table.schema.get_field_index('OrderDate')
+        table = table.set_column(idx, 'OrderDate', table.column('OrderDate').cast(pa.date32()))
+    pq.write_table(table, path, row_group_size=row_group_size)
+    return table
+
+
+def write_shared_store(table, path=SHARED_STORE_PATH):
+    """Writes an Arrow table as an uncompressed IPC file for memory-mapped sharing.
+
+    OrderDate is stored as timestamp[ms] rather than date32 so that it converts
+    to datetime64 without a copy on the reading side.
+    """
+    if 'OrderDate' in table.column_names:
+        idx = table.schema.get_field_index('OrderDate')
+        table = table.set_column(idx, 'OrderDate', table.column('OrderDate').cast(pa.timestamp('ms')))
+    tmp_path = path + '.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    # Readers that are already attached keep their mapping of the old file
+    os.replace(tmp_path, path)
+
+
+def attach_shared_store(path=SHARED_STORE_PATH):
+    """Memory-maps the shared IPC store read-only and returns it as an Arrow table.
+
+    No data is read up front: column buffers point straight into the mapping and
+    pages are loaded on first access, shared with every other attached process.
+    """
+    source = pa.memory_map(path, 'r')
+    return pa.ipc.open_file(source).read_all()
+
+
+def load_integrated(columns=None, filters=None, path=INTEGRATED_DATA_PATH, shared=None):
+    """Loads the integrated analysis dataset with column and predicate pushdown.
+
+    filters uses the same (column, op, value) tuple form as load_master. OrderDate
+    is returned as datetime64, the descriptive columns as pandas categoricals and
+    every other column in its registry dtype (legacy files are downcast on load).
+
+    With shared=None the memory-mapped store is used whenever it exists next to
+    the Parquet file (shared=True requires it, shared=False never uses it). In
+    that mode numeric columns without nulls are zero-copy, read-only views of the
+    mapping; only categorical codes and filtered rows are materialised per process.
+    """
+    store_path = os.path.join(os.path.dirname(path), SHARED_STORE_PATH)
+    if shared or (shared is None and os.path.exists(store_path)):
+        table = attach_shared_store(store_path)
+        if filters:
+            table = ds.dataset(table).to_table(columns=columns, filter=pq.filters_to_expression(filters))
+        elif columns is not None:
+            table = table.select(columns)
+        return enforce_schema(table.to_pandas(split_blocks=True, date_as_object=False), 'integrated')
+
+    table = pq.read_table(path, columns=columns, filters=filters or None)
+    return enforce_schema(table.to_pandas(date_as_object=False), 'integrated')
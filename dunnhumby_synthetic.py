@@ -0,0 +1,278 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+from dunnhumby_ingest import arrow_type, raw_csv_path
+from dunnhumby_schema import SOURCE_SCHEMAS
+
+# Synthetic Dunnhumby-shaped source tables for local benchmarking (the real
+# dunnhumby.db files are Git LFS pointers in most checkouts). generate() writes
+# the eight source CSVs with the column names and value ranges of The Complete
+# Journey, so every pipeline step can run on them unchanged:
+#   households   visit the store Poisson(visit rate) times a week; visit rates
+#                are gamma-distributed, so RFM sees light and heavy shoppers
+#   baskets      1 + negative-binomial lines with mean basket_size_mean
+#   products     Zipf popularity within commodities, each commodity with its
+#                own yearly seasonality, so there are clear top sellers with
+#                forecastable weekly series
+# Scale 1 is roughly a tenth of the real dataset (about 250k transaction lines);
+# scale 10 is close to its real size. Households, products and stores grow with
+# the scale, the time range (weeks) does not.
+SCALE_1X = {
+    'households': 250,
+    'products': 9_000,
+    'commodities': 300,
+    'stores': 60,
+    'weeks': 102,
+    'visit_rate': 1.1,           # mean store visits per household per week
+    'basket_size_mean': 9.0,     # mean lines per basket
+    'zipf_exponent': 0.8,        # product popularity skew
+    'demographic_share': 0.32,   # share of households with hh_demographic rows
+    'campaigns': 30,
+    'causal_rows_per_line': 0.5, # causal_data rows per transaction line
+}
+_SCALED = ('households', 'products', 'stores')
+
+FIRST_BASKET_ID = 26984851472
+FIRST_PRODUCT_ID = 25671
+
+_DEPARTMENTS = ['GROCERY', 'DRUG GM', 'PRODUCE', 'MEAT', 'MEAT-PCKGD', 'DELI', 'PASTRY',
+                'NUTRITION', 'SEAFOOD-PCKGD', 'FLORAL', 'KIOSK-GAS']
+_COMMODITIES = ['SOFT DRINKS', 'BEEF', 'CHEESE', 'FLUID MILK PRODUCTS', 'BAKED BREAD/BUNS/ROLLS',
+                'FRZN MEAT/MEAT DINNERS', 'BAG SNACKS', 'COLD CEREAL', 'BEERS/ALES', 'TROPICAL FRUIT',
+                'CHICKEN', 'VEGETABLES - ALL OTHERS', 'EGGS', 'YOGURT', 'COUPON/MISC ITEMS']
+_SIZES = ['12 OZ', '16 OZ', '1 LB', '2 LTR', '6/12 OZ', '1 GA', ' ', '']
+_DEMOGRAPHICS = {
+    'AGE_DESC': ['19-24', '25-34', '35-44', '45-54', '55-64', '65+'],
+    'MARITAL_STATUS_CODE': ['A', 'B', 'U'],
+    'INCOME_DESC': ['Under 15K', '15-24K', '25-34K', '35-49K', '50-74K', '75-99K', '100-124K', '125-149K', '150-174K'],
+    'HOMEOWNER_DESC': ['Homeowner', 'Renter', 'Probable Owner', 'Probable Renter', 'Unknown'],
+    'HH_COMP_DESC': ['2 Adults No Kids', '2 Adults Kids', 'Single Female', 'Single Male', '1 Adult Kids', 'Unknown'],
+    'HOUSEHOLD_SIZE_DESC': ['1', '2', '3', '4', '5+'],
+    'KID_CATEGORY_DESC': ['None/Unknown', '1', '2', '3+'],
+}
+
+CONFIG_NAME = '_synthetic.json'
+
+
+def scaled_config(scale=1, **overrides):
+    """SCALE_1X with households, products and stores multiplied by `scale`."""
+    config = dict(SCALE_1X)
+    for key in _SCALED:
+        config[key] = max(1, int(round(config[key] * scale)))
+    config.update(overrides)
+    return config
+
+
+def _schema(table, columns):
+    dtypes = SOURCE_SCHEMAS[table]
+    return pa.schema([(col, arrow_type(dtypes[col]).value_type if dtypes.get(col) == 'category'
+                       else arrow_type(dtypes.get(col, 'string'))) for col in columns])
+
+
+def _write_csv(df, path, table):
+    pacsv.write_csv(pa.Table.from_pandas(df, schema=_schema(table, df.columns), preserve_index=False), path)
+
+
+def make_products(config, rng):
+    n = config['products']
+    ids = FIRST_PRODUCT_ID + np.cumsum(rng.integers(1, 20, n))
+    n_commodities = config['commodities']
+    names = (_COMMODITIES + [f'COMMODITY {i:03d}' for i in range(len(_COMMODITIES), n_commodities)])[:n_commodities]
+    commodity = rng.integers(0, n_commodities, n)
+    sub = rng.integers(0, 8, n)
+    return pd.DataFrame({
+        'PRODUCT_ID': ids,
+        'MANUFACTURER': rng.integers(1, 6500, n),
+        'DEPARTMENT': np.array(_DEPARTMENTS)[commodity % len(_DEPARTMENTS)],
+        'BRAND': np.where(rng.random(n) < 0.7, 'National', 'Private'),
+        'COMMODITY_DESC': np.array(names)[commodity],
+        'SUB_COMMODITY_DESC': np.where(sub == 0, 'NO SUBCOMMODITY DESCRIPTION',
+                                       np.char.add(np.array(names)[commodity], np.char.add(' ', sub.astype(str)))),
+        'CURR_SIZE_OF_PRODUCT': rng.choice(_SIZES, n),
+    }), commodity
+
+
+def make_demographics(config, rng):
+    households = np.arange(1, config['households'] + 1)
+    keys = np.sort(rng.choice(households, max(1, int(len(households) * config['demographic_share'])), replace=False))
+    df = pd.DataFrame({col: rng.choice(values, len(keys)) for col, values in _DEMOGRAPHICS.items()})
+    df['household_key'] = keys
+    return df
+
+
+def iter_transactions(config, products, commodity, rng):
+    """Yields the transaction_data rows one week at a time, BASKET_IDs ascending."""
+    n_hh, n_prod, weeks = config['households'], len(products), config['weeks']
+    hh_rate = rng.gamma(2.0, config['visit_rate'] / 2.0, n_hh)
+    home_store = rng.integers(1, config['stores'] + 1, n_hh)
+
+    # Zipf popularity, shuffled so the top sellers are spread over the commodities
+    popularity = 1.0 / np.arange(1, n_prod + 1) ** config['zipf_exponent']
+    popularity = popularity[rng.permutation(n_prod)]
+    amplitude = rng.uniform(0.0, 0.6, config['commodities'])[commodity]
+    phase = rng.uniform(0.0, 52.0, config['commodities'])[commodity]
+    price = np.round(rng.lognormal(1.0, 0.6, n_prod), 2)
+    product_ids = products['PRODUCT_ID'].to_numpy()
+
+    # Negative binomial with mean basket_size_mean - 1 extra lines per basket
+    extra_mean = config['basket_size_mean'] - 1
+    nb_n = 2.0
+    nb_p = nb_n / (nb_n + extra_mean)
+
+    next_basket = FIRST_BASKET_ID
+    for week in range(1, weeks + 1):
+        visits = rng.poisson(hh_rate)
+        households = np.repeat(np.arange(1, n_hh + 1), visits)
+        n_baskets = len(households)
+        if n_baskets == 0:
+            continue
+        day = (week - 1) * 7 + rng.integers(1, 8, n_baskets)
+        order = np.argsort(day, kind='stable')
+        households, day = households[order], day[order]
+        basket_ids = next_basket + np.arange(n_baskets, dtype='int64')
+        next_basket += n_baskets
+
+        lines = 1 + rng.negative_binomial(nb_n, nb_p, n_baskets)
+        row_basket = np.repeat(np.arange(n_baskets), lines)
+        n_rows = len(row_basket)
+        weights = popularity * (1 + amplitude * np.sin(2 * np.pi * (week + phase) / 52))
+        product = rng.choice(n_prod, n_rows, p=weights / weights.sum())
+        quantity = rng.geometric(0.7, n_rows)
+        sales = np.round(quantity * price[product], 2)
+        store = np.where(rng.random(n_baskets) < 0.85, home_store[households - 1],
+                         rng.integers(1, config['stores'] + 1, n_baskets))
+        time_of_day = rng.integers(6, 23, n_baskets) * 100 + rng.integers(0, 60, n_baskets)
+        retail_disc = np.where(rng.random(n_rows) < 0.35, -np.round(sales * rng.uniform(0.05, 0.4, n_rows), 2), 0.0)
+        coupon_disc = np.where(rng.random(n_rows) < 0.01, -np.round(rng.uniform(0.25, 2.0, n_rows), 2), 0.0)
+        match_disc = np.where((coupon_disc < 0) & (rng.random(n_rows) < 0.3), -0.4, 0.0)
+
+        yield pd.DataFrame({
+            'household_key': households[row_basket],
+            'BASKET_ID': basket_ids[row_basket],
+            'DAY': day[row_basket],
+            'PRODUCT_ID': product_ids[product],
+            'QUANTITY': quantity,
+            'SALES_VALUE': sales,
+            'STORE_ID': store[row_basket],
+            'RETAIL_DISC': retail_disc,
+            'TRANS_TIME': time_of_day[row_basket],
+            'WEEK_NO': week,
+            'COUPON_DISC': coupon_disc,
+            'COUPON_MATCH_DISC': match_disc,
+        })
+
+
+def make_campaign_tables(config, products, rng):
+    n_camp, n_hh, days = config['campaigns'], config['households'], config['weeks'] * 7
+    campaigns = np.arange(1, n_camp + 1)
+    start = np.sort(rng.integers(200, max(201, days - 60), n_camp))
+    campaign_desc = pd.DataFrame({
+        'DESCRIPTION': rng.choice(['TypeA', 'TypeB', 'TypeC'], n_camp, p=[0.3, 0.6, 0.1]),
+        'CAMPAIGN': campaigns,
+        'START_DAY': start,
+        'END_DAY': start + rng.integers(30, 60, n_camp),
+    })
+    n_targets = n_hh * 3
+    campaign_table = pd.DataFrame({
+        'DESCRIPTION': rng.choice(['TypeA', 'TypeB', 'TypeC'], n_targets),
+        'household_key': rng.integers(1, n_hh + 1, n_targets),
+        'CAMPAIGN': rng.choice(campaigns, n_targets),
+    }).drop_duplicates(subset=['household_key', 'CAMPAIGN'])
+    n_coupons = max(n_camp, len(products) // 8)
+    upc = 10_000_000_000 + rng.choice(89_999_999_999, n_coupons, replace=False)
+    coupon = pd.DataFrame({
+        'COUPON_UPC': upc,
+        'PRODUCT_ID': rng.choice(products['PRODUCT_ID'].to_numpy(), n_coupons),
+        'CAMPAIGN': rng.choice(campaigns, n_coupons),
+    })
+    redeemed = coupon.sample(n=max(1, n_coupons // 20), random_state=int(rng.integers(1 << 31)))
+    coupon_redempt = pd.DataFrame({
+        'household_key': rng.integers(1, n_hh + 1, len(redeemed)),
+        'DAY': rng.integers(200, days + 1, len(redeemed)),
+        'COUPON_UPC': redeemed['COUPON_UPC'].to_numpy(),
+        'CAMPAIGN': redeemed['CAMPAIGN'].to_numpy(),
+    })
+    return {'campaign_desc': campaign_desc, 'campaign_table': campaign_table,
+            'coupon': coupon, 'coupon_redempt': coupon_redempt}
+
+
+def make_causal(config, products, n_rows, rng):
+    return pd.DataFrame({
+        'PRODUCT_ID': rng.choice(products['PRODUCT_ID'].to_numpy(), n_rows),
+        'STORE_ID': rng.integers(1, config['stores'] + 1, n_rows),
+        'WEEK_NO': rng.integers(9, config['weeks'] + 1, n_rows),
+        'display': rng.choice(['0', '1', '2', '3', '5', '6', '7', '9', 'A'], n_rows),
+        'mailer': rng.choice(['0', 'A', 'C', 'D', 'F', 'H', 'J', 'L', 'P', 'X', 'Z'], n_rows),
+    }).drop_duplicates(subset=['PRODUCT_ID', 'STORE_ID', 'WEEK_NO'])
+
+
+def generate(out_dir, scale=1, seed=0, **overrides):
+    """Writes the eight synthetic source CSVs to out_dir; returns {table: rows}.
+
+    The same (scale, seed, overrides) always produce the same files. The
+    configuration is recorded in out_dir/_synthetic.json.
+    """
+    config = scaled_config(scale, **overrides)
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    rows = {}
+
+    products, commodity = make_products(config, rng)
+    _write_csv(products, raw_csv_path('product', out_dir), 'product')
+    rows['product'] = len(products)
+    demographics = make_demographics(config, rng)
+    _write_csv(demographics, raw_csv_path('hh_demographic', out_dir), 'hh_demographic')
+    rows['hh_demographic'] = len(demographics)
+
+    # Written week by week, so memory stays flat at any scale
+    path = raw_csv_path('transaction_data', out_dir)
+    schema = _schema('transaction_data', list(SOURCE_SCHEMAS['transaction_data']))
+    rows['transaction_data'] = 0
+    with pacsv.CSVWriter(path, schema) as writer:
+        for week_df in iter_transactions(config, products, commodity, rng):
+            writer.write_table(pa.Table.from_pandas(week_df, schema=schema, preserve_index=False))
+            rows['transaction_data'] += len(week_df)
+
+    for table, df in make_campaign_tables(config, products, rng).items():
+        _write_csv(df, raw_csv_path(table, out_dir), table)
+        rows[table] = len(df)
+    causal = make_causal(config, products, int(rows['transaction_data'] * config['causal_rows_per_line']), rng)
+    _write_csv(causal, raw_csv_path('causal_data', out_dir), 'causal_data')
+    rows['causal_data'] = len(causal)
+
+    with open(os.path.join(out_dir, CONFIG_NAME), 'w', encoding='utf-8') as f:
+        json.dump({'scale': scale, 'seed': seed, 'config': config, 'rows': rows}, f, indent=2)
+    return rows
+
+
+def read_generated(out_dir):
+    """The _synthetic.json record of a generated directory, or None."""
+    path = os.path.join(out_dir, CONFIG_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+if __name__ == '__main__':
+    # Usage: python dunnhumby_synthetic.py <out_dir> [--scale 10] [--seed 0]
+    # e.g. python dunnhumby_synthetic.py dunnhumby.db --scale 10 --overwrite
+    parser = argparse.ArgumentParser(description='Generate synthetic Dunnhumby-shaped source tables.')
+    parser.add_argument('out_dir')
+    parser.add_argument('--scale', type=float, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--overwrite', action='store_true',
+                        help='Allow writing into a directory that already holds real (non-synthetic) CSVs')
+    args = parser.parse_args()
+
+    existing = [name for name in SOURCE_SCHEMAS if os.path.exists(raw_csv_path(name, args.out_dir))]
+    if existing and read_generated(args.out_dir) is None and not args.overwrite:
+        parser.error(f"{args.out_dir} already contains {', '.join(existing)}; pass --overwrite to replace them")
+    for table, n in generate(args.out_dir, scale=args.scale, seed=args.seed).items():
+        print(f"{table:<18} {n:>12,} rows")
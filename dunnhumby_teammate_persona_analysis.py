@@ -6,8 +6,11 @@ import seaborn as sns
 import os
 from pathlib import Path
 
+from dunnhumby_dates import load_date_dimension, lookup
+from dunnhumby_storage import INTEGRATED_DATA_PATH, load_integrated
+
 # Paths
-INPUT_FILE = 'dunnhumby_integrated_data.csv'
+INPUT_FILE = INTEGRATED_DATA_PATH
 OUTPUT_FILE = 'dunnhumby_persona_segments.csv'
 PLOTS_DIR = 'dunnhumby_plots'
 os.makedirs(PLOTS_DIR, exist_ok=True)
@@ -16,17 +19,17 @@ print("--- Dunnhumby Teammate Persona Analysis: 7-Persona Classification ---")
 
 try:
     # 1. Load Data
-    df = pd.read_csv(INPUT_FILE)
-    df['OrderDate'] = pd.to_datetime(df['OrderDate'])
+    df = load_integrated(columns=['CustomerID', 'DAY', 'BASKET_ID', 'TotalAmount', 'Quantity', 'CouponDiscount'])
     
     # Analysis Snapshot Date (Current perspective)
-    max_date = df['OrderDate'].max()
+    max_day = df['DAY'].max()
+    max_date = pd.Timestamp(lookup(load_date_dimension(), [max_day], 'date')[0])
     print(f"Latest Transaction Date: {max_date}")
 
     # 2. RFM + Coupon Metrics Calculation
     # Note: Using distinct BASKET_ID for Frequency, TotalAmount for Monetary
     rfm = df.groupby('CustomerID').agg({
-        'OrderDate': lambda x: (max_date - x.max()).days,  # Recency
+        'DAY': 'max',                                     # Last purchase DAY (-> Recency)
         'BASKET_ID': 'nunique',                           # Frequency
         'TotalAmount': 'sum',                             # Monetary
         'Quantity': 'sum',                                # Total quantity
@@ -34,6 +37,7 @@ try:
     }).reset_index()
 
     rfm.columns = ['CustomerID', 'recency', 'frequency', 'monetary', 'total_quantity', 'coupon_count']
+    rfm['recency'] = (max_day - rfm['recency']).astype(int)
 
     # 3. Derived Metrics
     rfm['avg_basket_value'] = rfm['monetary'] / rfm['frequency']
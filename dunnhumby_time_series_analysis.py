@@ -8,8 +8,11 @@ from statsmodels.tsa.arima.model import ARIMA
 from prophet import Prophet
 from sklearn.metrics import mean_squared_error
 
+from dunnhumby_dates import load_date_dimension, lookup
+from dunnhumby_cube import INTEGRATED_CUBE_DIR, load_level
+
 # 설정
-integrated_data_path = 'dunnhumby_integrated_data.csv'
+sales_cube_dir = INTEGRATED_CUBE_DIR
 plots_dir = 'dunnhumby_plots'
 if not os.path.exists(plots_dir):
     os.makedirs(plots_dir)
@@ -18,12 +21,13 @@ print("--- Dunnhumby 시계열 매출 예측 분석 (ARIMA & Prophet) ---")
 
 try:
     # 1. 데이터 로드 및 전처리
-    df = pd.read_csv(integrated_data_path)
-    df['OrderDate'] = pd.to_datetime(df['OrderDate'])
-    
     # 일별 매출 집계
-    daily_sales = df.groupby('OrderDate')['TotalAmount'].sum().reset_index()
-    daily_sales = daily_sales.rename(columns={'OrderDate': 'ds', 'TotalAmount': 'y'})
+    # 통합 단계에서 DAY 정수 키로 미리 집계된 판매 큐브의 일별 합계를 읽고
+    # 날짜 차원에서 날짜를 조회합니다.
+    daily_sales = load_level('day', sales_cube_dir, columns=['DAY', 'TotalAmount'])
+    daily_sales['TotalAmount'] = daily_sales['TotalAmount'].astype('float64')
+    daily_sales['DAY'] = lookup(load_date_dimension(), daily_sales['DAY'], 'date')
+    daily_sales = daily_sales.rename(columns={'DAY': 'ds', 'TotalAmount': 'y'})
     daily_sales = daily_sales.sort_values('ds')
     
     # 누락된 날짜 채우기 (0원으로 처리)
@@ -5,6 +5,8 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import os
 
+from dunnhumby_storage import load_integrated
+
 # 한글 폰트 설정
 plt.rcParams['font.family'] = 'Malgun Gothic'
 plt.rcParams['axes.unicode_minus'] = False
@@ -87,7 +89,7 @@ plt.close()
 # --- 2.2 MBA 보강: 세그먼트별 평균 장바구니 크기 ---
 print("[MBA] 세그먼트별 장바구니 크기 비교 생성 중...")
 # 통합 데이터에서 세그먼트별 장바구니당 품목 수 계산
-df_integrated = pd.read_csv('dunnhumby_integrated_data.csv')
+df_integrated = load_integrated(columns=['CustomerID', 'BASKET_ID'])
 rfm_df = pd.read_csv('dunnhumby_rfm_segments.csv')
 df_integrated = df_integrated.merge(rfm_df[['CustomerID', 'Customer_Segment']], on='CustomerID', how='left')
 basket_sizes = df_integrated.groupby(['Customer_Segment', 'BASKET_ID']).size().reset_index(name='count')
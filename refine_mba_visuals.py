@@ -6,6 +6,8 @@ import seaborn as sns
 from mlxtend.frequent_patterns import apriori, association_rules
 import os
 
+from dunnhumby_storage import load_integrated
+
 # Set style
 sns.set_theme(style="whitegrid")
 plt.rcParams['font.family'] = 'Malgun Gothic'
@@ -15,7 +17,7 @@ os.makedirs('final_reports/mba/plots', exist_ok=True)
 print("--- Generating Refined MBA Scatter Plot (Lift vs Confidence) ---")
 
 # 1. Load Data
-df = pd.read_csv('dunnhumby_integrated_data.csv')
+df = load_integrated(columns=['CustomerID', 'BASKET_ID', 'ProductName', 'Category', 'Quantity'])
 df = df[~df['ProductName'].str.contains('GASOLINE', na=False, case=False)]
 df = df[~df['Category'].str.contains('FUEL', na=False, case=False)]
 
@@ -33,7 +35,7 @@ for persona in target_personas:
     
     # Top 50 items for matrix speed
     top_items = subset['ProductName'].value_counts().head(50).index
-    basket = subset[subset['ProductName'].isin(top_items)].groupby(['BASKET_ID', 'ProductName'])['Quantity'].sum().unstack().fillna(0)
+    basket = subset[subset['ProductName'].isin(top_items)].groupby(['BASKET_ID', 'ProductName'], observed=True)['Quantity'].sum().unstack().fillna(0)
     basket = basket.applymap(lambda x: 1 if x > 0 else 0)
     
     try:
@@ -0,0 +1,30 @@
+import argparse
+
+from dunnhumby_benchmark import DEFAULT_SCALES, STAGES, run_benchmark, save_results, scaling_report
+
+# Scaling benchmark of the main pipeline stages on synthetic Dunnhumby-shaped
+# data (see dunnhumby_benchmark / dunnhumby_synthetic). Reports throughput and
+# peak memory per stage and scale, and flags stages that grow superlinearly.
+#
+#   python run_benchmark.py                          # 1x, 10x, 100x, all stages
+#   python run_benchmark.py --scales 1 10            # skip the 100x run
+#   python run_benchmark.py --stages ingest rfm      # ingest is needed by the others
+
+parser = argparse.ArgumentParser(description='Benchmark the pipeline stages on synthetic data.')
+parser.add_argument('--scales', type=float, nargs='+', default=DEFAULT_SCALES, help='Data scales (1 ~ a tenth of the real dataset)')
+parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES, help='Stages to run (default: all)')
+parser.add_argument('--seed', type=int, default=0, help='Random seed of the data generator')
+args = parser.parse_args()
+
+print("--- Running Dunnhumby Scaling Benchmark ---")
+records = run_benchmark(args.scales, args.stages, seed=args.seed)
+report = scaling_report(records)
+
+print("\n--- Scaling (exponent 1.0 = linear in the data size) ---")
+for r in report:
+    flag = '  <-- superlinear' if r['superlinear'] else ''
+    print(f"{r['stage']:<14} {r['scales']:<12} time^{r['time_exponent']}  memory^{r['memory_exponent']}{flag}")
+
+base = save_results(records, report)
+print(f"\nResults saved to {base}.csv and {base}.json")
+print("\n--- Benchmark Finished ---")
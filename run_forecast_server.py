@@ -0,0 +1,62 @@
+import argparse
+import json
+
+from dunnhumby_registry import REGISTRY_PATH
+from dunnhumby_serving import (CACHE_SIZE, DEFAULT_HORIZON, DEFAULT_HOST, DEFAULT_MODEL, DEFAULT_PORT,
+                               ForecastService, forecast_frame, serve)
+
+# Forecasts from the models stored in the model registry by the fitting steps
+# (06, 05, 04a, ...), without refitting (see dunnhumby_serving).
+#
+#   python run_forecast_server.py 1082185 1029743                 # 12-week Prophet forecasts
+#   python run_forecast_server.py 1082185 --horizon 4 --model sarima_forecast --json
+#   python run_forecast_server.py --list                          # stored model sets
+#   python run_forecast_server.py --serve --port 8000             # HTTP batch API
+
+parser = argparse.ArgumentParser(description='Serve demand forecasts from the stored models.')
+parser.add_argument('product_ids', nargs='*', help='Products to forecast')
+parser.add_argument('--horizon', type=int, default=DEFAULT_HORIZON, help='Weeks to forecast')
+parser.add_argument('--model', default=DEFAULT_MODEL, help='Model set in the registry (see --list)')
+parser.add_argument('--registry', default=REGISTRY_PATH, help='Model registry file')
+parser.add_argument('--json', action='store_true', help='Print the full results as JSON')
+parser.add_argument('--output', help='Also save the forecasts to this CSV file')
+parser.add_argument('--list', action='store_true', help='Print the stored model sets and exit')
+parser.add_argument('--serve', action='store_true', help='Answer forecast requests over HTTP')
+parser.add_argument('--host', default=DEFAULT_HOST, help='HTTP server address')
+parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='HTTP server port')
+parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help='Loaded models kept in memory')
+args = parser.parse_args()
+
+if not (args.product_ids or args.list or args.serve):
+    parser.error('give product ids, --list or --serve')
+
+service = ForecastService(args.registry, model=args.model, cache_size=args.cache_size)
+
+if args.list:
+    entries = service.registry.entries()
+    if entries.empty:
+        print(f"No models stored in {args.registry}.")
+    else:
+        summary = entries.groupby(['name', 'kind']).agg(products=('product_id', 'nunique'),
+                                                        versions=('version', 'size'),
+                                                        last_stored=('created', 'max'))
+        print(summary.to_string())
+elif args.serve:
+    serve(service, args.host, args.port)
+else:
+    results = service.forecast(args.product_ids, args.horizon)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        forecasts = forecast_frame(results)
+        if not forecasts.empty:
+            print(forecasts.to_string(index=False))
+        for r in results:
+            if r['status'] != 'ok':
+                print(f"{r['product_id']}: {r['status']} ({r['error']})")
+        print(f"\n{sum(r['status'] == 'ok' for r in results)} of {len(results)} products forecast "
+              f"in {sum(r['milliseconds'] for r in results):.1f} ms.")
+    if args.output:
+        forecast_frame(results).to_csv(args.output, index=False)
+        print(f"Forecasts saved to {args.output}")
+service.close()
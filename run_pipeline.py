@@ -0,0 +1,53 @@
+import argparse
+import os
+import time
+
+from dunnhumby_pipeline import STEPS, dependency_graph, run_pipeline, topological_order
+from dunnhumby_profiling import PROFILE_DIR, new_run_id, summarize
+
+# Runs the Dunnhumby pipeline as a DAG: every step is a script with declared
+# inputs/outputs (dunnhumby_pipeline.STEPS), independent branches run in
+# parallel worker processes, and --resume restarts after the last failure.
+# Each run ends with a profile summary of its steps (profiles/<run_id>/).
+#
+#   python run_pipeline.py                     # everything
+#   python run_pipeline.py 07 13 --workers 4   # these steps and their upstream steps
+#   python run_pipeline.py --resume            # skip steps completed in the previous run
+#   python run_pipeline.py --list              # show the DAG
+
+parser = argparse.ArgumentParser(description='Run the Dunnhumby analysis pipeline.')
+parser.add_argument('steps', nargs='*', help='Target steps (default: all). Upstream steps are included.')
+parser.add_argument('--workers', type=int, default=None, help='Parallel worker processes (default: CPU count)')
+parser.add_argument('--resume', action='store_true', help='Skip steps that completed in the previous run')
+parser.add_argument('--list', action='store_true', help='Print the steps and their dependencies and exit')
+args = parser.parse_args()
+
+unknown = [s for s in args.steps if s not in STEPS]
+if unknown:
+    parser.error(f"unknown step(s): {', '.join(unknown)} (choose from {', '.join(STEPS)})")
+
+if args.list:
+    graph = dependency_graph()
+    for step in topological_order(graph):
+        deps = ', '.join(sorted(graph[step])) or '-'
+        print(f"{step:<16} {STEPS[step]['script']:<42} <- {deps}")
+    exit()
+
+print("--- Running Dunnhumby Pipeline ---")
+start = time.perf_counter()
+run_id = new_run_id()
+state = run_pipeline(args.steps or None, workers=args.workers, resume=args.resume, run_id=run_id)
+
+profile_dir = os.path.join(PROFILE_DIR, run_id)
+if os.path.isdir(profile_dir):
+    summarize(profile_dir, top=15)
+
+failed = [s for s, r in state.items() if r['status'] == 'failed']
+blocked = [s for s, r in state.items() if r['status'] == 'blocked']
+print(f"\n{len(state) - len(failed) - len(blocked)} of {len(state)} steps completed "
+      f"in {time.perf_counter() - start:.1f}s.")
+if failed:
+    print(f"Failed: {', '.join(failed)} (see logs); blocked downstream: {', '.join(blocked) or '-'}")
+    print("Fix the failure and re-run with --resume to continue from there.")
+    exit(1)
+print("\n--- Pipeline Finished ---")
@@ -5,6 +5,8 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import os
 
+from dunnhumby_storage import load_integrated
+
 # Set style for professional reports
 sns.set_theme(style="whitegrid")
 plt.rcParams['font.family'] = 'Malgun Gothic' # For Korean support
@@ -15,8 +17,7 @@ os.makedirs('final_reports/ts/plots/deep_dive', exist_ok=True)
 
 print("Loading data...")
 # Load integrated data
-df = pd.read_csv('dunnhumby_integrated_data.csv')
-df['OrderDate'] = pd.to_datetime(df['OrderDate'])
+df = load_integrated(columns=['CustomerID', 'OrderDate', 'BASKET_ID', 'ProductName', 'Category', 'Quantity'])
 
 # NEW: Filter out Non-Grocery items (Fuel, etc.) to focus on retail products
 df = df[~df['ProductName'].str.contains('GASOLINE', na=False, case=False)]
@@ -39,7 +40,7 @@ print("--- Q1 Analysis: Stock-out Risk for Routine Items ---")
 # 1. Identify "Routine Items" per Persona
 # Metric: Routine Score = (Purchase Frequency * 0.7) + (Regularity 0.3)
 # Simplified: Top 3 most frequently purchased items per persona
-top_items = df.groupby(['persona', 'ProductName'])['Quantity'].sum().reset_index()
+top_items = df.groupby(['persona', 'ProductName'], observed=True)['Quantity'].sum().reset_index()
 top_items = top_items.sort_values(['persona', 'Quantity'], ascending=[True, False])
 routine_items = top_items.groupby('persona').head(5).reset_index(drop=True)
 